@@ -0,0 +1,65 @@
+#!/usr/bin/python2.7
+""" How long does "import pykst" take?
+
+Runs "import pykst" in fresh interpreters and reports the median time.
+Fails (exit status 1) if importing pykst also imports numpy or Qt, or if
+it takes longer than --max-ms, so that it can be run to catch
+regressions::
+
+  python2.7 import_time.py --max-ms 50
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PYKST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Imported by the child interpreter: prints the import time in seconds,
+# then the heavy modules which came along.
+CHILD = """
+import sys, time
+sys.path.insert(0, %r)
+t0 = time.time()
+import pykst
+t1 = time.time()
+print(t1 - t0)
+print(" ".join(m for m in ("numpy", "PyQt4", "PySide") if m in sys.modules))
+"""
+
+def time_import(python):
+  out = subprocess.check_output([python, "-c", CHILD % PYKST_DIR]).decode()
+  seconds, heavy = (out.split("\n") + [""])[:2]
+  return float(seconds), heavy.split()
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+  parser.add_argument("--runs", type=int, default=20, help="fresh interpreters to time")
+  parser.add_argument("--max-ms", type=float, default=None,
+                      help="fail if the median import takes longer than this")
+  parser.add_argument("--python", default=sys.executable, help="the interpreter to time")
+  args = parser.parse_args()
+
+  times = []
+  heavy = set()
+  for i in range(args.runs):
+    seconds, modules = time_import(args.python)
+    times.append(seconds*1000.0)
+    heavy.update(modules)
+  times.sort()
+  median = times[len(times)//2]
+
+  print("import pykst: median %.1f ms, min %.1f ms, max %.1f ms over %d runs" %
+        (median, times[0], times[-1], len(times)))
+  failed = False
+  if heavy:
+    print("FAIL: importing pykst imported " + ", ".join(sorted(heavy)))
+    failed = True
+  if args.max_ms is not None and median > args.max_ms:
+    print("FAIL: the median is over %.1f ms" % args.max_ms)
+    failed = True
+  sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,238 @@
+#!/usr/bin/python2.7
+""" How fast is kst's script interface?
+
+Times the things scripts spend their time on, against a running (or
+newly started) kst session, and writes the results as JSON so that
+builds of kst and pykst can be compared::
+
+  python2.7 suite.py --output new.json
+  python2.7 suite.py --compare old.json new.json
+
+The benchmarks are:
+
+  roundtrip   testCommand(), which does nothing: the cost of a command
+  properties  setting and reading a property through send_si()
+  vectors     loading editable vectors into kst, and reading them back,
+              through the socket and through shared memory
+  matrices    the same for editable matrices
+  create      making curves, equations, spectra and plots
+  export      export_graphics_file(), per tab
+
+The session is cleared before each benchmark, so don't point this at a
+session you care about.  Arrays of 1e3 to 1e8 samples are timed by
+default; with 1e8, python and kst each hold several 800 MB copies, so
+pass smaller --sizes on machines with less than about 4 GB free.
+
+With --mock, the benchmarks run against pykstmock's stand-in for kst
+rather than kst itself, which shows how much of the time is pykst's.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pykst
+
+_clock = getattr(time, "perf_counter", time.time)
+
+def timed(fn, repeat):
+  """ Calls fn repeat times, and returns the time each call took, sorted. """
+  times = []
+  for i in range(repeat):
+    t0 = _clock()
+    fn()
+    times.append(_clock() - t0)
+  times.sort()
+  return times
+
+def summary(times, count=1, nbytes=None):
+  """ The median, best and worst of times (each for count operations of nbytes each). """
+  median = times[len(times)//2]
+  result = {"runs": len(times), "median_s": median, "min_s": times[0], "max_s": times[-1],
+            "per_second": count/median if median > 0 else None}
+  if nbytes is not None:
+    result["bytes"] = nbytes
+    result["mb_per_second"] = nbytes*count/median/1e6 if median > 0 else None
+  return result
+
+
+def bench_roundtrip(client, args):
+  n = 1000
+  times = timed(lambda: [client.testCommand() for i in range(n)], args.repeat)
+  return {"testCommand": summary(times, n)}
+
+def bench_properties(client, args):
+  n = 200
+  scalar = client.new_generated_scalar(0)
+  def set_values():
+    for i in range(n):
+      scalar.set_value(i)
+  def get_values():
+    for i in range(n):
+      scalar.value()
+  return {"set": summary(timed(set_values, args.repeat), n),
+          "get": summary(timed(get_values, args.repeat), n)}
+
+def bench_vectors(client, args):
+  results = {}
+  for size in args.sizes:
+    data = numpy.random.randn(size)
+    v = client.new_editable_vector()
+    results["load_%d" % size] = summary(timed(lambda: v.load(data), args.repeat), 1, data.nbytes)
+    results["read_%d" % size] = summary(timed(v.get_numpy_array, args.repeat), 1, data.nbytes)
+    if client.protocol >= 2:
+      shared = client.new_shared_array(size)
+      shared[:] = data
+      results["load_shared_%d" % size] = summary(timed(lambda: v.load(shared), args.repeat),
+                                                 1, data.nbytes)
+      results["read_shared_%d" % size] = summary(timed(lambda: v.get_numpy_array(shared=True),
+                                                       args.repeat), 1, data.nbytes)
+    client.clear()
+  return results
+
+def bench_matrices(client, args):
+  results = {}
+  for size in args.sizes:
+    nx = int(numpy.sqrt(size))
+    data = numpy.random.randn(nx, size//nx)
+    m = client.new_editable_matrix(data)
+    results["load_%d" % size] = summary(timed(lambda: m.load(data), args.repeat), 1, data.nbytes)
+    results["read_%d" % size] = summary(timed(m.get_numpy_array, args.repeat), 1, data.nbytes)
+    if client.protocol >= 2:
+      shared = client.new_shared_array(data.shape)
+      shared[:] = data
+      results["load_shared_%d" % size] = summary(timed(lambda: m.load(shared), args.repeat),
+                                                 1, data.nbytes)
+      results["read_shared_%d" % size] = summary(timed(lambda: m.get_numpy_array(shared=True),
+                                                       args.repeat), 1, data.nbytes)
+    client.clear()
+  return results
+
+def bench_create(client, args):
+  n = args.objects
+  x = client.new_generated_vector(0, 100, 10000)
+  y = client.new_editable_vector(numpy.random.randn(10000))
+  makers = {
+    "curves": lambda: client.new_curve(x, y),
+    "equations": lambda: client.new_equation(x, "sin(x)"),
+    "spectra": lambda: client.new_spectrum(y),
+    "plots": lambda: client.new_plot(),
+  }
+  results = {}
+  for kind in sorted(makers):
+    make = makers[kind]
+    times = []
+    for i in range(args.repeat):
+      t0 = _clock()
+      for j in range(n):
+        make()
+      times.append(_clock() - t0)
+      if kind == "plots":
+        # keep the tab from filling up with ever smaller plots
+        client.new_tab()
+    times.sort()
+    results[kind] = summary(times, n)
+  results["curves_batched"] = summary(timed(lambda: client.new_curves(x, [y]*n), args.repeat), n)
+  return results
+
+def bench_export(client, args):
+  x = client.new_generated_vector(0, 100, 10000)
+  e = client.new_equation(x, "sin(x)")
+  for tab in range(args.tabs):
+    if tab:
+      client.new_tab()
+    client.new_plot().add(client.new_curve(e.x(), e.y()))
+  directory = tempfile.mkdtemp(prefix="kst-bench-")
+  try:
+    times = timed(lambda: client.export_graphics_file(os.path.join(directory, "export.png")),
+                  args.repeat)
+  finally:
+    shutil.rmtree(directory)
+  result = summary(times, args.tabs)
+  result["tabs"] = args.tabs
+  return {"png": result}
+
+BENCHMARKS = [
+  ("roundtrip", bench_roundtrip),
+  ("properties", bench_properties),
+  ("vectors", bench_vectors),
+  ("matrices", bench_matrices),
+  ("create", bench_create),
+  ("export", bench_export),
+]
+
+
+def compare(old_path, new_path):
+  """ Prints how the median times of two runs compare. """
+  with open(old_path) as f:
+    old = json.load(f)["benchmarks"]
+  with open(new_path) as f:
+    new = json.load(f)["benchmarks"]
+  print("%-32s %12s %12s %8s" % ("benchmark", "old ms", "new ms", "new/old"))
+  for group in sorted(set(old) & set(new)):
+    for name in sorted(set(old[group]) & set(new[group])):
+      a = old[group][name]["median_s"]
+      b = new[group][name]["median_s"]
+      print("%-32s %12.3f %12.3f %8.2f" % (group+"."+name, a*1000, b*1000, b/a if a else 0))
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+  parser.add_argument("--server-name", default="kstBenchmark",
+                      help="the kst session to use (started if need be)")
+  parser.add_argument("--only", nargs="+", choices=[name for name, fn in BENCHMARKS],
+                      help="run only these benchmarks")
+  parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark")
+  parser.add_argument("--sizes", type=lambda s: [int(float(n)) for n in s.split(",")],
+                      default=[1000, 10000, 100000, 1000000, 10000000, 100000000],
+                      help="comma separated array sizes (default 1e3 to 1e8: the largest "
+                           "needs a few GB of memory)")
+  parser.add_argument("--objects", type=int, default=50, help="objects of each kind to create")
+  parser.add_argument("--tabs", type=int, default=4, help="tabs to export")
+  parser.add_argument("--mock", action="store_true",
+                      help="run against pykstmock rather than kst (no display needed)")
+  parser.add_argument("--output", help="write the results here rather than to stdout")
+  parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                      help="compare two sets of results instead of running anything")
+  args = parser.parse_args()
+
+  if args.compare:
+    compare(*args.compare)
+    return
+
+  if args.mock:
+    import pykstmock
+    pykstmock.MockServer(args.server_name).start()
+  client = pykst.Client(args.server_name)
+  results = {
+    "mock": args.mock,
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "protocol": client.protocol,
+    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    "benchmarks": {},
+  }
+  for name, fn in BENCHMARKS:
+    if args.only and name not in args.only:
+      continue
+    client.clear()
+    sys.stderr.write(name+"...\n")
+    results["benchmarks"][name] = fn(client, args)
+  client.clear()
+
+  text = json.dumps(results, indent=2, sort_keys=True)
+  if args.output:
+    with open(args.output, "w") as f:
+      f.write(text+"\n")
+  else:
+    print(text)
+
+if __name__ == "__main__":
+  main()
@@ -1,28 +1,46 @@
-import sys
-import math
-import ctypes
 import atexit
 import os
-
-try:
-  from PySide import QtCore, QtNetwork, QtGui
-except ImportError as err1:
-  try:
-    from PyQt4 import QtCore, QtNetwork, QtGui
-  except ImportError as err2:
-    print("ImportError: {} and {}. One of the two is required.".format(err1, err2))
-    sys.exit()
-
-QtGui.QApplication([""])
-
-from numpy import *
-import tempfile
+import sys
+import struct
+import contextlib
+import mmap
+import re
+import socket
+import threading
 import time
-import subprocess
+
+# numpy, tempfile, subprocess and Qt are only imported by the functions
+# which need them, so that importing pykst stays cheap.
 
 def cleanTmpFile(file):
 	os.remove(file.name)
 
+# The newest version of the kst script protocol pykst can speak.
+# 1 is bare text; 2 prefixes every command and reply with its length;
+# 3 adds a request id after the length, so replies can come out of order;
+# 4 is 3, from a kst which understands transaction().
+PROTOCOL_VERSION = 4
+
+# Where shared memory segments for large arrays are made.  /dev/shm is
+# memory backed; elsewhere they are ordinary temporary files.
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_qt_app = None
+
+def _qt():
+  """ Imports QtCore and QtNetwork from PySide or PyQt4, and makes sure there is an application. """
+  global _qt_app
+  try:
+    from PySide import QtCore, QtNetwork
+  except ImportError as err1:
+    try:
+      from PyQt4 import QtCore, QtNetwork
+    except ImportError as err2:
+      raise ImportError("{} and {}. One of the two is required.".format(err1, err2))
+  if QtCore.QCoreApplication.instance() is None:
+    _qt_app = QtCore.QCoreApplication([""])
+  return QtCore, QtNetwork
+
 def b2str(val):
   if isinstance(val, bool):
     return "True" if val else "False"
@@ -30,7 +48,732 @@ def b2str(val):
     return str(val)
 
 
-class Client:
+class BatchReply(str):
+  """ The reply to a command sent inside :meth:`Client.batch`.
+
+  Until the batch has been sent, this is a placeholder (``${n}``) which
+  kst replaces by the reply to the n'th command of the batch.  It can be
+  used anywhere a handle can, for example as the argument of a later
+  command in the same batch.  Once the batch has been sent, ``result()``
+  returns the actual reply.
+  """
+  def __new__(cls, index):
+    reply = str.__new__(cls, "${"+b2str(index)+"}")
+    reply.index = index
+    reply.is_handle = False
+    reply._reply = None
+    return reply
+
+  def done(self):
+    """ True once the batch has been sent and the reply is known. """
+    return self._reply is not None
+
+  def result(self):
+    """ The reply kst sent, or the handle if this is the reply to endEdit(). """
+    if self._reply is None:
+      raise RuntimeError("the batch holding "+str(self)+" has not been sent yet")
+    if self.is_handle:
+      return self._reply[self._reply.find("ing ")+4:]
+    return self._reply
+
+
+class _SharedSegment(object):
+  """ The memory mapped file behind a shared array. """
+  def __init__(self, path, address, nbytes):
+    self.path = path
+    self.address = address
+    self.nbytes = nbytes
+
+  def __del__(self):
+    # the mapping outlives the file, so this only frees the name
+    try:
+      os.remove(self.path)
+    except (OSError, TypeError, AttributeError):
+      pass
+
+
+_SharedArray = None
+
+def _shared_array_type():
+  """ The ndarray subclass returned by :meth:`Client.new_shared_array`.
+
+  It is made the first time it is needed, so that importing pykst does
+  not import numpy.
+  """
+  global _SharedArray
+  if _SharedArray is not None:
+    return _SharedArray
+  import numpy
+  import tempfile
+
+  class SharedArray(numpy.ndarray):
+    """ A float64 numpy array which kst reads straight out of shared memory.
+
+    See :meth:`Client.new_shared_array`.
+    """
+    def __new__(cls, shape):
+      fd, path = tempfile.mkstemp(prefix="pykst-", dir=SHARED_MEMORY_DIR)
+      try:
+        nbytes = 8*int(numpy.prod(shape))
+        os.ftruncate(fd, nbytes)
+        # an empty file can not be mapped, and an empty array needs no memory
+        buf = mmap.mmap(fd, nbytes) if nbytes else None
+      finally:
+        os.close(fd)
+      array = numpy.ndarray.__new__(cls, shape, dtype = numpy.float64, buffer = buf)
+      array.segment = _SharedSegment(path, array.ctypes.data, nbytes)
+      return array
+
+    def __array_finalize__(self, obj):
+      self.segment = getattr(obj, "segment", None)
+
+    def shared_path(self):
+      """ The file kst can load this array from, or None if this is a view. """
+      segment = self.segment
+      if (segment is None or self.nbytes != segment.nbytes or
+          self.ctypes.data != segment.address or not self.flags.c_contiguous):
+        return None
+      return segment.path
+
+  _SharedArray = SharedArray
+  return _SharedArray
+
+
+_ReplyFuture = None
+
+def _reply_future_type():
+  """ The class of the futures returned by :meth:`Client.send_async`.
+
+  It is made the first time it is needed, so that importing pykst does
+  not import concurrent.futures.
+  """
+  global _ReplyFuture
+  if _ReplyFuture is not None:
+    return _ReplyFuture
+  from concurrent.futures import Future, TimeoutError
+
+  class ReplyFuture(Future):
+    """ The reply to a command sent with :meth:`Client.send_async`.
+
+    Replies are read off the connection whenever the client waits for
+    one, so the future is done once any later command on the same
+    client has been answered.  ``result()`` waits for the reply if it
+    is not there yet, for up to timeout seconds if that is given, and
+    then raises ``concurrent.futures.TimeoutError``.
+    """
+    def __init__(self, client, request):
+      Future.__init__(self)
+      self.client = client
+      self.request = request
+
+    def result(self, timeout=None):
+      if timeout is None:
+        if not self.done():
+          self.client._receive(self.request)
+        return Future.result(self)
+      deadline = _clock() + timeout
+      while not self.done():
+        remaining = deadline - _clock()
+        if remaining <= 0 or not self.client.transport.wait_readable(remaining):
+          raise TimeoutError()
+        self.client._receive_next()
+      return Future.result(self)
+
+  _ReplyFuture = ReplyFuture
+  return _ReplyFuture
+
+
+def _shared_path(np_array):
+  """ The file kst can load np_array from, if it is a whole shared array. """
+  if _SharedArray is not None and isinstance(np_array, _SharedArray):
+    return np_array.shared_path()
+  return None
+
+
+def server_path(server_name):
+  """ The unix domain socket a kst session named server_name listens on.
+
+  This is where QLocalServer puts it: server_name itself if it is an
+  absolute path, otherwise in the temporary directory.
+  """
+  if os.path.isabs(server_name):
+    return server_name
+  tmp = os.environ.get("TMPDIR", "").rstrip("/") or "/tmp"
+  return os.path.join(tmp, server_name)
+
+
+class _SocketTransport(object):
+  """ A connection to kst's script server through a unix domain socket.
+
+  QLocalServer is a unix domain socket on unix, so this needs nothing but
+  the standard library.
+  """
+  def __init__(self, server_name):
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      self.sock.connect(server_path(server_name))
+    except socket.error:
+      self.sock.close()
+      raise
+    self.sock.settimeout(300)
+
+  def write(self, data):
+    self.sock.sendall(data)
+
+  def wait_readable(self, timeout):
+    """ Whether something arrives within timeout seconds. """
+    import select
+    return bool(select.select([self.sock], [], [], timeout)[0])
+
+  def read_some(self):
+    """ Returns whatever has arrived, once something has. """
+    return self._recv(1000000)
+
+  def read(self, n):
+    """ Returns exactly n bytes. """
+    chunks = []
+    while n > 0:
+      chunk = self._recv(n)
+      chunks.append(chunk)
+      n -= len(chunk)
+    return b"".join(chunks)
+
+  def read_into(self, buf):
+    """ Fills buf (a uint8 numpy array) with the next len(buf) bytes. """
+    view = memoryview(buf)
+    pos = 0
+    while pos < len(view):
+      try:
+        n = self.sock.recv_into(view[pos:])
+      except socket.timeout:
+        raise IOError("kst did not reply")
+      if n == 0:
+        raise IOError("kst closed the connection")
+      pos += n
+
+  def _recv(self, n):
+    try:
+      data = self.sock.recv(n)
+    except socket.timeout:
+      raise IOError("kst did not reply")
+    if not data:
+      raise IOError("kst closed the connection")
+    return data
+
+  def close(self):
+    self.sock.close()
+
+
+class _QtTransport(object):
+  """ A connection to kst's script server through a QLocalSocket.
+
+  Only used where there are no unix domain sockets (windows), as it
+  needs PySide or PyQt4.
+  """
+  def __init__(self, server_name):
+    QtCore, QtNetwork = _qt()
+    self.ls = QtNetwork.QLocalSocket()
+    self.ls.connectToServer(server_name)
+    if not self.ls.waitForConnected(300):
+      raise IOError(str(self.ls.errorString()))
+
+  def write(self, data):
+    self.ls.write(data)
+    self.ls.flush()
+
+  def wait_readable(self, timeout):
+    """ Whether something arrives within timeout seconds. """
+    return self.ls.bytesAvailable() > 0 or self.ls.waitForReadyRead(int(timeout*1000))
+
+  def read_some(self):
+    """ Returns whatever has arrived, once something has. """
+    self._wait_for_bytes(1)
+    return self.ls.readAll().data()
+
+  def read(self, n):
+    """ Returns exactly n bytes. """
+    self._wait_for_bytes(n)
+    return self.ls.read(n).data()
+
+  def read_into(self, buf):
+    """ Fills buf (a uint8 numpy array) with the next len(buf) bytes. """
+    import numpy
+    pos = 0
+    while pos < len(buf):
+      if self.ls.bytesAvailable() == 0:
+        self._wait_for_bytes(1)
+      chunk = self.ls.read(len(buf) - pos).data()
+      buf[pos:pos+len(chunk)] = numpy.frombuffer(chunk, dtype = numpy.uint8)
+      pos += len(chunk)
+
+  def _wait_for_bytes(self, n):
+    """ Block until n bytes of a reply have arrived. """
+    while self.ls.bytesAvailable() < n:
+      if not self.ls.waitForReadyRead(300000):
+        raise IOError("kst did not reply: "+str(self.ls.errorString()))
+
+  def close(self):
+    self.ls.disconnectFromServer()
+
+
+def _connect(server_name):
+  """ Opens a connection to the script server of the kst session named server_name. """
+  if hasattr(socket, "AF_UNIX"):
+    return _SocketTransport(server_name)
+  return _QtTransport(server_name)
+
+
+def start_kst(server_name="kstScript", timeout=30, command=("kst2",), started=None):
+  """ Starts a kst session, and waits until its script server is listening.
+
+  kst is passed the write end of a pipe with ``--readyFd``, and writes
+  the name its script server listens on there once it is ready (the name
+  has a number appended if server_name was taken).  Meanwhile, and where
+  there are no pipes to pass, connecting is retried with exponential
+  backoff.
+
+  :param command: how to run kst, as a list of arguments.
+  :param started: if given, called with the kst process as soon as it
+                  has been started, before it is ready.
+
+  Returns the server name and the kst process (a ``subprocess.Popen``).
+  Raises IOError if kst is not ready within timeout seconds.
+  """
+  import subprocess
+  import select
+
+  args = list(command) + ["--serverName="+str(server_name)]
+  kwargs = {}
+  r = w = None
+  if os.name == "posix":
+    r, w = os.pipe()
+    args.append("--readyFd="+b2str(w))
+    if sys.version_info[0] >= 3:
+      kwargs["pass_fds"] = (w,)
+  try:
+    process = subprocess.Popen(args, **kwargs)
+  finally:
+    if w is not None:
+      os.close(w)
+  if started is not None:
+    started(process)
+
+  deadline = time.time() + timeout
+  delay = 0.05
+  try:
+    while True:
+      if r is not None:
+        if select.select([r], [], [], delay)[0]:
+          name = os.read(r, 4096).strip()
+          if name:
+            return name, process
+          # kst closed the pipe without a word: just keep trying to connect
+          os.close(r)
+          r = None
+      else:
+        time.sleep(delay)
+      try:
+        _connect(server_name).close()
+        return server_name, process
+      except EnvironmentError:
+        pass
+      if process.poll() is not None:
+        raise IOError("kst exited with status "+b2str(process.returncode)+" before it was ready")
+      if time.time() > deadline:
+        process.terminate()
+        raise IOError("kst was not ready after "+b2str(timeout)+" seconds")
+      delay = min(delay*2, 1.0)
+  finally:
+    if r is not None:
+      os.close(r)
+
+
+_clock = getattr(time, "perf_counter", time.time)
+
+class CommandStats(object):
+  """ Counts, timings and sizes of the commands a client has sent, by verb.
+
+  The verb of a command is whatever comes before its "(", so every
+  ``setColor(...)`` sent to any curve is counted as ``setColor``.  Made by
+  :meth:`Client.enable_stats`; you should not need to make one yourself.
+
+  :param hook: if given, called as ``hook(verb, seconds, bytes_sent,
+               bytes_received)`` after every command, for passing the
+               numbers on to some other metrics system.
+  """
+
+  # upper bounds, in seconds, of the buckets of the latency histograms
+  BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+             0.1, 0.2, 0.5, 1.0, 2.0, 5.0, float("inf"))
+
+  def __init__(self, hook=None):
+    self.hook = hook
+    self._lock = threading.Lock()
+    self.clear()
+
+  def clear(self):
+    """ Forgets everything recorded so far. """
+    with self._lock:
+      self._verbs = {}
+
+  def record(self, verb, seconds, sent, received):
+    """ Adds one command to the statistics of verb. """
+    with self._lock:
+      entry = self._verbs.get(verb)
+      if entry is None:
+        entry = self._verbs[verb] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                     "bytes_sent": 0, "bytes_received": 0,
+                                     "histogram": [0]*len(self.BUCKETS)}
+      entry["count"] += 1
+      entry["seconds"] += seconds
+      entry["max_seconds"] = max(entry["max_seconds"], seconds)
+      entry["bytes_sent"] += sent
+      entry["bytes_received"] += received
+      for i, bound in enumerate(self.BUCKETS):
+        if seconds <= bound:
+          entry["histogram"][i] += 1
+          break
+    if self.hook is not None:
+      self.hook(verb, seconds, sent, received)
+
+  def snapshot(self):
+    """ Returns a copy of the statistics: see :meth:`Client.stats`. """
+    with self._lock:
+      return dict((verb, dict(entry, histogram=list(entry["histogram"])))
+                  for verb, entry in self._verbs.items())
+
+  def report(self):
+    """ Returns a table of the statistics, the verbs which took the longest first. """
+    lines = ["%-32s %8s %10s %10s %10s %12s %12s" %
+             ("command", "count", "total ms", "mean ms", "max ms", "sent", "received")]
+    entries = sorted(self.snapshot().items(), key=lambda item: -item[1]["seconds"])
+    for verb, entry in entries:
+      lines.append("%-32s %8d %10.3f %10.3f %10.3f %12d %12d" %
+                   (verb, entry["count"], 1000*entry["seconds"],
+                    1000*entry["seconds"]/entry["count"], 1000*entry["max_seconds"],
+                    entry["bytes_sent"], entry["bytes_received"]))
+    return "\n".join(lines)
+
+
+# Commands pykst sends which change nothing, so the cache is kept when they are sent.  Any
+# other command, besides the reads of getters the cache makes itself, drops the replies of
+# the object being edited, or if none is, empties it.
+_READS = ("beginEdit(", "endEdit(", "changeSerial(", "properties(", "getObjects(", "findObjects(",
+          "testCommand(")
+
+# Commands which load an array into an editable vector or matrix, whose
+# handle is their last argument: see _array_handle().
+_ARRAY_LOADS = ("EditableVector::setBinaryArray(", "EditableMatrix::setBinaryArray(")
+
+def _array_handle(command):
+  """ The handle of the vector or matrix an _ARRAY_LOADS command loads, from its header. """
+  n = int(command[31:command.find(",")])
+  header = command[:len(command)-n]
+  return header[31:-1].split(",", 1 if command.startswith(_ARRAY_LOADS[0]) else 3)[-1]
+
+def _unescape_property(value):
+  """ Undoes the escaping of backslashes, tabs and newlines in the reply to properties(). """
+  if "\\" not in value:
+    return value
+  return re.sub(r"\\(.)", lambda m: {"t": "\t", "n": "\n"}.get(m.group(1), m.group(1)), value)
+
+def _parse_property(value):
+  """ The value of a property, as a bool, int or float if it looks like one. """
+  if value in ("true", "True"):
+    return True
+  if value in ("false", "False"):
+    return False
+  for parse in (int, float):
+    try:
+      return parse(value)
+    except ValueError:
+      pass
+  return value
+
+# The names pykst gives the statistics of Vector::stats() and Matrix::stats(), where they differ from kst's.
+_STATISTICS = {"minPositive": "min_positive"}
+
+# The pykst classes for the types in the reply to getObjects(), where they are not named alike, and for the
+# kinds of plugin.  Names rather than classes, as the classes come later.
+_OBJECT_CLASSES = {"Vector": "VectorBase", "GeneratedMatrix": "Matrix"}
+_PLUGIN_CLASSES = {"Flag Filter": "FlagFilter", "Linear Fit": "LinearFit", "Linear Weighted Fit": "LinearFit",
+                   "Polynomial Fit": "PolynomialFit", "Polynomial Weighted Fit": "PolynomialFit"}
+
+# The sections of a spec for Client.apply_spec() which hold objects, with the type of their objects if not
+# given, and the settings in a spec which are never the names of other objects.
+_SPEC_SECTIONS = (("vectors", "data_vector"), ("data_objects", None), ("curves", "curve"))
+_SPEC_LITERALS = ("type", "name", "filename", "field", "equation")
+
+# Replies with which kst's commands say that they have failed.  Client.apply_spec() looks for these.
+_FAILED_REPLY = re.compile(r"(Unknown command!|No such |No interface open|The interface isn't valid|"
+                           r"To access this function|Too few arguments|Invalid$|Unknown error|Not supported|"
+                           r"Could not |Error |(Vector|Scalar|matrix) .* not found)")
+
+# The kinds findObjects() knows for pykst's base classes.
+_FAMILIES = {"VectorBase": "vector", "Matrix": "matrix", "Scalar": "scalar", "String": "string",
+             "Relation": "relation", "ViewItem": "viewitem"}
+
+def _object_class(type_name, detail):
+  """ The pykst class for an object of type_name (and detail) in the reply to getObjects(). """
+  if type_name == "Plugin":
+    name = _PLUGIN_CLASSES.get(detail, "Fit" if "Fit" in detail else "Filter" if "Filter" in detail else "Object")
+  else:
+    name = _OBJECT_CLASSES.get(type_name, type_name)
+  cls = globals().get(name)
+  if isinstance(cls, type) and issubclass(cls, NamedObject):
+    return cls
+  return Object
+
+def _typed(client, handle, default):
+  """ The object handle as an instance of its own pykst class if kst can say what that is, or else of default. """
+  if handle and not isinstance(handle, BatchReply):
+    try:
+      obj = client.object(handle)
+      if isinstance(obj, default):
+        return obj
+    except ValueError:
+      pass
+  obj = default(client)
+  obj.handle = handle
+  return obj
+
+def _spec_order(entries):
+  """ The keys of the objects in a spec, in an order in which each comes after the objects it refers to. """
+  refs = {}
+  for key, entry in entries.items():
+    refs[key] = set()
+    for setting, value in entry.items():
+      if setting not in _SPEC_LITERALS:
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+          if isinstance(item, basestring) and item.split(".")[0] in entries and item.split(".")[0] != key:
+            refs[key].add(item.split(".")[0])
+  ordered = []
+  pending = sorted(entries)
+  while pending:
+    ready = [key for key in pending if not refs[key] & set(pending)]
+    if not ready:
+      raise ValueError("circular references in spec between " + ", ".join(pending))
+    ordered += ready
+    pending = [key for key in pending if key not in ready]
+  return ordered
+
+class PropertyCache(object):
+  """ The replies to property reads sent through :meth:`Client.send_si`, by object handle.
+
+  Made by :meth:`Client.enable_cache`; you should not need to make one
+  yourself.  Only the getters which an object's properties() reports
+  are cached.  Each object's replies are kept along with the serial kst
+  gives it (changeSerial(handle)), which changes with the object, and
+  are dropped when it does: the serials of every cached object are
+  asked for in one go, at most once every max_age seconds and before
+  the first read after this client changes anything.  Commands sent to
+  an object's interface drop that object's replies straight away, and
+  any other command but those in _READS drops them all.
+  """
+  def __init__(self, max_age, serial):
+    self.max_age = max_age
+    self.values = {}
+    self.getters = {}       # the getters of each object, by handle
+    self.serials = {}       # the serial of each object which its values were read at, by handle
+    self.listed = {}        # kst's change serial when each object was last listed, by handle
+    self.listing = None     # kst's change serial when the last list of objects was asked for
+    self.serial = serial
+    self.checked = _clock()
+    self.reading = False    # a getter is being sent
+    self.editing = None     # the handle whose interface is open, or "" for a new object
+    self.dirty = False      # changes sent since the last endEdit()
+
+  def clear(self):
+    """ Forgets every cached reply. """
+    self.values.clear()
+    self.serials.clear()
+    self.listed.clear()
+
+  def drop(self, handle):
+    """ Forgets the cached replies of one object, but for its name. """
+    values = self.values.pop(handle, None)
+    if values and "name()" in values:
+      self.values[handle] = {"name()": values["name()"]}
+    self.listed.pop(handle, None)
+
+  def sent(self, command):
+    """ Notes that command is being sent to kst. """
+    if command.startswith(("batch()", "transaction()")):
+      # the commands in it were noted as they were queued
+      return
+    if self.reading or command.startswith(_READS):
+      if command.startswith("beginEdit("):
+        self.editing = command[10:-1]
+      elif command.startswith("endEdit("):
+        if self.dirty and self.editing:
+          # objects are updated when their interface is closed
+          self.drop(self.editing)
+        self.editing = None
+        self.dirty = False
+      return
+    self.checked = None
+    if command.startswith(_ARRAY_LOADS):
+      self.drop(_array_handle(command))
+    elif command.startswith("new") and not command.startswith("newTab("):
+      self.editing = ""
+    elif self.editing is not None:
+      self.dirty = True
+      if self.editing:
+        self.drop(self.editing)
+    else:
+      self.clear()
+
+  def check(self, client):
+    """ Drops the replies of every object which has changed since the cache was last checked.
+
+    This client's own changes count too, and so are always checked for.
+    """
+    now = _clock()
+    if self.checked is not None and now - self.checked < self.max_age:
+      return
+    handles = set(self.serials)
+    handles.update(handle for handle, values in self.values.items() if set(values) - set(["name()"]))
+    handles = sorted(handles)
+    reply = ""
+    if handles:
+      with client.batch():
+        reply = client.send("changeSerial("+"|".join(handles)+")")
+        serial = client.send("changeSerial()")
+      reply, serial = reply.result(), serial.result()
+    else:
+      serial = client.send("changeSerial()")
+    try:
+      serial = int(serial)
+    except ValueError:
+      serial = None
+    lines = reply.split("\n")[:-1]
+    if len(lines) != len(handles):
+      # kst keeps no serials of objects, so anything changing empties the cache
+      if serial is None or serial != self.serial:
+        self.clear()
+    else:
+      for handle, line in zip(handles, lines):
+        if line == "No such object":
+          self.values.pop(handle, None)
+          self.getters.pop(handle, None)
+          self.serials.pop(handle, None)
+          self.listed.pop(handle, None)
+        elif self.serials.get(handle) == line:
+          pass
+        elif serial is not None and self.listed.get(handle) == str(serial):
+          # nothing has changed since the object was listed with its values
+          self.serials[handle] = line
+        else:
+          self.drop(handle)
+          self.serials[handle] = line
+    self.listed.clear()
+    self.serial = serial or 0
+    self.checked = now
+
+
+# Recordings start with this line.  Each command follows as a header
+# (RECORD_ENTRY: when it was sent, in seconds since the recording started,
+# how long it took, flags, and the lengths of command and reply) and then
+# the command itself.
+RECORDING_MAGIC = b"pykst recording 1\n"
+RECORD_ENTRY = struct.Struct(">ddBII")
+RECORD_ASYNC = 1  # sent with send_async(): the time it took is not known
+
+def _open_recording(path, mode):
+  """ Opens a recording, compressed with gzip if path ends with .gz. """
+  if path.endswith(".gz"):
+    import gzip
+    return gzip.open(path, mode)
+  return open(path, mode)
+
+
+class CommandRecorder(object):
+  """ Writes every command a client sends to a file, with when it was sent and how long it took.
+
+  Made by :meth:`Client.start_recording`; see :func:`replay`.
+  """
+
+  def __init__(self, path):
+    self.file = _open_recording(path, "wb")
+    self.file.write(RECORDING_MAGIC)
+    self.start = _clock()
+    self._lock = threading.Lock()
+
+  def record(self, start, seconds, command, received, flags=0):
+    command = str(command)
+    with self._lock:
+      self.file.write(RECORD_ENTRY.pack(start - self.start, seconds, flags,
+                                        len(command), received))
+      self.file.write(command)
+
+  def close(self):
+    with self._lock:
+      self.file.close()
+
+
+def read_recording(path):
+  """ Yields the commands of a recording made with :meth:`Client.start_recording`.
+
+  Each is a tuple of when it was sent (seconds from the start of the
+  recording), how long kst took to answer (0 for commands sent with
+  send_async()), whether it was sent with send_async(), the length of
+  the reply, and the command.
+  """
+  with contextlib.closing(_open_recording(path, "rb")) as f:
+    if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+      raise ValueError(path+" is not a pykst recording")
+    while True:
+      header = f.read(RECORD_ENTRY.size)
+      if len(header) < RECORD_ENTRY.size:
+        return
+      offset, seconds, flags, sent, received = RECORD_ENTRY.unpack(header)
+      yield offset, seconds, bool(flags & RECORD_ASYNC), received, f.read(sent)
+
+
+def replay(client, path, speed=1.0):
+  """ Sends the commands of a recording to kst again, to load test it.
+
+  :param client: the client to send them through.
+  :param path: the recording, made with :meth:`Client.start_recording`.
+  :param speed: 1 replays the commands at the pace they were recorded at,
+                2 twice as fast, and so on.  0 sends them as fast as kst
+                can take them.
+
+  Objects are named by kst as they are made, so the recording should
+  be replayed into a session in the same state as the one it was made
+  in (typically a fresh one).
+
+  Returns a dict of the number of ``commands``, the wall clock
+  ``seconds`` the replay took, and the total time kst took to answer
+  them when recorded (``recorded_latency``) and now
+  (``replayed_latency``).  Commands recorded from send_async() are not
+  waited for, so count towards neither.  Turn on the client's
+  statistics (:meth:`Client.enable_stats`) for more detail.
+  """
+  commands = 0
+  recorded_latency = replayed_latency = 0.0
+  futures = []
+  start = _clock()
+  for offset, seconds, is_async, received, command in read_recording(path):
+    if speed:
+      delay = start + offset/speed - _clock()
+      if delay > 0:
+        time.sleep(delay)
+    commands += 1
+    if is_async:
+      futures.append(client.send_async(command))
+      continue
+    sent = _clock()
+    client.send(command)
+    replayed_latency += _clock() - sent
+    recorded_latency += seconds
+  for future in futures:
+    future.result()
+  return {"commands": commands, "seconds": _clock() - start,
+          "recorded_latency": recorded_latency, "replayed_latency": replayed_latency}
+
+
+class Client(object):
   """ An interface to a running kst session. 
 
   A client provides a connection to a running kst session.
@@ -48,27 +791,57 @@ class Client:
   Alternatively, the constructor for every class inside pykst accepts
   an instance of Client which it uses to interact with a kst session.
 
+  If kst has to be started, the client waits up to ``timeout`` seconds
+  for it to be ready (see :func:`start_kst`).
+
   To connect to a kst session named ``kstSession`` (starting kst if necessary)::
 
       import pykst as kst
       client = kst.Client("kstSession")
 
+  Each client has its own connection, and kst keeps the state of each
+  connection (such as the object being edited) apart, so any number of
+  clients, in different threads or processes, can feed the same kst
+  session at once.  A single client must not be used by more than one
+  thread at a time: see :class:`ClientPool` for that.
   """
   
-  def __init__(self,server_name="kstScript"):
-    self.ls=QtNetwork.QLocalSocket()
-    self.ls.connectToServer(server_name)
-    self.ls.waitForConnected(300)
+  def __init__(self,server_name="kstScript",timeout=30):
     self.server_name=server_name
+    try:
+      self.transport=_connect(server_name)
+    except EnvironmentError:
+      self.server_name, self.process = start_kst(server_name, timeout)
+      self.transport=_connect(self.server_name)
+
+    self.protocol = 1
+    self._batch = None
+    self._editing = None
+    self._pending = {}
+    self._next_request = 0
+    self._stats = None
+    self._recorder = None
+    self._cache = None
+    self._registry = {}
+    self.negotiate_protocol()
+
+  def negotiate_protocol(self):
+    """ Agree with kst on the newest wire protocol both understand.
+
+    With protocol 2 every command and reply is prefixed by its length,
+    so replies are read whole no matter how large they are.  Protocol 3
+    also tags each command with an id, which :meth:`send_async` needs.
+    kst sessions
+    which predate it answer "Unknown command!", and are spoken to in bare
+    text (protocol 1) as before.
+    """
+    reply = str(self.send("protocol("+b2str(PROTOCOL_VERSION)+")"))
+    try:
+      self.protocol = int(reply)
+    except ValueError:
+      self.protocol = 1
+    return self.protocol
 
-    if self.ls.state() == QtNetwork.QLocalSocket.UnconnectedState:
-      subprocess.Popen(["kst2","--serverName="+str(server_name)])
-      time.sleep(.5)
-
-      while self.ls.state()==QtNetwork.QLocalSocket.UnconnectedState:
-        self.ls.connectToServer(server_name)
-        self.ls.waitForConnected(300)
-    
   def send(self,command):
     """ Sends a command to kst and returns a response. 
     
@@ -77,17 +850,730 @@ class Client:
     list kst uses won't change. Instead use the convenience classes 
     included with pykst. 
     """
-    self.ls.write(command)
-    self.ls.flush()
-    self.ls.waitForReadyRead(300000)
-    x=self.ls.readAll()
-    return x
+    if self._cache is not None:
+      self._cache.sent(command)
+    if self._batch is not None:
+      reply = BatchReply(len(self._batch))
+      self._batch.append((command, reply))
+      return reply
+
+    if self._stats is not None or self._recorder is not None:
+      return self._observe(self._send, command)
+    return self._send(command)
+
+  def _observe(self, send, command):
+    """ Returns send(command), and records it in the statistics and recording, if any. """
+    start = _clock()
+    reply = send(command)
+    seconds = _clock() - start
+    received = reply.nbytes if hasattr(reply, "nbytes") else len(reply)
+    if self._stats is not None:
+      self._stats.record(command[:command.find("(")] if "(" in command else command,
+                         seconds, len(command), received)
+    if self._recorder is not None:
+      self._recorder.record(start, seconds, command, received)
+    return reply
+
+  def _send(self, command):
+    if self.protocol >= 2:
+      request = self._write_frame(command)
+      return self.transport.read(self._read_frame_size(request))
+
+    self.transport.write(command)
+    return self.transport.read_some()
+
+  def send_async(self, command):
+    """ Sends a command to kst without waiting for the response.
+
+    Returns a ``concurrent.futures.Future`` (on python 2 this needs the
+    ``futures`` package) for the response.  kst runs slow commands, such
+    as exports, after the commands which have already arrived, so those
+    are answered first.  The slow command itself still runs in kst's main
+    thread: while it runs, kst's window and every connection to it,
+    this one included, wait for it to finish.  What the script gains is
+    that it is free to get on with its own work meanwhile.  The future
+    gets its result when any later command on this client has been
+    answered, or when its ``result()`` is asked for.
+
+    To export every tab while the script gets the next job ready::
+
+      export = client.send_async("exportGraphics(plots.png,png,1280,1024,2)")
+      job = prepare_next_job()
+      export.result(timeout=600)
+
+    With kst sessions which predate protocol 3, and inside a batch, the
+    command is sent as with :meth:`send`, and the future is already done.
+    """
+    if self._batch is not None or self.protocol < 3:
+      from concurrent.futures import Future
+      future = Future()
+      future.set_result(self.send(command))
+      return future
+
+    ReplyFuture = _reply_future_type()
+    if self._cache is not None:
+      self._cache.sent(command)
+    if self._recorder is not None:
+      self._recorder.record(_clock(), 0.0, command, 0, RECORD_ASYNC)
+    request = self._write_frame(command)
+    future = self._pending[request] = ReplyFuture(self._connection(), request)
+    return future
+
+  def _receive(self, request):
+    """ Waits for the reply to the request sent with send_async(), and sets its future. """
+    data = self.transport.read(self._read_frame_size(request))
+    future = self._pending.pop(request, None)
+    if future is not None:
+      future.set_result(data)
+
+  def _receive_next(self):
+    """ Reads the next reply to arrive, which is to a request sent with send_async(), and sets its future. """
+    n, reply_to = struct.unpack(">II", self.transport.read(8))
+    data = self.transport.read(n)
+    future = self._pending.pop(reply_to, None)
+    if future is not None:
+      future.set_result(data)
+
+  def _connection(self):
+    """ The client whose connection commands go through: see :class:`ClientPool`. """
+    return self
+
+  @contextlib.contextmanager
+  def batch(self, hold_updates=False, replies=None):
+    """ Send every command issued inside the block to kst in one go.
+
+    Commands are queued rather than sent, and are all sent, and run in
+    order, when the block ends.  Replies to commands in the block (and so
+    the handles of objects created in it) are :class:`BatchReply`
+    placeholders until then: they can be passed to other commands in the
+    same block, but their values are only available once the block is over.
+    If the block raises an exception, nothing is sent.
+
+    To create and plot 100 curves in one round trip::
+
+      import pykst as kst
+      client = kst.Client()
+      with client.batch():
+        x = client.new_generated_vector(0, 1, 1000)
+        p = client.new_plot()
+        for i in range(100):
+          e = client.new_equation(x, "sin(x*"+str(i)+")")
+          p.add(client.new_curve(e.x(), e.y()))
+
+    Normally kst brings everything up to date after making each object.
+    With hold_updates, it does so once, after the whole batch, which
+    is much quicker when making many objects (see
+    :meth:`new_data_vectors`), but replies in the batch which read
+    values may not reflect the new objects.  This needs protocol 4:
+    with older kst sessions, hold_updates raises RuntimeError.  An inner
+    batch just joins the outer one, and its hold_updates is ignored.
+
+    replies, if given, is a list to which (command, reply) pairs for
+    every command in the batch are added once it has been sent, with
+    the replies as kst sent them.  Inner batches add nothing.
+    """
+    if self._batch is not None:
+      # already batching: just join the outer batch
+      yield
+      return
+    if hold_updates and self.protocol < 4:
+      raise RuntimeError("kst is too old to hold updates for a batch (it speaks protocol "
+                         + b2str(self.protocol) + ")")
+
+    self._batch = []
+    try:
+      yield
+    finally:
+      commands, self._batch = self._batch, None
+    self._send_batch(commands, hold_updates)
+    if replies is not None:
+      replies.extend((command, reply._reply) for command, reply in commands)
+
+  def _send_batch(self, commands, hold_updates=False):
+    """ Send queued (command, BatchReply) pairs, and resolve the replies. """
+    if not commands:
+      return
+    if self.protocol < 2:
+      # kst can not handle batches: send the commands one at a time,
+      # standing in for kst when it comes to ${n}.
+      handles = []
+      for command, reply in commands:
+        command = str(command)
+        if "${" in command:
+          for i in reversed(range(len(handles))):
+            command = command.replace("${"+b2str(i)+"}", handles[i])
+        reply._reply = str(self.send(command))
+        if reply._reply.startswith("Finished editing "):
+          handles.append(reply._reply[17:])
+        else:
+          handles.append(reply._reply)
+      return
+
+    payload = ""
+    for command, reply in commands:
+      command = str(command)
+      payload += struct.pack(">I", len(command)) + command
+    data = self.send(("transaction()" if hold_updates else "batch()") + payload)
+    pos = 0
+    for command, reply in commands:
+      n = struct.unpack(">I", data[pos:pos+4])[0]
+      reply._reply = data[pos+4:pos+4+n]
+      pos += 4+n
+
+  def end_edit(self):
+    """ Sends endEdit() and returns the handle of the object that was being edited.
+
+    You should never need to use this directly.
+    """
+    reply = self.send("endEdit()")
+    if isinstance(reply, BatchReply):
+      reply.is_handle = True
+      return reply
+    handle = reply[reply.find("ing ")+4:]
+    if self._cache is not None:
+      self._cache.values[handle] = {"name()": handle}
+    return handle
+
+  def get_binary_array(self, command):
+    """ Sends a command which replies with raw data, and returns the data as a numpy array.
+
+    The reply is read straight from the socket into a float64 array
+    of shape (nx, ny).  This needs protocol 2.  You should never need
+    to use this directly.
+    """
+    if self._batch is not None:
+      raise RuntimeError("arrays can not be read inside a batch")
+    if self._stats is not None or self._recorder is not None:
+      return self._observe(self._get_binary_array, command)
+    return self._get_binary_array(command)
+
+  def _get_binary_array(self, command):
+    n = self._read_frame_size(self._write_frame(command))
+    if n >= 8:
+      header = self.transport.read(8)
+      nx, ny = struct.unpack(">II", header)
+      if n == 8 + 8*nx*ny:
+        import numpy
+        array = numpy.empty(nx*ny, dtype = numpy.float64)
+        self.transport.read_into(array.view(numpy.uint8))
+        return array.reshape((nx, ny))
+      n -= 8
+    else:
+      header = ""
+    # not an array: kst is complaining
+    raise ValueError(header + self.transport.read(n))
+
+  def new_shared_array(self, shape):
+    """ Returns a float64 numpy array in shared memory, for loading large data sets into kst.
+
+    The values live in a memory mapped file (under /dev/shm where there
+    is one).  Loading the array into an editable vector or matrix only
+    sends kst the name of the file, and kst copies the values in with a
+    single memcpy: nothing goes through the socket, and no second copy
+    is made in python.  Slices and other views are treated like any
+    other numpy array.
+
+    To load 200 million samples::
+
+      a = client.new_shared_array(200000000)
+      a[:] = numpy.random.randn(len(a))
+      v = client.new_editable_vector(a)
+    """
+    return _shared_array_type()(shape)
+
+  def get_shared_array(self, handle):
+    """ Has kst copy the values of a vector or matrix into shared memory, and returns them.
+
+    The array is a read-only view of the shared memory, so nothing is
+    copied on the python side.  Vectors come back 1D, matrices with
+    shape (nx, ny).  You should never need to use this directly.
+    """
+    if self._batch is not None:
+      raise RuntimeError("arrays can not be read inside a batch")
+    import numpy
+    import tempfile
+    fd, path = tempfile.mkstemp(prefix="pykst-", dir=SHARED_MEMORY_DIR)
+    try:
+      reply = str(self.send_si(handle, "storeShared("+path+")"))
+      try:
+        dims = tuple(map(int, reply.split()))
+      except ValueError:
+        raise ValueError(reply)
+      nbytes = 8*int(numpy.prod(dims))
+      if nbytes == 0:
+        array = numpy.empty(dims, dtype = numpy.float64)
+      else:
+        buf = mmap.mmap(fd, nbytes, access = mmap.ACCESS_READ)
+        array = numpy.frombuffer(buf, dtype = numpy.float64).reshape(dims)
+    finally:
+      os.close(fd)
+      os.remove(path)
+    array.flags.writeable = False
+    return array
+
+  def get_properties(self, handle):
+    """ Reads every property of an object in one go: see :meth:`NamedObject.properties`.
+
+    Returns a dict mapping the names of kst's commands which read the
+    properties (``sampleRate``, ``fftLength`` ...) to their replies, as
+    strings.  With :meth:`enable_cache`, the replies are cached as if
+    each command had been sent.  You should never need to use this
+    directly.
+    """
+    if self._batch is not None:
+      raise RuntimeError("properties can not be read inside a batch")
+    if self._cache is not None:
+      # the serial first, so that any change after it is noticed by the next check
+      with self.batch():
+        serial = self.send("changeSerial("+b2str(handle)+")")
+        reply = self.send_si(handle, "properties()")
+      serial, reply = serial.result().split("\n")[0], reply.result()
+    else:
+      reply = str(self.send_si(handle, "properties()"))
+    if "\t" not in reply:
+      raise ValueError(reply)
+    properties = {}
+    for line in reply.split("\n"):
+      if line:
+        getter, value = line.split("\t", 1)
+        properties[getter] = _unescape_property(value)
+    if self._cache is not None:
+      self._cache.getters[b2str(handle)] = frozenset(properties)
+      self._cache.values.setdefault(b2str(handle), {}).update(
+        (getter+"()", value) for getter, value in properties.items())
+      self._cache.serials[b2str(handle)] = serial
+      self._cache.listed.pop(b2str(handle), None)
+    return properties
+
+  def get_statistics(self, command):
+    """ Sends Vector::stats() or Matrix::stats(), and returns the statistics as a dict of numbers.
+
+    See :meth:`VectorBase.stats`.  You should never need to use this directly.
+    """
+    if self._batch is not None:
+      raise RuntimeError("statistics can not be read inside a batch")
+    reply = str(self.send(command))
+    if "\t" not in reply:
+      raise ValueError(reply)
+    stats = {}
+    for line in reply.split("\n"):
+      if line:
+        key, value = line.split("\t", 1)
+        stats[_STATISTICS.get(key, key)] = int(value) if key in ("length", "nans") else float(value)
+    return stats
+
+  def objects(self, kind=None):
+    """ Returns every object in the kst session, each as an instance of its own pykst class, in one round trip.
+
+    Vectors, matrices, scalars, strings, data objects (curves, equations,
+    fits...) and view items (plots, labels...) are all included, outputs
+    of data objects too.  If kind is given (a pykst class, such as
+    :class:`Curve` or :class:`VectorBase`), only objects of that kind are
+    returned.  The same object is returned for the same kst object each
+    time, and with :meth:`enable_cache` their names, lengths and values
+    come cached.  To attach to a session and restyle every curve::
+
+      client = kst.Client("kstSession")
+      for c in client.objects(kst.Curve):
+        c.set_line_width(2)
+    """
+    registry = {}
+    found = [self._register(record, registry) for record in self._get_objects("getObjects()")]
+    self._registry = registry
+    if kind is not None:
+      found = [obj for obj in found if isinstance(obj, kind)]
+    return found
+
+  def object(self, handle):
+    """ Returns the object handle (its name or short name) as an instance of its own pykst class.
+
+    Objects seen by :meth:`objects`, asked for by the handles it gave
+    them, cost nothing; others one round trip.  ValueError is raised if
+    kst has no such object.
+    """
+    handle = b2str(handle)
+    obj = self._registry.get(handle)
+    if obj is None:
+      obj = self._register(self._get_objects("getObjects("+handle+")")[0], self._registry)
+      self._registry[handle] = obj
+    return obj
+
+  def lookup(self, name):
+    """ Returns the object called name (its name, short name or descriptive name), or None.
+
+    Unlike :meth:`object`, this always asks kst, which finds the object
+    by its short name without searching, so it is as quick in a session
+    of a hundred thousand vectors as in one of ten.
+    """
+    name = b2str(name)
+    try:
+      records = self._get_objects("getObjects("+name+")")
+    except ValueError:
+      return None
+    obj = self._register(records[0], self._registry)
+    self._registry[name] = obj
+    return obj
+
+  def find(self, pattern, kind=None):
+    """ Returns the objects whose names match pattern, such as ``"*TEMP*"``, ignoring case.
+
+    kind is a pykst class (:class:`VectorBase`, :class:`Curve`...) or one
+    of kst's names for kinds of object: a type such as ``"DataVector"``
+    or ``"Plot"``, or ``"vector"``, ``"matrix"``, ``"scalar"``,
+    ``"string"``, ``"relation"``, ``"dataobject"`` or ``"viewitem"``.
+    kst does the matching, and sends only the matches::
+
+      temperatures = client.find("*TEMP*", kind="vector")
+    """
+    if isinstance(kind, type):
+      found = self._find(pattern, _FAMILIES.get(kind.__name__, ""))
+      return [obj for obj in found if isinstance(obj, kind)]
+    return self._find(pattern, kind or "")
+
+  def _find(self, pattern, kind):
+    """ Sends findObjects(), and returns the pykst objects in its reply. """
+    return [self._register(record, self._registry)
+            for record in self._get_objects("findObjects("+kind+","+b2str(pattern)+")")]
+
+  def vectors(self):
+    """ Returns every vector in the kst session: see :meth:`objects`. """
+    return self.objects(VectorBase)
+
+  def matrices(self):
+    """ Returns every matrix in the kst session: see :meth:`objects`. """
+    return self.objects(Matrix)
+
+  def scalars(self):
+    """ Returns every scalar in the kst session: see :meth:`objects`. """
+    return self.objects(Scalar)
+
+  def strings(self):
+    """ Returns every string in the kst session: see :meth:`objects`. """
+    return self.objects(String)
+
+  def curves(self):
+    """ Returns every curve in the kst session: see :meth:`objects`. """
+    return self.objects(Curve)
+
+  def plots(self):
+    """ Returns every plot in the kst session: see :meth:`objects`. """
+    return self.objects(Plot)
+
+  def _get_objects(self, command):
+    """ Sends getObjects() and returns its reply as lists of fields. """
+    if self._batch is not None:
+      raise RuntimeError("objects can not be listed inside a batch")
+    if self._cache is not None:
+      # the objects' serials are not listed, so the check after this one compares kst's
+      with self.batch():
+        serial = self.send("changeSerial()")
+        reply = self.send(command)
+      self._cache.listing, reply = serial.result(), reply.result()
+    else:
+      reply = str(self.send(command))
+    if not reply.strip():
+      return []
+    if "\t" not in reply:
+      raise ValueError(reply)
+    return [[_unescape_property(field) for field in line.split("\t")]
+            for line in reply.split("\n") if line]
+
+  def _register(self, record, registry):
+    """ The pykst object for a line of the reply to getObjects(), added to registry. """
+    type_name, handle, descriptive_name, provider, detail = record[:5]
+    cls = _object_class(type_name, detail)
+    obj = self._registry.get(handle)
+    if type(obj) is not cls:
+      obj = cls.__new__(cls)
+      NamedObject.__init__(obj, self)
+      obj.handle = handle
+    registry[handle] = obj
+    if self._cache is not None:
+      values = self._cache.values.setdefault(handle, {})
+      values["name()"] = handle
+      self._cache.listed[handle] = self._cache.listing
+      if isinstance(obj, (VectorBase, Matrix)):
+        values["length()"] = detail
+      elif isinstance(obj, (Scalar, String)):
+        values["value()"] = detail
+    return obj
+
+  def _write_frame(self, payload):
+    """ Sends payload prefixed by its length, and with protocol 3 a request id, which is returned. """
+    if self.protocol < 3:
+      self.transport.write(struct.pack(">I", len(payload)))
+      self.transport.write(payload)
+      return None
+    request = self._next_request
+    self._next_request = (request + 1) & 0xffffffff
+    self.transport.write(struct.pack(">II", len(payload), request))
+    self.transport.write(payload)
+    return request
+
+  def _read_frame_size(self, request=None):
+    """ Reads the length at the start of the reply to request.
+
+    With protocol 3, replies to other requests which come first are
+    read whole and handed to their futures.
+    """
+    if self.protocol < 3:
+      return struct.unpack(">I", self.transport.read(4))[0]
+    while True:
+      n, reply_to = struct.unpack(">II", self.transport.read(8))
+      if reply_to == request:
+        return n
+      data = self.transport.read(n)
+      future = self._pending.pop(reply_to, None)
+      if future is not None:
+        future.set_result(data)
     
   def send_si(self, handle, command):
+    """ Sends a command to the script interface of the object with the given handle.
+
+    Outside of :meth:`editing`, this costs a beginEdit() and an endEdit()
+    on top of the command itself.  With :meth:`enable_cache`, reads
+    of properties are answered from the cache where they can be: those
+    of the getters which the object's properties() lists, which are
+    all read the first time any command without arguments is sent to
+    the object.
+    """
+    cache = self._cache
+    if cache is not None and self._batch is None and command.endswith("()") and command != "properties()":
+      handle = b2str(handle)
+      cache.check(self)
+      if handle not in cache.getters or (cache.getters[handle] and handle not in cache.serials):
+        try:
+          self.get_properties(handle)
+        except ValueError:
+          cache.getters[handle] = frozenset()
+      if command[:-2] in cache.getters[handle]:
+        values = cache.values.setdefault(handle, {})
+        reply = values.get(command)
+        if reply is None:
+          with self.editing(handle):
+            cache.reading = True
+            try:
+              reply = values[command] = self.send(command)
+            finally:
+              cache.reading = False
+        return reply
+    with self.editing(handle):
+      return self.send(command)
+
+  @contextlib.contextmanager
+  def editing(self, obj):
+    """ Keep the script interface of an object open for the whole block.
+
+    Normally each property of an object which is set or read through
+    :meth:`send_si` opens (beginEdit) and closes (endEdit) the object's
+    interface around the command.  Inside the block, the interface is
+    opened once at the start and closed once at the end, so setting
+    eight properties costs ten round trips rather than twenty four.
+    kst only updates the object when the block ends.
+
+    :param obj: the object to edit, or its handle.
+
+    Commands for other objects can still be sent inside the block, but
+    each of them closes and reopens the interface.  Objects can not be
+    created inside the block.
+
+    To style a curve c1::
+
+      with client.editing(c1):
+        c1.set_color("blue")
+        c1.set_line_width(2)
+        c1.set_has_points(True)
+    """
+    if isinstance(obj, NamedObject):
+      obj = obj.handle
+    handle = b2str(obj)
+    if handle == self._editing:
+      yield
+      return
+
+    outer = self._editing
+    if outer is not None:
+      self.send("endEdit()")
     self.send(b2str("beginEdit("+handle+")"))
-    x = self.send(command)
-    self.send(b2str("endEdit()"))
-    return x
+    self._editing = handle
+    try:
+      yield
+    finally:
+      self._editing = outer
+      self.send(b2str("endEdit()"))
+      if outer is not None:
+        self.send(b2str("beginEdit("+outer+")"))
+
+  def enable_stats(self, hook=None):
+    """ Starts recording the count, latency and size of every command sent, by verb.
+
+    :param hook: called as ``hook(verb, seconds, bytes_sent, bytes_received)``
+                 after every command, e.g. to feed a metrics system.
+
+    Returns the :class:`CommandStats` which does the recording.  Until
+    this is called, nothing is recorded, and sending a command costs no
+    more than a couple of tests of ``None``.
+    """
+    self._stats = CommandStats(hook)
+    return self._stats
+
+  def disable_stats(self):
+    """ Stops recording statistics, and forgets them. """
+    self._stats = None
+
+  def stats(self):
+    """ Returns what has been recorded since :meth:`enable_stats`.
+
+    This is a dict mapping each command verb (``setColor``, ``newCurve``,
+    ``batch`` ...) to a dict of its ``count``, the total and maximum
+    wall clock time in ``seconds`` and ``max_seconds``, ``bytes_sent``,
+    ``bytes_received``, and ``histogram``, the number of calls whose
+    latency fell in each of the buckets of :attr:`CommandStats.BUCKETS`.
+    It is empty if statistics are not being recorded.
+    """
+    if self._stats is None:
+      return {}
+    return self._stats.snapshot()
+
+  @contextlib.contextmanager
+  def profile(self, out=None):
+    """ Records statistics for the commands sent in the block, and prints a report at its end.
+
+    The report (on stderr unless out, a file, is given) lists each
+    command verb, the one which took the longest first.  To find what a
+    slow script spends its time on::
+
+      with client.profile():
+        run_my_script(client)
+    """
+    outer = self._stats
+    # commands in the block still count towards any statistics already being recorded
+    stats = self.enable_stats(outer.record if outer is not None else None)
+    try:
+      yield stats
+    finally:
+      self._stats = outer
+      (out or sys.stderr).write(stats.report()+"\n")
+
+  def start_recording(self, path):
+    """ Starts writing every command sent to the file path, for :func:`replay`.
+
+    Each command is written with when it was sent, how long kst took to
+    answer, and the size of the command and of the reply.  The file is
+    compressed if path ends with ``.gz``.  Returns the
+    :class:`CommandRecorder`.
+    """
+    self.stop_recording()
+    self._recorder = CommandRecorder(path)
+    return self._recorder
+
+  def stop_recording(self):
+    """ Stops recording commands, and closes the recording. """
+    recorder, self._recorder = self._recorder, None
+    if recorder is not None:
+      recorder.close()
+
+  @contextlib.contextmanager
+  def recording(self, path):
+    """ Records the commands sent in the block to the file path.
+
+    To capture a session, and play it back later at twice the speed
+    with ``pykst-replay --speed 2 session.rec.gz``::
+
+      with client.recording("session.rec.gz"):
+        run_dashboard(client)
+    """
+    self.start_recording(path)
+    try:
+      yield
+    finally:
+      self.stop_recording()
+
+  def enable_cache(self, max_age=1.0):
+    """ Starts caching the properties read from objects (names, colors, sizes...).
+
+    Reading a property through :meth:`send_si` costs three round trips.
+    With the cache, reading it again costs none until something changes.
+    Only the getters listed by an object's properties() are cached, and
+    the first read from an object reads them all.  Setting a property of
+    an object forgets what was cached of that object alone; other
+    commands forget everything.  kst keeps a serial for each object,
+    which changes with it, and the serials of all the cached objects
+    are checked in one round trip before the first read after this
+    client changes anything, and otherwise at most once every
+    ``max_age`` seconds: reads may be that much out of date with respect
+    to other clients, new data and the GUI.  Only the objects which
+    have changed are read again.  View items keep no serials, so any
+    change at all has them read again, and changes to them made in
+    kst's dialogs, and zooming, are only noticed along with the next
+    change to anything else.
+
+    Returns False, and caches nothing, if kst predates change serials.
+
+    To keep a status display of hundreds of objects up to date without
+    loading kst::
+
+      client.enable_cache()
+      while True:
+        show_status([(c.name(), c.color()) for c in curves])
+        time.sleep(1)
+    """
+    if self._batch is not None:
+      raise RuntimeError("the cache can not be enabled inside a batch")
+    self._cache = None
+    try:
+      serial = int(self.send("changeSerial()"))
+    except ValueError:
+      return False
+    self._cache = PropertyCache(max_age, serial)
+    return True
+
+  def disable_cache(self):
+    """ Stops caching properties, and forgets them. """
+    self._cache = None
+
+  def invalidate_cache(self):
+    """ Forgets every cached property, so that they are all read from kst again. """
+    if self._cache is not None:
+      self._cache.clear()
+
+  def enable_server_timings(self, enabled=True):
+    """ Has kst start (or stop) timing the work it does: see :meth:`server_timings`. """
+    self.send("setTimingsEnabled("+b2str(bool(enabled)).lower()+")")
+
+  def server_timings(self, reset=False):
+    """ Returns how long kst has spent on what since :meth:`enable_server_timings`.
+
+    This tells whether a session which falls behind live data is held up
+    by reading data sources, by computing data objects or by painting.
+    The result maps each category to a dict, which maps names to dicts of
+    ``count``, ``seconds`` (in total) and ``max_seconds``.  The categories
+    are:
+
+      ``exec``: script commands, by command
+      ``update``: update cycles, which update everything that changed
+      ``datasource``: checks for new data, by data source
+      ``object``: updates, by object (vectors read from data sources,
+                  equations, spectra, histograms, plugins...)
+      ``plot``: painting, by plot
+
+    :param reset: if True, kst starts counting again from zero.
+    """
+    timings = {}
+    for line in str(self.send("getTimings()")).strip().split("\n"):
+      if not line:
+        continue
+      category, name, count, seconds, max_seconds = line.split("\t")
+      timings.setdefault(category, {})[name] = {"count": int(count),
+                                                "seconds": float(seconds),
+                                                "max_seconds": float(max_seconds)}
+    if reset:
+      self.send("resetTimings()")
+    return timings
+
+  def close(self):
+    """ Closes the connection to kst.  The kst session keeps running. """
+    self.transport.close()
 
   def testCommand(self):
     self.send("testCommand()")
@@ -97,7 +1583,38 @@ class Client:
     
     Equivalent to file->close from the menubar inside kst.  
     """
+    self._registry = {}
     self.send("clear()")
+
+  def delete(self, objs):
+    """ Deletes objs (an object, or a list of objects or names) from kst, with one command.
+
+    Objects which depend on them (curves of deleted vectors, say) go
+    too, as when deleting in the data manager.  Returns the number of
+    objects found and deleted.  To keep a dashboard which remakes its
+    curves every cycle from filling up::
+
+      client.delete(old_curves)
+    """
+    if isinstance(objs, (NamedObject, str)):
+      objs = [objs]
+    handles = [b2str(obj.handle if isinstance(obj, NamedObject) else obj) for obj in objs]
+    if not handles:
+      return 0
+    for handle in handles:
+      self._registry.pop(handle, None)
+    reply = self.send("eliminateObjects("+"|".join(handles)+")")
+    return reply if isinstance(reply, BatchReply) else int(reply)
+
+  def prune_unused(self):
+    """ Deletes every vector, scalar, data object... which no plot shows and nothing shown depends on.
+
+    This is the data manager's Purge button.  Returns the number of
+    objects deleted.
+    """
+    self._registry = {}
+    reply = self.send("purge()")
+    return reply if isinstance(reply, BatchReply) else int(reply)
     
   def open_kst_file(self, filename):
     """ open a .kst file in kst. """
@@ -107,7 +1624,7 @@ class Client:
     """ save a .kst file in kst. """
     self.send("fileSave("+b2str(filename)+")")
 
-  def export_graphics_file(self, filename, format=None, width=1280, height=1024, display = 2):
+  def export_graphics_file(self, filename, format=None, width=1280, height=1024, display = 2, wait=True):
       """
       export the kst session as a set of graphics files.
 
@@ -126,13 +1643,19 @@ class Client:
 
       If there is more than one tab, each tab is in a separate file, named
       filename_1.ext, etc.
+
+      If *wait* is False, returns at once with a future which is done
+      when the export is (see :meth:`send_async`).
       """
 
       if format is None:
           format = os.path.splitext(filename)[1][1:].strip().lower()
 
-      self.send("exportGraphics("+str(filename)+","+str(format)+","+str(width)+","+
-                str(height)+","+str(display)+")")
+      command = ("exportGraphics("+str(filename)+","+str(format)+","+str(width)+","+
+                 str(height)+","+str(display)+")")
+      if not wait:
+        return self.send_async(command)
+      self.send(command)
 
 
   def screen_back(self):
@@ -180,6 +1703,21 @@ class Client:
     """
     self.send("renameTab("+new_name+")")
 
+  def current_tab(self):
+    """ Get the index of the current tab. """
+    return self.send("currentTab()")
+
+  def tab_text(self):
+    """ Get the text of the current tab. """
+    return self.send("tabText()")
+
+  def close_tab(self):
+    """ Close the current tab, and the plots and other view items in it.
+
+    If it was the only tab, an empty one takes its place.
+    """
+    self.send("closeTab()")
+
   def cleanup_layout(self, columns="Auto"):
     """ Cleanup layout in the current tab.
     
@@ -282,6 +1820,29 @@ class Client:
     """
     return DataVector(self, "", "", name=name, new=False)
 
+  def new_data_vectors(self, filename, fields, start=0, num_frames=-1,
+                       skip=0, boxcarFirst=False, names=None):
+    """ Create a DataVector in kst for each of fields, all read from filename the same way.
+
+    This takes one round trip and (from kst sessions which speak
+    protocol 4) one update of kst, rather than several round trips and an
+    update for each vector.  names, if given,
+    are the names of the vectors, in the same order as fields.  To load
+    every field of a dirfile::
+
+      import pykst as kst
+      client = kst.Client()
+      vectors = client.new_data_vectors("data.dirfile", fields)
+
+    Returns the vectors, as a list.  See :class:`DataVector`.
+    """
+    fields = list(fields)
+    names = [""]*len(fields) if names is None else list(names)
+    with self.batch(hold_updates=self.protocol >= 4):
+      vectors = [DataVector(self, filename, field, start, num_frames, skip, boxcarFirst, name)
+                 for field, name in zip(fields, names)]
+    return vectors
+
   def new_generated_vector(self, x0, x1, n, name=""):
     """ Create a New GeneratedVector in kst.
     
@@ -364,6 +1925,24 @@ class Client:
     """
     return Curve(self, "", "", name, new=False)
 
+  def new_curves(self, x_vector, y_vectors, names=None):
+    """ Create a Curve in kst for each of y_vectors, in one round trip and one update of kst.
+
+    x_vector is the x vector of every curve, or a list of them, one
+    for each curve.  Returns the curves, as a list.  To plot every
+    channel against time::
+
+      curves = client.new_curves(time, client.new_data_vectors("data.dirfile", fields))
+
+    See :class:`Curve`.
+    """
+    y_vectors = list(y_vectors)
+    x_vectors = list(x_vector) if isinstance(x_vector, (list, tuple)) else [x_vector]*len(y_vectors)
+    names = [""]*len(y_vectors) if names is None else list(names)
+    with self.batch(hold_updates=self.protocol >= 4):
+      curves = [Curve(self, x, y, name) for x, y, name in zip(x_vectors, y_vectors, names)]
+    return curves
+
   def new_image(self, matrix, name=""):
     """ Create a new Image in kst.
     
@@ -393,6 +1972,17 @@ class Client:
     """
     return Equation(self, "", "", name, new=False)
 
+  def new_equations(self, x_vector, equations, names=None):
+    """ Create an Equation in kst for each of equations, all of x_vector, in one round trip and one update.
+
+    Returns the equations, as a list.  See :class:`Equation`.
+    """
+    equations = list(equations)
+    names = [""]*len(equations) if names is None else list(names)
+    with self.batch(hold_updates=self.protocol >= 4):
+      made = [Equation(self, x_vector, equation, name) for equation, name in zip(equations, names)]
+    return made
+
   def new_histogram(self, vector, bin_min=0, bin_max=1, num_bins=60, 
                     normalization = 0, auto_bin = True,  name=""):
     """ Create a new histogram in kst.
@@ -662,6 +2252,178 @@ class Client:
     """
     return Plot(self, name = name, new=False)
 
+  def apply_spec(self, spec):
+    """ Make the objects, plots and tabs described by spec, in one round trip and one update of kst.
+
+    spec is a dict (read from a JSON file, say) with any of:
+
+      datasources   data sources, by name: the options for reading their vectors
+                    which new_data_vector takes (filename, start, num_frames, skip,
+                    boxcarFirst)
+      vectors       vectors, by name: data vectors, unless they say otherwise
+      data_objects  equations, spectra, fits and so on, by name
+      curves        curves, by name
+      tabs          a list of tabs, each with an optional "name", the
+                    "plots" in it, as a list, and optionally the "columns"
+                    to lay them out in (see :meth:`cleanup_layout`)
+
+    Each object is made by the client's new_<type> method, where type is
+    its "type" ("data_vector" for vectors and "curve" for curves if not
+    given; say "equation", "spectrum" and so on for data objects), passing
+    the settings which are arguments of that method, and named after its
+    name in spec.  Each other setting calls the object's set_<setting>
+    method with the value (or values, if it is a list).  A vector with a
+    "source" also has the settings of that data source.  Plots are made
+    the same way, by new_plot, and also take "curves" (the curves and
+    images to put in them) and "legend".
+
+    Where a setting is the name of an object in spec, it stands for that
+    object, and "name.method" for what that method of the object returns.
+    Objects can refer to each other in any order.  A small dashboard::
+
+      spec = {
+        "datasources": {"d": {"filename": "data.dirfile", "num_frames": 1000}},
+        "vectors": {"t": {"source": "d", "field": "INDEX"},
+                    "a": {"source": "d", "field": "A"}},
+        "data_objects": {"psd": {"type": "spectrum", "vector": "a", "fft_length": 12}},
+        "curves": {"a_t": {"x_vector": "t", "y_vector": "a", "color": "red"},
+                   "a_psd": {"x_vector": "psd.x", "y_vector": "psd.y"}},
+        "tabs": [{"name": "Channel A", "columns": 1,
+                  "plots": [{"curves": ["a_t"], "left_label": "Volts"},
+                            {"curves": ["a_psd"], "log_y": True, "legend": True}]}],
+      }
+      objects = client.apply_spec(spec)
+
+    The first tab is the current one, and the rest are new.  Returns a
+    dict of the objects made, by their names in spec, including the plots
+    which have a "name".  If spec is wrong, an exception is raised and
+    nothing is sent to kst.
+
+    This is not atomic.  Everything is sent as one batch, which kst runs
+    command by command, holding its updates until the end (with kst
+    sessions which speak protocol 4).  kst redraws its window once, after
+    the batch, but it does not undo the commands which ran if a later
+    one fails.  If any reply says a command failed, apply_spec deletes
+    the objects, plots and legends it made, closes the tabs it added,
+    gives the current tab back its name, and raises RuntimeError (kst
+    sessions older than protocol 4 can not report their tabs, so there
+    the tabs are left as they are).  Nothing can be undone if the
+    connection to kst is lost.  Inside another batch, replies are not
+    known, so nothing is checked.
+    """
+    sources = spec.get("datasources", {})
+    entries = {}
+    for section, default in _SPEC_SECTIONS:
+      for key, entry in spec.get(section, {}).items():
+        if key in entries:
+          raise ValueError("two objects in spec are named " + key)
+        entry = dict(entry)
+        if "source" in entry:
+          if entry["source"] not in sources:
+            raise ValueError(key + " in spec has an unknown source: " + entry["source"])
+          options = dict(sources[entry.pop("source")])
+          options.update(entry)
+          entry = options
+        entry.setdefault("type", default)
+        if entry["type"] is None:
+          raise ValueError(key + " in spec has no type")
+        entries[key] = entry
+
+    objects = {}
+    found = {}
+    made = []
+    def value_of(setting, value):
+      if setting in _SPEC_LITERALS:
+        return value
+      if isinstance(value, (list, tuple)):
+        return tuple(value_of(None, item) for item in value)
+      if isinstance(value, basestring):
+        if value in objects:
+          return objects[value]
+        key, dot, method = value.partition(".")
+        if dot and key in objects:
+          if value not in found:
+            found[value] = getattr(objects[key], method)()
+          return found[value]
+      return value
+
+    def make(key, entry, name):
+      import inspect
+      factory = getattr(self, "new_" + entry["type"], None)
+      if factory is None:
+        raise ValueError(key + " in spec has an unknown type: " + entry["type"])
+      arguments = inspect.getargspec(factory).args[1:]
+      kwargs = {"name": name} if "name" in arguments else {}
+      settings = []
+      for setting, value in sorted(entry.items()):
+        if setting in arguments:
+          kwargs[str(setting)] = value_of(setting, value)
+        elif setting != "type":
+          settings.append((setting, value))
+      obj = factory(**kwargs)
+      made.append(obj)
+      for setting, value in settings:
+        setter = getattr(obj, "set_" + setting, None)
+        if setter is None:
+          raise ValueError(key + " in spec has an unknown setting: " + setting)
+        value = value_of(setting, value)
+        if isinstance(value, tuple):
+          setter(*value)
+        else:
+          setter(value)
+      return obj
+
+    replies = []
+    tabs = None
+    with self.batch(hold_updates=self.protocol >= 4, replies=replies):
+      if spec.get("tabs") and self.protocol >= 4:
+        tabs = (self.tab_count(), self.current_tab(), self.tab_text())
+      for key in _spec_order(entries):
+        objects[key] = make(key, entries[key], key)
+      for i, tab in enumerate(spec.get("tabs", [])):
+        if i:
+          self.new_tab()
+        if "name" in tab:
+          self.set_tab_text(tab["name"])
+        for entry in tab.get("plots", []):
+          entry = dict(entry, type="plot")
+          relations = entry.pop("curves", [])
+          legend = entry.pop("legend", False)
+          name = entry.get("name", "")
+          if name in objects:
+            raise ValueError("two objects in spec are named " + name)
+          plot = make(name or "a plot", entry, name)
+          for relation in relations:
+            if relation not in objects:
+              raise ValueError((name or "a plot") + " in spec shows an unknown curve: " + relation)
+            plot.add(objects[relation])
+          if legend:
+            made.append(self.new_legend(plot))
+          if name:
+            objects[name] = plot
+        if "columns" in tab:
+          self.cleanup_layout(tab["columns"])
+
+    # a tab's name is not a failure, whatever it says
+    checked = replies[len(tabs):] if tabs is not None else replies
+    failed = [(command, reply) for command, reply in checked if _FAILED_REPLY.match(b2str(reply))]
+    if failed:
+      self.delete(made)
+      if tabs is not None:
+        count, current, text = [reply.result() for reply in tabs]
+        added = int(self.tab_count()) - int(count)
+        with self.batch():
+          # new tabs go after the others
+          for i in range(added):
+            self.set_tab(count)
+            self.close_tab()
+          self.set_tab(current)
+          self.set_tab_text(text)
+      command, reply = failed[0]
+      raise RuntimeError("kst could not apply the spec (" + b2str(command) + " replied " + b2str(reply)
+                         + "), so what it made was removed")
+    return objects
+
   def set_datasource_option(self, option, value, filename, data_source="Ascii File"):
     """ Sets the value of a data source configuration option.
 
@@ -730,10 +2492,307 @@ class Client:
 
 
 
-class NamedObject:
+class KstServerPool(object):
+  """ Keeps kst sessions started ahead of time, so that clients need not wait for kst to start.
+
+  A KstServerPool starts ``size`` kst sessions in the background.
+  :meth:`checkout` hands out one which is ready, as a connected
+  :class:`Client`, and starts another to take its place.  ``command``
+  is how to run kst: to keep the sessions off screen, run them under a
+  virtual X server, for example ``("xvfb-run", "-a", "kst2")``.
+
+  Sessions which have been checked out belong to the caller, who should
+  :meth:`release` them when done.  :meth:`close` stops the sessions which
+  are still in the pool, or still starting::
+
+    import pykst as kst
+    pool = kst.KstServerPool(2)
+    for job in jobs:
+      with pool.session() as client:
+        run(job, client)
+    pool.close()
+  """
+  def __init__(self, size=2, command=("kst2",), prefix="kstPool", timeout=60):
+    import Queue
+    self.size = size
+    self.command = command
+    self.timeout = timeout
+    self._prefix = prefix+"-"+b2str(os.getpid())+"-"
+    self._count = 0
+    self._closed = False
+    self._lock = threading.Lock()
+    self._ready = Queue.Queue()
+    self._starting = {}
+    self._threads = []
+    for i in range(size):
+      self._start()
+
+  def _start(self):
+    """ Starts another session in the background. """
+    with self._lock:
+      self._count += 1
+      name = self._prefix+b2str(self._count)
+      thread = threading.Thread(target=self._run, args=(name,))
+      thread.daemon = True
+      self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+      thread.start()
+
+  def _started(self, name, process):
+    """ Notes the process of a session which is starting, or stops it if the pool is closed. """
+    with self._lock:
+      if not self._closed:
+        self._starting[name] = process
+        return
+    process.terminate()
+
+  def _run(self, name):
+    try:
+      ready = start_kst(name, self.timeout, self.command,
+                        started=lambda process: self._started(name, process))
+    except Exception as err:
+      ready = err
+    with self._lock:
+      self._starting.pop(name, None)
+      if not self._closed:
+        self._ready.put(ready)
+        return
+    if not isinstance(ready, Exception):
+      ready[1].terminate()
+      ready[1].wait()
+
+  def checkout(self, timeout=None):
+    """ Returns a Client connected to a ready kst session, and starts a new one for the pool.
+
+    Waits up to timeout seconds (by default, the pool's timeout) for a
+    session to be ready.  The kst process is the client's ``process``.
+    """
+    import Queue
+    if timeout is None:
+      timeout = self.timeout
+    try:
+      ready = self._ready.get(True, timeout)
+    except Queue.Empty:
+      raise IOError("no kst session was ready after "+b2str(timeout)+" seconds")
+    if not self._closed:
+      self._start()
+    if isinstance(ready, Exception):
+      raise ready
+    name, process = ready
+    client = Client(name)
+    client.process = process
+    return client
+
+  def release(self, client):
+    """ Stops a session which was checked out. """
+    client.close()
+    client.process.terminate()
+    client.process.wait()
+
+  @contextlib.contextmanager
+  def session(self, timeout=None):
+    """ Checks out a session for the duration of the block, and stops it afterwards. """
+    client = self.checkout(timeout)
+    try:
+      yield client
+    finally:
+      self.release(client)
+
+  def close(self):
+    """ Stops the sessions in the pool, and those still starting, and waits for them to exit. """
+    import Queue
+    with self._lock:
+      self._closed = True
+      starting = list(self._starting.values())
+      threads = list(self._threads)
+    for process in starting:
+      process.terminate()
+    for thread in threads:
+      thread.join()
+    while True:
+      try:
+        ready = self._ready.get_nowait()
+      except Queue.Empty:
+        break
+      if not isinstance(ready, Exception):
+        ready[1].terminate()
+        ready[1].wait()
+
+
+def _per_connection(name):
+  """ An attribute of a ClientPool which is really that of the calling thread's connection. """
+  return property(lambda self: getattr(self._connection(), name),
+                  lambda self, value: setattr(self._connection(), name, value))
+
+
+class _Lease(object):
+  """ A thread's hold on one of the connections of a :class:`ClientPool`.
+
+  The connection goes back to the pool when the lease is released, or
+  when the thread (and so its thread local lease) goes away.
+  """
+  def __init__(self, pool, client):
+    self.pool = pool
+    self.client = client
+
+  def release(self):
+    client, self.client = self.client, None
+    if client is not None:
+      self.pool._checkin(client)
+
+  def __del__(self):
+    self.release()
+
+
+class ClientPool(Client):
+  """ A client which may be used from many threads at once.
+
+  A ClientPool keeps up to ``size`` connections to the kst session
+  ``server_name``, and lends one to each thread which uses it, so that
+  threads never share a connection.  It can be used anywhere a
+  :class:`Client` can: objects created through it (or given it as their
+  client) send their commands through the connection of whichever
+  thread uses them.  A thread keeps its connection until it calls
+  :meth:`release` or ends.  If all the connections are taken, a thread
+  which needs one waits for up to ``timeout`` seconds.
+
+  To push updates to many vectors from a thread pool::
+
+    import pykst as kst
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = kst.ClientPool("dashboard", size=4)
+    vectors = [pool.editable_vector(name) for name in names]
+    with ThreadPoolExecutor(4) as executor:
+      for v, data in zip(vectors, channels):
+        executor.submit(v.load, data)
+  """
+
+  def __init__(self, server_name="kstScript", size=8, timeout=60):
+    self.server_name = server_name
+    self.size = size
+    self.timeout = timeout
+    self._local = threading.local()
+    self._available = threading.Condition(threading.Lock())
+    # the first connection starts kst if need be
+    self._idle = [Client(server_name)]
+    self._count = 1
+    self._stats = None
+    self._recorder = None
+    self._cache_max_age = None
+    self._registry = {}
+
+  transport = _per_connection("transport")
+  protocol = _per_connection("protocol")
+  _batch = _per_connection("_batch")
+  _editing = _per_connection("_editing")
+  _pending = _per_connection("_pending")
+  _next_request = _per_connection("_next_request")
+  _cache = _per_connection("_cache")
+
+  def _connection(self):
+    """ The connection of the calling thread, which it gets from the pool if it has none yet. """
+    lease = getattr(self._local, "lease", None)
+    if lease is None or lease.client is None:
+      lease = self._local.lease = _Lease(self, self._checkout())
+      # each connection keeps its own cache, of what it has read and changed
+      if self._cache_max_age is None:
+        lease.client._cache = None
+      elif lease.client._cache is None:
+        lease.client.enable_cache(self._cache_max_age)
+    return lease.client
+
+  def enable_cache(self, max_age=1.0):
+    """ Starts caching properties: see :meth:`Client.enable_cache`.
+
+    Each connection has a cache of its own, which it starts when a
+    thread next takes it from the pool.
+    """
+    if not Client.enable_cache(self, max_age):
+      return False
+    self._cache_max_age = max_age
+    return True
+
+  def disable_cache(self):
+    """ Stops caching properties, on each connection as a thread next takes it. """
+    self._cache_max_age = None
+    Client.disable_cache(self)
+
+  def _checkout(self):
+    """ Takes an idle connection, or makes a new one if there are fewer than size. """
+    deadline = time.time() + self.timeout
+    with self._available:
+      while not self._idle and self._count >= self.size:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          raise RuntimeError("all "+b2str(self.size)+" connections to kst are in use")
+        self._available.wait(remaining)
+      if self._idle:
+        return self._idle.pop()
+      self._count += 1
+    try:
+      return Client(self.server_name)
+    except Exception:
+      with self._available:
+        self._count -= 1
+        self._available.notify()
+      raise
+
+  def _checkin(self, client):
+    with self._available:
+      self._idle.append(client)
+      self._available.notify()
+
+  def release(self):
+    """ Gives the calling thread's connection back to the pool. """
+    lease = getattr(self._local, "lease", None)
+    if lease is not None:
+      if lease.client is not None and (lease.client._batch is not None or
+                                       lease.client._editing is not None):
+        raise RuntimeError("can not release a connection inside a batch or editing block")
+      lease.release()
+
+  def close(self):
+    """ Closes the connections which no thread holds.  The kst session keeps running. """
+    with self._available:
+      idle, self._idle = self._idle, []
+      self._count -= len(idle)
+    for client in idle:
+      client.close()
+
+
+class NamedObject(object):
     """ Convenience class. You should not use it directly."""
     def __init__(self,client):
       self.client=client
+
+    def _get_handle(self):
+      handle = self._handle
+      if isinstance(handle, BatchReply) and handle.done():
+        # created inside a batch which has since been sent
+        handle = self._handle = handle.result()
+      return handle
+
+    def _set_handle(self, handle):
+      self._handle = handle
+
+    handle = property(_get_handle, _set_handle)
+
+    def editing(self):
+      """ Set or read many properties of this object for the price of one edit.
+
+      See :meth:`Client.editing`.  To style a curve c1 in ten round trips::
+
+        with c1.editing():
+          c1.set_color("red")
+          c1.set_head_color("red")
+          c1.set_line_width(2)
+          c1.set_line_style(1)
+          c1.set_has_points(True)
+          c1.set_point_type(3)
+          c1.set_point_size(5)
+          c1.set_has_head(True)
+      """
+      return self.client.editing(self.handle)
       
     def set_name(self,name):
       """ Set the name of the object inside kst. """
@@ -743,6 +2802,21 @@ class NamedObject:
       """ Returns the name of the object from inside kst. """
       return self.client.send_si(self.handle, "name()")
 
+    def properties(self):
+      """ Returns every property of the object which kst can tell, as a dict, in one round trip.
+
+      The keys are the names of kst's commands which read the
+      properties, in lower case with underscores (``sample_rate``,
+      ``fft_length``, ``has_points``...).  Numbers and booleans are parsed;
+      everything else (names, colors, units...) is a string.  To dump the
+      state of a spectrum s1::
+
+        for key, value in sorted(s1.properties().items()):
+          print("%s: %s" % (key, value))
+      """
+      return dict((re.sub("([a-z0-9])([A-Z])", r"\1_\2", getter).lower(), _parse_property(value))
+                  for getter, value in self.client.get_properties(self.handle).items())
+
     def description_tip(self):
       """  Returns a string describing the object """
       return self.client.send_si(self.handle, "descriptionTip()")
@@ -760,6 +2834,10 @@ class Object(NamedObject) :
     """ Returns the type of the object from inside kst. """
     return self.client.send_si(self.handle, "type()")
 
+  def remove(self):
+    """ This removes the object, and everything which depends on it, from Kst. """
+    self.client.send("eliminate("+self.handle+")")
+
 
 class String(Object) :
   """ Convenience class. You should not use it directly."""
@@ -790,8 +2868,7 @@ class GeneratedString(String) :
 
     if (new == True):
       self.client.send("newGeneratedString()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_value(string)
       self.set_name(name)
@@ -823,8 +2900,7 @@ class DataSourceString(String) :
     
     if (new == True):
       self.client.send("newDataString()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.change(filename, field)
     else:
       self.handle = name
@@ -869,8 +2945,7 @@ class GeneratedScalar(Scalar) :
 
     if (new == True):
       self.client.send("newGeneratedScalar()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_value(value)
       self.set_name(name)
@@ -903,8 +2978,7 @@ class DataSourceScalar(Scalar) :
     
     if (new == True):
       self.client.send("newDataScalar()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.change(filename, field)
     else:
@@ -953,8 +3027,7 @@ class VectorScalar(Scalar) :
 
     if (new == True):    
       self.client.send("newVectorScalar()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.change(filename, field, frame)
     else:
@@ -1009,11 +3082,96 @@ class VectorBase(Object):
     """  Returns the maximum value in the vector. """
     return self.client.send_si(self.handle, "max()")
 
-  def get_numpy_array(self) :
-    """ get a numpy array which contains the kst vector values """
+  def stats(self):
+    """ Returns the summary statistics of the vector, as numbers, in one round trip.
+
+    The result is a dict of ``length``, ``nans`` (the number of samples
+    which are NaN or infinite), and the ``min``, ``max``, ``mean``,
+    ``rms``, ``sigma`` and ``min_positive`` (least positive value) of
+    the rest.  kst keeps these up to date anyway, so this is cheap
+    enough to poll many vectors often::
+
+      for v in channels:
+        if v.stats()["max"] > limit:
+          raise_alarm(v)
+    """
+    return self.client.get_statistics("Vector::stats("+b2str(self.handle)+")")
+
+  def __getitem__(self, key):
+    """ Reads some of the vector: ``v[i]`` is one sample, as a float, and
+    ``v[a:b:step]`` or ``v[indices]`` a numpy array of several.
+
+    Only the samples asked for are sent, so this is much cheaper than
+    ``get_numpy_array()[a:b]`` for a little of a long vector.  Indices
+    count back from the end if negative, as for lists.
+    """
+    if isinstance(key, slice):
+      return self._slice(key.start, key.stop, key.step)
+    if hasattr(key, "__index__"):
+      index = key.__index__()
+      values = self._slice(index, index + 1 if index != -1 else None, 1)
+      if len(values) == 0:
+        raise IndexError("vector index out of range")
+      return float(values[0])
+    return self.values(key)
+
+  def _slice(self, start, stop, step):
+    """ The samples of vector[start:stop:step], which kst picks out. """
+    if self.client.protocol < 2:
+      return self.get_numpy_array()[start:stop:step]
+    bounds = ["" if x is None else b2str(int(x)) for x in (start, stop, step)]
+    return self.client.get_binary_array("Vector::getBinarySlice("+",".join(bounds)+","+
+                                        self.handle+")").ravel()
+
+  def values(self, indices):
+    """ Returns the samples at indices (a list or numpy array of ints) as a numpy array.
+
+    Negative indices count back from the end.  IndexError is raised if
+    any index is outside the vector.
+    """
+    import numpy
+    indices = numpy.asarray(indices, dtype = numpy.int32).ravel()
+    if self.client.protocol < 2:
+      return self.get_numpy_array()[indices]
+    data = indices.tostring()
+    try:
+      return self.client.get_binary_array("Vector::getBinaryValues("+b2str(len(data))+","+
+                                          self.handle+")"+data).ravel()
+    except ValueError as e:
+      if str(e) == "Index out of range":
+        raise IndexError("vector index out of range")
+      raise
+
+  def tail(self, n):
+    """ Returns the last n samples of the vector (fewer if it is shorter) as a numpy array.
+
+    This is the cheap way to follow a vector which is being read from a
+    growing file::
+
+      latest = v.tail(100)
+    """
+    if n <= 0:
+      import numpy
+      return numpy.empty(0)
+    return self._slice(-n, None, None)
+
+  def get_numpy_array(self, shared = False) :
+    """ get a numpy array which contains the kst vector values
+
+    If shared is True, kst copies the values into shared memory and the
+    array is a read-only view of it, which is the fastest way to read
+    very long vectors.
+    """
+    if shared and self.client.protocol >= 2:
+      return self.client.get_shared_array(self.handle)
+    if self.client.protocol >= 2:
+      return self.client.get_binary_array("Vector::getBinaryArray("+self.handle+")").ravel()
+
+    import numpy
+    import tempfile
     with tempfile.NamedTemporaryFile() as f:
       self.client.send_si(self.handle, "store(" + f.name + ")")
-      array = fromfile(f.name, dtype = float64)
+      array = numpy.fromfile(f.name, dtype = numpy.float64)
       
     return array
 
@@ -1052,9 +3210,9 @@ class DataVector(VectorBase):
 
     if (new == True):
       self.client.send("newDataVector()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.change(filename, field, start, num_frames, skip, boxcarFirst)
+      self.set_name(name)
     else:
       self.handle = name
 
@@ -1123,8 +3281,7 @@ class GeneratedVector(VectorBase):
 
     if (new == True):
       self.client.send("newGeneratedVector()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.change(x0, x1, n)
       self.set_name(name)
@@ -1161,17 +3318,9 @@ class EditableVector(VectorBase):
 
     if (new == True):
       self.client.send("newEditableVector()")
-      if (np_array != None) :
-        assert(np_array.dtype == float64)
-        
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-          f.close()
-          atexit.register(cleanTmpFile, f)
-          np_array.tofile(f.name)
-          self.client.send("load(" + f.name + ")")        
-
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
+      if (np_array is not None):
+        self.load(np_array)
 
       self.set_name(name)
     else:
@@ -1179,9 +3328,22 @@ class EditableVector(VectorBase):
 
   def load(self, np_array):
     """  sets the value of the vector to that of the float64
-    1D np array """
-    
-    assert(np_array.dtype == float64)
+    1D np array
+
+    An array from :meth:`Client.new_shared_array` is passed through
+    shared memory rather than the socket.
+    """
+    import numpy
+    assert(np_array.dtype == numpy.float64)
+    path = _shared_path(np_array)
+    if path is not None and self.client.protocol >= 2:
+      return self.client.send_si(self.handle, "loadShared("+path+")")
+    if self.client.protocol >= 2:
+      data = np_array.tostring()
+      return self.client.send("EditableVector::setBinaryArray("+b2str(len(data))+","+
+                              self.handle+")"+data)
+
+    import tempfile
     with tempfile.NamedTemporaryFile(delete=False) as f:
       f.close()
       atexit.register(cleanTmpFile, f)
@@ -1216,6 +3378,13 @@ class Matrix(Object):
     """  Returns the maximum value in the matrix. """
     return self.client.send_si(self.handle, "max()")
 
+  def stats(self):
+    """ Returns the summary statistics of the values of the matrix, in one round trip.
+
+    See :meth:`VectorBase.stats`.
+    """
+    return self.client.get_statistics("Matrix::stats("+b2str(self.handle)+")")
+
   def width(self):
     """  Returns the X dimension of the matrix. """
     return self.client.send_si(self.handle, "width()")
@@ -1240,12 +3409,24 @@ class Matrix(Object):
     """  Returns the minimum X location of the matrix, for when the matrix is used in an image. """
     return self.client.send_si(self.handle, "minY()")
     
-  def get_numpy_array(self) :
-    """ get a numpy array which contains the kst matrix values """
+  def get_numpy_array(self, shared = False) :
+    """ get a numpy array which contains the kst matrix values
+
+    If shared is True, kst copies the values into shared memory and the
+    array is a read-only view of it, which is the fastest way to read
+    very large matrices.
+    """
+    if shared and self.client.protocol >= 2:
+      return self.client.get_shared_array(self.handle)
+    if self.client.protocol >= 2:
+      return self.client.get_binary_array("Matrix::getBinaryArray("+self.handle+")")
+
+    import numpy
+    import tempfile
     with tempfile.NamedTemporaryFile() as f:
       args = str(self.client.send_si(self.handle, "store(" + f.name + ")"))
       dims = tuple(map(int, args.split()))
-      array = fromfile(f.name, dtype = float64)
+      array = numpy.fromfile(f.name, dtype = numpy.float64)
       array = array.reshape((dims))
       
     return array
@@ -1282,8 +3463,7 @@ class DataMatrix(Matrix):
 
     if (new == True):
       self.client.send("newDataMatrix()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.change(filename,field,start_x,start_y,num_x,num_y,min_x,min_y,dx,dy)
     else:
@@ -1345,19 +3525,9 @@ class EditableMatrix(Matrix):
 
     if (new == True):
       self.client.send("newEditableMatrix()")
-      if (np_array != None) :
-        assert(np_array.dtype == float64)
-        nx = np_array.shape[0]
-        ny = np_array.shape[1]
-
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-          f.close()
-          atexit.register(cleanTmpFile, f)
-          np_array.tofile(f.name)
-          self.client.send("load(" + f.name + ","+b2str(nx)+","+b2str(ny)+")")
-
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
+      if (np_array is not None):
+        self.load(np_array)
 
       self.set_name(name)
     else:
@@ -1365,12 +3535,26 @@ class EditableMatrix(Matrix):
 
   def load(self, np_array):
     """  sets the values of the matrix in kst to that of the float64
-    2D np array """
-    
-    assert(np_array.dtype == float64)
+    2D np array
+
+    An array from :meth:`Client.new_shared_array` is passed through
+    shared memory rather than the socket.
+    """
+    import numpy
+    assert(np_array.dtype == numpy.float64)
     nx = np_array.shape[0]
     ny = np_array.shape[1]
-    
+
+    path = _shared_path(np_array)
+    if path is not None and self.client.protocol >= 2:
+      return self.client.send_si(self.handle, "loadShared("+path+","+b2str(nx)+","+b2str(ny)+")")
+
+    if self.client.protocol >= 2:
+      data = np_array.tostring()
+      return self.client.send("EditableMatrix::setBinaryArray("+b2str(len(data))+","+
+                              b2str(nx)+","+b2str(ny)+","+self.handle+")"+data)
+
+    import tempfile
     with tempfile.NamedTemporaryFile(delete=False) as f:
       f.close()
       atexit.register(cleanTmpFile, f)
@@ -1428,8 +3612,7 @@ class Curve(Relation):
       self.client.send("newCurve()")
       self.client.send("setXVector("+x_vector.handle+")")
       self.client.send("setYVector("+y_vector.handle+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name      
@@ -1439,30 +3622,24 @@ class Curve(Relation):
     
     The error bars are symetric if vectorminus is not set. 
     """
-    self.client.send("beginEdit("+self.handle+")")
-
-    self.client.send("setYError("+vector.handle+")")
-    if vectorminus != 0:
-      self.client.send("setYMinusError("+vectorminus.handle+")")
-    else:
-      self.client.send("setYMinusError("+vector.handle+")")
-
-    self.client.send("endEdit()")
+    with self.editing():
+      self.client.send("setYError("+vector.handle+")")
+      if vectorminus != 0:
+        self.client.send("setYMinusError("+vectorminus.handle+")")
+      else:
+        self.client.send("setYMinusError("+vector.handle+")")
 
   def set_x_error(self,vector, vectorminus=0):
     """ Set the X Error flags for the curve.  
     
     The error bars are symetric if vectorminus is not set.  
     """
-    self.client.send("beginEdit("+self.handle+")")
-
-    self.client.send("setXError("+vector.handle+")")
-    if vectorminus != 0:
-      self.client.send("setXMinusError("+vectorminus.handle+")")
-    else:
-      self.client.send("setXMinusError("+vector.handle+")")
-
-    self.client.send("endEdit()")
+    with self.editing():
+      self.client.send("setXError("+vector.handle+")")
+      if vectorminus != 0:
+        self.client.send("setXMinusError("+vectorminus.handle+")")
+      else:
+        self.client.send("setXMinusError("+vector.handle+")")
 
   def set_color(self,color):
     """ Set the color of the points and lines.  
@@ -1618,58 +3795,28 @@ class Curve(Relation):
     return self.client.send_si(self.handle, "pointDensity()")
 
   def x_vector(self):
-    """ Returns the x vector of the curve.
-    
-    FIXME: should figure out what kind of vector this is and return that.
-    """
-    vec = VectorBase(self.client)
-    vec.handle = self.client.send_si(self.handle, "xVector()")
-    return vec
+    """ Returns the x vector of the curve. """
+    return _typed(self.client, self.client.send_si(self.handle, "xVector()"), VectorBase)
 
   def y_vector(self):
-    """ Returns the y vector of the curve.
-    
-    FIXME: should figure out what kind of vector this is and return that.
-    """
-    vec = VectorBase(self.client)
-    vec.handle = self.client.send_si(self.handle, "yVector()")
-    return vec
+    """ Returns the y vector of the curve. """
+    return _typed(self.client, self.client.send_si(self.handle, "yVector()"), VectorBase)
 
   def x_error_vector(self):
-    """ Returns the +x error vector of the curve.
-    
-    FIXME: should figure out what kind of vector this is and return that.
-    """
-    vec = VectorBase(self.client)
-    vec.handle = self.client.send_si(self.handle, "xErrorVector()")
-    return vec
+    """ Returns the +x error vector of the curve. """
+    return _typed(self.client, self.client.send_si(self.handle, "xErrorVector()"), VectorBase)
 
   def y_error_vector(self):
-    """ Returns the +y error vector of the curve.
-    
-    FIXME: should figure out what kind of vector this is and return that.
-    """
-    vec = VectorBase(self.client)
-    vec.handle = self.client.send_si(self.handle, "yErrorVector()")
-    return vec
+    """ Returns the +y error vector of the curve. """
+    return _typed(self.client, self.client.send_si(self.handle, "yErrorVector()"), VectorBase)
 
   def x_minus_error_vector(self):
-    """ Returns the -x error vector of the curve.
-    
-    FIXME: should figure out what kind of vector this is and return that.
-    """
-    vec = VectorBase(self.client)
-    vec.handle = self.client.send_si(self.handle, "xMinusErrorVector()")
-    return vec
+    """ Returns the -x error vector of the curve. """
+    return _typed(self.client, self.client.send_si(self.handle, "xMinusErrorVector()"), VectorBase)
 
   def y_minus_error_vector(self):
-    """ Returns the -y error vector of the curve.
-    
-    FIXME: should figure out what kind of vector this is and return that.
-    """
-    vec = VectorBase(self.client)
-    vec.handle = self.client.send_si(self.handle, "yMinusErrorVector()")
-    return vec
+    """ Returns the -y error vector of the curve. """
+    return _typed(self.client, self.client.send_si(self.handle, "yMinusErrorVector()"), VectorBase)
 
 class Image(Relation):
   """ An image inside kst.
@@ -1692,8 +3839,7 @@ class Image(Relation):
     if (new == True):
       self.client.send("newImage()")
       self.client.send("setMatrix("+matrix.handle+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
 
     else:
@@ -1760,8 +3906,7 @@ class Equation(Object) :
 
       self.client.send("setEquation(" + equation + ")")
       self.client.send("setInputVector(X,"+xvector.handle+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name
@@ -1813,8 +3958,7 @@ class Histogram(Object) :
                        b2str(normalization) + "," +
                        b2str(auto_bin) + ")")
 
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name
@@ -1942,8 +4086,7 @@ class Spectrum(Object) :
                        b2str(sigma) + "," +
                        b2str(output_type) + "," + ")")
 
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name
@@ -2059,8 +4202,7 @@ class FlagFilter(Filter) :
 
       self.client.send("setInputVector(Y Vector,"+yvector.handle+")")
       self.client.send("setInputVector(Flag Vector,"+flag.handle+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name
@@ -2121,8 +4263,7 @@ class LinearFit(Fit) :
           
       self.client.send("setInputVector(X Vector,"+xvector.handle+")")
       self.client.send("setInputVector(Y Vector,"+yvector.handle+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name
@@ -2158,8 +4299,7 @@ class PolynomialFit(Fit) :
       self.client.send("setInputVector(X Vector,"+xvector.handle+")")
       self.client.send("setInputVector(Y Vector,"+yvector.handle+")")
       self.client.send("setInputScalar(Order Scalar,"+order.handle+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       self.set_name(name)
     else:
       self.handle = name
@@ -2307,10 +4447,9 @@ class ViewItem(NamedObject):
     """
     x,y = pos
     
-    self.client.send("beginEdit("+self.handle+")")
-    self.client.send("setPosX("+b2str(x)+")")
-    self.client.send("setPosY("+b2str(y)+")")
-    self.client.send("endEdit()")
+    with self.editing():
+      self.client.send("setPosX("+b2str(x)+")")
+      self.client.send("setPosY("+b2str(y)+")")
 
   def set_size(self,size):
     """ Set the size of the item.
@@ -2325,10 +4464,9 @@ class ViewItem(NamedObject):
     
     """
     w,h = size
-    self.client.send("beginEdit("+self.handle+")")
-    self.client.send("setGeoX("+b2str(w)+")")
-    self.client.send("setGeoY("+b2str(h)+")")
-    self.client.send("endEdit()")
+    with self.editing():
+      self.client.send("setGeoX("+b2str(w)+")")
+      self.client.send("setGeoY("+b2str(h)+")")
 
   def set_rotation(self,rot):
     """ Set the rotation of the item.
@@ -2401,8 +4539,7 @@ class Label(ViewItem) :
 
     if (new == True):
       self.client.send("newLabel()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_text(text)
       self.set_label_font_size(font_size)
@@ -2487,11 +4624,9 @@ class ExistingLabel(Label):
   def getList(cls,client):
     x=client.send("getLabelList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingLabel(client,y))
     return ret
   
@@ -2514,8 +4649,7 @@ class Legend(ViewItem) :
 
     if (new == True):
       self.client.send("newLegend("+plot.name()+")")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
     else:
       self.handle = name
 
@@ -2588,8 +4722,7 @@ class Box(ViewItem) :
 
     if (new == True):
       self.client.send("newBox()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_size(size)
@@ -2614,11 +4747,9 @@ class Box(ViewItem) :
   def getList(cls,client):
     x=client.send("getBoxList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingViewItem(client,y))
     return ret
 
@@ -2661,8 +4792,7 @@ class Circle(ViewItem) :
 
     if (new == True):
       self.client.send("newCircle()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_diameter(diameter)
@@ -2682,11 +4812,9 @@ class Circle(ViewItem) :
   def getList(cls,client):
     x=client.send("getCircleList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingViewItem(client,y))
     return ret
     
@@ -2734,8 +4862,7 @@ class Ellipse(ViewItem) :
 
     if (new == True):
       self.client.send("newEllipse()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_size(size)
@@ -2761,11 +4888,9 @@ class Ellipse(ViewItem) :
   def getList(cls,client):
     x=client.send("getEllipseList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingViewItem(client,y))
     return ret
 
@@ -2809,9 +4934,7 @@ class Line(ViewItem) :
 
     if (new == True):
       self.client.send("newLine()")
-      self.handle=self.client.send("endEdit()")
-
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_length(length)
@@ -2831,11 +4954,9 @@ class Line(ViewItem) :
   def getList(cls,client):
     x=client.send("getLineList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingViewItem(client,y))
     return ret
 
@@ -2886,8 +5007,7 @@ class Arrow(ViewItem) :
 
     if (new == True):
       self.client.send("newArrow()")
-      self.handle=self.client.send("endEdit()")
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_length(length)
@@ -2934,11 +5054,9 @@ class Arrow(ViewItem) :
   def getList(cls,client):
     x=client.send("getArrowList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingViewItem(client,y))
     return ret
     
@@ -2973,9 +5091,7 @@ class Picture(ViewItem) :
 
     if (new == True):
       self.client.send("newPicture("+b2str(filename)+")")
-      self.handle=self.client.send("endEdit()")
-
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_width(width)
@@ -3002,11 +5118,9 @@ class Picture(ViewItem) :
   def getList(cls,client):
     x=client.send("getPictureList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingPicture(client,y))
     return ret
 
@@ -3041,9 +5155,7 @@ class SVG(ViewItem) :
 
     if (new == True):
       self.client.send("newSvgItem("+b2str(filename)+")")
-      self.handle=self.client.send("endEdit()")
-
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
 
       self.set_pos(pos)
       self.set_width(width)
@@ -3064,11 +5176,9 @@ class SVG(ViewItem) :
   def getList(cls,client):
     x=client.send("getSVGList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingSVG(client,y))
     return ret
 
@@ -3129,9 +5239,7 @@ class Plot(ViewItem) :
         self.client.send("addToCurrentView(Auto,2)")
       else:
         self.client.send("addToCurrentView(Protect,2)")
-      self.handle=self.client.send("endEdit()")
-
-      self.handle.remove(0,self.handle.indexOf("ing ")+4)
+      self.handle=self.client.end_edit()
       if (size != (0,0)):
         self.set_pos(pos)
         self.set_size(size)
@@ -3288,11 +5396,9 @@ class ExistingPlot(Plot):
   def getList(cls,client):
     x=client.send("getPlotList()")
     ret=[]
-    while x.contains('['):
-      y=x
-      y.remove(0,1)
-      y.remove(y.indexOf(']'),9999999)
-      x.remove(0,x.indexOf(']')+1)
+    while '[' in x:
+      y=x[x.index('[')+1:x.index(']')]
+      x=x[x.index(']')+1:]
       ret.append(ExistingPlot(client,y))
     return ret
 
@@ -3314,18 +5420,14 @@ class Button(ViewItem) :
     self.client.send("setGeoY("+b2str(sizeY)+")")
     self.client.send("setText("+b2str(text)+")")
     self.client.send("setRotation("+b2str(rot)+")")
-    self.handle=self.client.send("endEdit()")
-
-    self.handle.remove(0,self.handle.indexOf("ing ")+4)
+    self.handle=self.client.end_edit()
     socket.connectToServer(client.server_name)
     socket.waitForConnected(300)
     socket.write(b2str("attachTo("+self.handle+")"))
     
   def set_text(self,text):
     """ Sets the text of the button. """
-    self.client.send("beginEdit("+self.handle+")")
-    self.client.send("setText("+b2str(text)+")")
-    self.client.send("endEdit()")
+    self.client.send_si(self.handle, "setText("+b2str(text)+")")
 
 
 
@@ -3345,15 +5447,11 @@ class LineEdit(ViewItem) :
     self.client.send("setGeoY("+b2str(sizeY)+")")
     self.client.send("setText("+b2str(text)+")")
     self.client.send("setRotation("+b2str(rot)+")")
-    self.handle=self.client.send("endEdit()")
-
-    self.handle.remove(0,self.handle.indexOf("ing ")+4)
+    self.handle=self.client.end_edit()
     socket.connectToServer(b2str(client.server_name))
     socket.waitForConnected(300)
     socket.write(b2str("attachTo("+self.handle+")"))
     
   def set_text(self,text):
     """ Sets the text of the line edit. """
-    self.client.send("beginEdit("+self.handle+")")
-    self.client.send("setText("+b2str(text)+")")
-    self.client.send("endEdit()")
+    self.client.send_si(self.handle, "setText("+b2str(text)+")")
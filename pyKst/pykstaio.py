@@ -0,0 +1,471 @@
+""" Asynchronous access to kst sessions for asyncio programs, without Qt.
+
+kst's script server listens on a QLocalServer, which on unix is a unix
+domain socket.  pykstaio speaks to it directly with asyncio, so an event
+loop can drive several kst sessions at once, next to whatever else it
+is doing, without ever blocking in Qt.
+
+It needs Python 3, and numpy only for the array functions.  Commands to
+one session are sent one at a time, in the order they are awaited::
+
+  import asyncio
+  import numpy as np
+  import pykstaio
+
+  async def main():
+    async with await pykstaio.connect("acquisition") as client:
+      x = await client.new_editable_vector(np.linspace(0, 10, 1000), name="t")
+      e = await client.new_equation(x, "sin(x)")
+      c = await client.new_curve(await e.x(), await e.y())
+      p = await client.new_plot()
+      await p.add(c)
+
+  asyncio.get_event_loop().run_until_complete(main())
+
+The objects returned by the factories are only handles: use
+:meth:`AsyncClient.send_si` for anything they do not wrap.
+"""
+
+import asyncio
+import os
+import struct
+
+# The newest version of the kst script protocol pykstaio can speak.
+# 1 is bare text; 2 prefixes every command and reply with its length.
+PROTOCOL_VERSION = 2
+
+
+def b2str(val):
+  if isinstance(val, bool):
+    return "True" if val else "False"
+  else:
+    return str(val)
+
+
+def server_path(server_name):
+  """ The socket a kst session named server_name listens on.
+
+  This is where QLocalServer puts it: server_name itself if it is an
+  absolute path, otherwise in the temporary directory.
+  """
+  if os.path.isabs(server_name):
+    return server_name
+  tmp = os.environ.get("TMPDIR", "").rstrip("/") or "/tmp"
+  return os.path.join(tmp, server_name)
+
+
+def _handle(reply):
+  """ The handle in the reply to endEdit(): "Finished editing <handle>". """
+  return reply[reply.find("ing ")+4:]
+
+
+class AsyncClient(object):
+  """ An asyncio connection to a running kst session.
+
+  The counterpart of :class:`pykst.Client`: connect with :func:`connect`
+  (or ``await client.connect()``), then await its methods.  Each client
+  uses one connection, and commands from several tasks are queued on it,
+  so use one client per kst session.
+
+  :param server_name: the name the kst session was started with
+                      (``kst2 --serverName=<server_name>``).
+  """
+
+  def __init__(self, server_name="kstScript"):
+    self.server_name = server_name
+    self.protocol = 1
+    self.process = None
+    self._reader = None
+    self._writer = None
+    self._lock = asyncio.Lock()
+
+  async def connect(self, start=True, timeout=30, command=("kst2",)):
+    """ Connect to the kst session, starting it first if there is none and start is True.
+
+    kst is started and waited for as :func:`start_kst` does, with the
+    given timeout and command.
+    """
+    try:
+      self._reader, self._writer = await asyncio.open_unix_connection(server_path(self.server_name))
+    except (OSError, IOError):
+      if not start:
+        raise
+      self.server_name, self.process = await start_kst(self.server_name, timeout, command)
+      self._reader, self._writer = await asyncio.open_unix_connection(server_path(self.server_name))
+    # a new connection starts out in bare text
+    self.protocol = 1
+    await self.negotiate_protocol()
+    return self
+
+  async def close(self):
+    """ Close the connection.  The kst session keeps running. """
+    if self._writer is not None:
+      self._writer.close()
+      if hasattr(self._writer, "wait_closed"):
+        await self._writer.wait_closed()
+      self._writer = None
+      self._reader = None
+
+  async def __aenter__(self):
+    if self._writer is None:
+      await self.connect()
+    return self
+
+  async def __aexit__(self, *exc):
+    await self.close()
+
+  async def negotiate_protocol(self):
+    """ Agree with kst on the newest wire protocol both understand.
+
+    See :meth:`pykst.Client.negotiate_protocol`.
+    """
+    reply = await self.send("protocol("+b2str(PROTOCOL_VERSION)+")")
+    try:
+      self.protocol = int(reply)
+    except ValueError:
+      self.protocol = 1
+    return self.protocol
+
+  async def send(self, command):
+    """ Sends a command to kst and returns the reply.
+
+    As with :meth:`pykst.Client.send`, you should not normally need this.
+    """
+    async with self._lock:
+      reply = await self._exchange(command)
+    return reply.decode("latin-1")
+
+  async def send_si(self, handle, command):
+    """ Sends a command to the script interface of the object with the given handle.
+
+    The beginEdit(), the command and the endEdit() go in one round trip
+    where kst supports it.
+    """
+    replies = await self.send_batch(["beginEdit("+b2str(handle)+")", command, "endEdit()"])
+    return replies[1]
+
+  async def send_batch(self, commands):
+    """ Sends a list of commands, which kst runs in order, and returns the list of replies.
+
+    With protocol 2 they all go in one round trip.  As in
+    :meth:`pykst.Client.batch`, ``${n}`` in a command stands for the reply
+    to the n'th command with any "Finished editing " removed.
+    """
+    async with self._lock:
+      replies = await self._exchange_batch([_bytes(c) for c in commands])
+    return [r.decode("latin-1") for r in replies]
+
+  async def _exchange(self, payload):
+    """ Sends one command and reads its reply.  The lock must be held.
+
+    If the reply can not be read whole, because the task is cancelled
+    while waiting for it or kst goes away, the connection is dropped:
+    otherwise whatever is left of the reply would be taken for the reply
+    to the next command.
+    """
+    if self._writer is None:
+      raise IOError("not connected to kst")
+    payload = _bytes(payload)
+    try:
+      if self.protocol >= 2:
+        self._writer.write(struct.pack(">I", len(payload)))
+        self._writer.write(payload)
+        await self._writer.drain()
+        n = struct.unpack(">I", await self._reader.readexactly(4))[0]
+        return await self._reader.readexactly(n)
+
+      self._writer.write(payload)
+      await self._writer.drain()
+      return await self._reader.read(1000000)
+    except (asyncio.CancelledError, asyncio.IncompleteReadError, ConnectionError):
+      self._disconnect()
+      raise
+
+  def _disconnect(self):
+    """ Drops the connection without waiting for it to close. """
+    if self._writer is not None:
+      self._writer.close()
+    self._writer = None
+    self._reader = None
+
+  async def _exchange_batch(self, commands):
+    """ Sends commands as one batch() and splits the reply.  The lock must be held. """
+    if self.protocol < 2:
+      # stand in for kst when it comes to ${n}
+      replies = []
+      for command in commands:
+        if b"${" in command:
+          for i in reversed(range(len(replies))):
+            command = command.replace(_bytes("${"+b2str(i)+"}"), _bytes(_handle_of(replies[i])))
+        # _exchange() drops the connection if this is cancelled, so the
+        # commands not yet sent are never sent
+        replies.append(await self._exchange(command))
+      return replies
+
+    payload = b"batch()" + b"".join(struct.pack(">I", len(c)) + c for c in commands)
+    data = await self._exchange(payload)
+    replies = []
+    pos = 0
+    for i in range(len(commands)):
+      n = struct.unpack(">I", data[pos:pos+4])[0]
+      replies.append(data[pos+4:pos+4+n])
+      pos += 4+n
+    return replies
+
+  async def _new(self, commands, cls):
+    """ Runs a new...() command and the commands setting up the object, and returns a handle to it. """
+    replies = await self.send_batch(commands + ["endEdit()"])
+    return cls(self, _handle(replies[-1]))
+
+  async def _get_array(self, command, handle):
+    """ Returns the values of a vector or matrix as a read-only numpy array of shape (nx, ny). """
+    import numpy
+    if self.protocol >= 2:
+      async with self._lock:
+        data = await self._exchange(command+"("+b2str(handle)+")")
+      if len(data) >= 8:
+        nx, ny = struct.unpack(">II", data[:8])
+        if len(data) == 8 + 8*nx*ny:
+          return numpy.frombuffer(data, dtype = numpy.float64, offset = 8).reshape((nx, ny))
+      raise ValueError(data.decode("latin-1"))
+
+    import tempfile
+    with tempfile.NamedTemporaryFile() as f:
+      reply = await self.send_si(handle, "store("+f.name+")")
+      array = numpy.fromfile(f.name, dtype = numpy.float64)
+    dims = reply.split()
+    if len(dims) == 2:
+      return array.reshape((int(dims[0]), int(dims[1])))
+    return array.reshape((len(array), 1))
+
+  async def _set_array(self, command, handle, np_array, dims = ""):
+    """ Loads a float64 numpy array into an editable vector or matrix. """
+    import numpy
+    assert(np_array.dtype == numpy.float64)
+    if self.protocol >= 2:
+      data = numpy.ascontiguousarray(np_array).tobytes()
+      return await self.send(_bytes(command+"("+b2str(len(data))+dims+","+b2str(handle)+")")+data)
+
+    import tempfile
+    with tempfile.NamedTemporaryFile() as f:
+      np_array.tofile(f.name)
+      return await self.send_si(handle, "load("+f.name+dims+")")
+
+  async def clear(self):
+    """ Clears all objects from kst. """
+    await self.send("clear()")
+
+  async def new_generated_scalar(self, value, name=""):
+    """ Create a New Generated Scalar in kst.  See :class:`pykst.GeneratedScalar`. """
+    return await self._new(["newGeneratedScalar()", "setValue("+b2str(value)+")",
+                            "setName("+b2str(name)+")"], AsyncObject)
+
+  async def new_data_vector(self, filename, field, start=0, num_frames=-1,
+                            skip=0, boxcarFirst=False, name=""):
+    """ Create a New DataVector in kst.  See :class:`pykst.DataVector`. """
+    return await self._new(["newDataVector()",
+                            "change("+filename+","+field+","+b2str(start)+","+b2str(num_frames)+
+                            ","+b2str(skip)+","+b2str(boxcarFirst)+")",
+                            "setName("+b2str(name)+")"], AsyncVector)
+
+  async def new_generated_vector(self, x0, x1, n, name=""):
+    """ Create a New GeneratedVector in kst.  See :class:`pykst.GeneratedVector`. """
+    return await self._new(["newGeneratedVector()",
+                            "change("+b2str(x0)+","+b2str(x1)+","+b2str(n)+")",
+                            "setName("+b2str(name)+")"], AsyncVector)
+
+  async def new_editable_vector(self, np_array = None, name=""):
+    """ Create a New Editable Vector in kst, holding the values of np_array.
+
+    See :class:`pykst.EditableVector`.
+    """
+    vector = await self._new(["newEditableVector()", "setName("+b2str(name)+")"],
+                             AsyncEditableVector)
+    if np_array is not None:
+      await vector.load(np_array)
+    return vector
+
+  async def new_editable_matrix(self, np_array = None, name=""):
+    """ Create a New Editable Matrix in kst, holding the values of np_array.
+
+    See :class:`pykst.EditableMatrix`.
+    """
+    matrix = await self._new(["newEditableMatrix()", "setName("+b2str(name)+")"],
+                             AsyncEditableMatrix)
+    if np_array is not None:
+      await matrix.load(np_array)
+    return matrix
+
+  async def new_equation(self, x_vector, equation, name=""):
+    """ Create a new Equation in kst.  See :class:`pykst.Equation`. """
+    return await self._new(["newEquation()", "setEquation("+equation+")",
+                            "setInputVector(X,"+x_vector.handle+")",
+                            "setName("+b2str(name)+")"], AsyncEquation)
+
+  async def new_curve(self, x_vector, y_vector, name=""):
+    """ Create a New Curve in kst.  See :class:`pykst.Curve`. """
+    return await self._new(["newCurve()", "setXVector("+x_vector.handle+")",
+                            "setYVector("+y_vector.handle+")",
+                            "setName("+b2str(name)+")"], AsyncObject)
+
+  async def new_image(self, matrix, name=""):
+    """ Create a new Image in kst.  See :class:`pykst.Image`. """
+    return await self._new(["newImage()", "setMatrix("+matrix.handle+")",
+                            "setName("+b2str(name)+")"], AsyncObject)
+
+  async def new_plot(self, columns=0, name=""):
+    """ Create a new, automatically placed, Plot in kst.  See :class:`pykst.Plot`. """
+    if columns > 0:
+      place = "addToCurrentView(Columns,"+b2str(columns)+")"
+    else:
+      place = "addToCurrentView(Auto,2)"
+    return await self._new(["newPlot()", place, "setName("+b2str(name)+")"], AsyncPlot)
+
+
+async def connect(server_name="kstScript", start=True, timeout=30, command=("kst2",)):
+  """ Returns an :class:`AsyncClient` connected to the kst session named server_name.
+
+  If there is no such session and start is True, one is started by
+  running command, as :class:`pykst.KstServerPool` does, and waited for
+  for up to timeout seconds: see :func:`start_kst`.
+  """
+  return await AsyncClient(server_name).connect(start, timeout, command)
+
+
+async def start_kst(server_name="kstScript", timeout=30, command=("kst2",)):
+  """ Starts a kst session, and waits until its script server is listening.
+
+  The asyncio counterpart of :func:`pykst.start_kst`: kst is passed the
+  write end of a pipe with ``--readyFd``, and writes the name its script
+  server listens on there once it is ready.  Meanwhile connecting is
+  retried with exponential backoff.
+
+  Returns the server name and the kst process (an
+  ``asyncio.subprocess.Process``).  Raises IOError if kst exits, or is
+  not ready within timeout seconds.
+  """
+  loop = asyncio.get_event_loop()
+  r, w = os.pipe()
+  try:
+    process = await asyncio.create_subprocess_exec(
+      *(list(command) + ["--serverName="+str(server_name), "--readyFd="+b2str(w)]), pass_fds=(w,))
+  except BaseException:
+    os.close(r)
+    raise
+  finally:
+    os.close(w)
+
+  reader = asyncio.StreamReader()
+  pipe, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                         os.fdopen(r, "rb", 0))
+  ready = asyncio.ensure_future(reader.readline())
+  deadline = loop.time() + timeout
+  delay = 0.05
+  try:
+    while True:
+      if ready is not None:
+        await asyncio.wait([ready], timeout=delay)
+        if ready.done():
+          name = ready.result().strip()
+          if name:
+            return name.decode("latin-1"), process
+          # kst closed the pipe without a word: just keep trying to connect
+          ready = None
+      else:
+        await asyncio.sleep(delay)
+      try:
+        writer = (await asyncio.open_unix_connection(server_path(server_name)))[1]
+        writer.close()
+        return server_name, process
+      except (OSError, IOError):
+        pass
+      if process.returncode is not None:
+        raise IOError("kst exited with status "+b2str(process.returncode)+" before it was ready")
+      if loop.time() > deadline:
+        process.terminate()
+        await process.wait()
+        raise IOError("kst was not ready after "+b2str(timeout)+" seconds")
+      delay = min(delay*2, 1.0)
+  finally:
+    if ready is not None:
+      ready.cancel()
+    pipe.close()
+
+
+def _bytes(command):
+  if isinstance(command, bytes):
+    return command
+  return command.encode("latin-1")
+
+
+def _handle_of(reply):
+  reply = reply.decode("latin-1")
+  if reply.startswith("Finished editing "):
+    return reply[17:]
+  return reply
+
+
+class AsyncObject(object):
+  """ A handle to an object inside a kst session, for use with :class:`AsyncClient`. """
+  def __init__(self, client, handle):
+    self.client = client
+    self.handle = handle
+
+  def __repr__(self):
+    return "<"+type(self).__name__+" "+self.handle+">"
+
+  async def set_name(self, name):
+    """ Set the name of the object inside kst. """
+    await self.client.send_si(self.handle, "setName("+b2str(name)+")")
+
+  async def name(self):
+    """ Returns the name of the object from inside kst. """
+    return await self.client.send_si(self.handle, "name()")
+
+
+class AsyncVector(AsyncObject):
+  """ A handle to a vector inside a kst session. """
+  async def length(self):
+    """ Returns the number of samples in the vector. """
+    return int(await self.client.send_si(self.handle, "length()"))
+
+  async def get_numpy_array(self):
+    """ Returns the values of the vector as a read-only numpy array. """
+    return (await self.client._get_array("Vector::getBinaryArray", self.handle)).ravel()
+
+
+class AsyncEditableVector(AsyncVector):
+  """ A handle to an editable vector inside a kst session. """
+  async def load(self, np_array):
+    """ Sets the values of the vector to those of the float64 1D numpy array. """
+    return await self.client._set_array("EditableVector::setBinaryArray", self.handle, np_array)
+
+
+class AsyncEditableMatrix(AsyncObject):
+  """ A handle to an editable matrix inside a kst session. """
+  async def get_numpy_array(self):
+    """ Returns the values of the matrix as a read-only numpy array of shape (nx, ny). """
+    return await self.client._get_array("Matrix::getBinaryArray", self.handle)
+
+  async def load(self, np_array):
+    """ Sets the values of the matrix to those of the float64 2D numpy array. """
+    dims = ","+b2str(np_array.shape[0])+","+b2str(np_array.shape[1])
+    return await self.client._set_array("EditableMatrix::setBinaryArray", self.handle, np_array, dims)
+
+
+class AsyncEquation(AsyncObject):
+  """ A handle to an equation inside a kst session. """
+  async def x(self):
+    """ The x vector of the equation. """
+    return AsyncVector(self.client, await self.client.send_si(self.handle, "outputVector(XO)"))
+
+  async def y(self):
+    """ The vector holding the values of the equation. """
+    return AsyncVector(self.client, await self.client.send_si(self.handle, "outputVector(O)"))
+
+
+class AsyncPlot(AsyncObject):
+  """ A handle to a plot inside a kst session. """
+  async def add(self, relation):
+    """ Add a curve or an image to the plot. """
+    await self.client.send_si(self.handle, "addRelation("+relation.handle+")")
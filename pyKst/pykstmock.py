@@ -0,0 +1,821 @@
+#!/usr/bin/python2.7
+""" A stand-in for kst's script server, written in python.
+
+MockServer speaks the same wire protocol as kst's ScriptServer (bare
+text, and framed protocols 2 and 3, with batches and binary arrays), and
+implements enough of its command set for pykst to run against it: the
+new*() and get*List() commands, beginEdit() and endEdit(), and the
+common commands of the script interfaces of vectors, matrices, scalars,
+strings, curves, equations, spectra, histograms, plots and other view
+items.  Objects are kept in memory and named the way kst names them.
+
+There is no GUI, nothing is computed (the outputs of equations, spectra
+and so on are vectors of zeros) and nothing is drawn, so it needs no X
+display.  It is meant for testing scripts, and for telling how much of
+the time a script takes is spent in pykst rather than in kst.  To run a
+pykst script against it::
+
+  import pykst, pykstmock
+  server = pykstmock.MockServer("kstMock").start()
+  client = pykst.Client("kstMock")
+
+It can also be run like kst, so that pykst.start_kst() and
+pykst.KstServerPool can start it::
+
+  pool = pykst.KstServerPool(command=(sys.executable, "pykstmock.py"))
+"""
+
+import array
+import fnmatch
+import os
+import socket
+import struct
+import sys
+import threading
+
+# The newest version of the wire protocol this server speaks, as in scriptserver.h.
+PROTOCOL_VERSION = 4
+
+def _to_bytes(data):
+  return data.tobytes() if hasattr(data, "tobytes") else data.tostring()
+
+def _from_bytes(data):
+  values = array.array("d")
+  if hasattr(values, "frombytes"):
+    values.frombytes(data)
+  else:
+    values.fromstring(data)
+  return values
+
+def _args(command):
+  """ The comma separated arguments of command, as ScriptInterface::getArgs() splits them. """
+  arg = command[command.find("(")+1:command.rfind(")")]
+  return arg.split(",") if arg else []
+
+def _number(x):
+  """ Formats a double the way QString::number() does, near enough. """
+  return "%.6g" % x
+
+
+class MockObject(object):
+  """ An object in the mock session.  Unknown setters are remembered, and their getters answer with the value set. """
+
+  # what properties() reads, on top of the properties which have been set
+  GETTERS = ("name",)
+
+  def __init__(self, server, kind, prefix):
+    self.server = server
+    self.kind = kind
+    self.short_name = server._next_short_name(prefix)
+    self.descriptive_name = ""
+    self.properties = {}
+    self.provider = None
+    self.plugin_name = ""
+    self.serial = 0    # the change serial at the last change to this object
+
+  def name(self):
+    return (self.descriptive_name or self.kind) + " (" + self.short_name + ")"
+
+  def do_command(self, command):
+    verb = command[:command.find("(")] if "(" in command else command
+    handler = getattr(self, "cmd_" + verb, None)
+    if handler is not None:
+      return handler(command)
+    args = _args(command)
+    if verb == "setName":
+      self.descriptive_name = command[8:-1]
+      return "Done"
+    if verb in ("name", "descriptionTip"):
+      return self.name()
+    if verb == "type":
+      return self.kind
+    if verb == "testCommand":
+      return "Done"
+    if verb.startswith("set") and len(verb) > 3:
+      self.properties[verb[3].lower()+verb[4:]] = ",".join(args)
+      return "Done"
+    if verb.startswith("check") or verb.startswith("uncheck"):
+      key = verb[5:] if verb.startswith("check") else verb[7:]
+      self.properties[key[0].lower()+key[1:]] = "true" if verb.startswith("check") else "false"
+      return "Done"
+    if not args and verb in self.properties:
+      return self.properties[verb]
+    if args:
+      self.properties[verb] = ",".join(args)
+      return "Done"
+    return "No such command"
+
+  def cmd_properties(self, command):
+    lines = []
+    for getter in self.GETTERS + tuple(sorted(set(self.properties) - set(self.GETTERS))):
+      value = self.do_command(getter + "()")
+      value = value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+      lines.append(getter + "\t" + value + "\n")
+    return "".join(lines)
+
+  def end_edit(self):
+    return "Finished editing " + self.name()
+
+
+class MockVector(MockObject):
+  """ A vector: values are kept as an array of doubles. """
+
+  GETTERS = ("name", "length", "min", "max", "mean")
+
+  def __init__(self, server, kind):
+    MockObject.__init__(self, server, kind, "V")
+    self.values = array.array("d")
+
+  def cmd_value(self, command):
+    i = int(_args(command)[0])
+    return _number(self.values[i]) if 0 <= i < len(self.values) else "0"
+
+  def cmd_length(self, command):
+    return str(len(self.values))
+
+  def cmd_min(self, command):
+    return _number(min(self.values)) if self.values else "0"
+
+  def cmd_max(self, command):
+    return _number(max(self.values)) if self.values else "0"
+
+  def cmd_mean(self, command):
+    return _number(sum(self.values)/len(self.values)) if self.values else "0"
+
+  def cmd_store(self, command):
+    with open(_args(command)[0], "wb") as f:
+      f.write(_to_bytes(self.values))
+    return "Done"
+
+  def cmd_storeShared(self, command):
+    self.cmd_store(command)
+    return str(len(self.values))
+
+  def cmd_load(self, command):
+    with open(_args(command)[0], "rb") as f:
+      values = _from_bytes(f.read())
+    if values:
+      # kst's vectors can not be empty: loading nothing leaves them as they were
+      self.values = values
+    return "Done"
+
+  cmd_loadShared = cmd_load
+
+  def cmd_change(self, command):
+    args = _args(command)
+    if self.kind == "Generated Vector":
+      x0, x1, n = float(args[0]), float(args[1]), int(args[2])
+      step = (x1 - x0)/(n - 1) if n > 1 else 0
+      self.values = array.array("d", (x0 + i*step for i in range(n)))
+    else:
+      self.properties["change"] = ",".join(args)
+    return "Done"
+
+  def cmd_setValue(self, command):
+    i, x = _args(command)
+    self.values[int(i)] = float(x)
+    return "Done"
+
+  def cmd_resize(self, command):
+    n = int(_args(command)[0])
+    self.values = (self.values + array.array("d", [0.0]*n))[:n]
+    return "Done"
+
+  def cmd_zero(self, command):
+    self.values = array.array("d", [0.0]*len(self.values))
+    return "Done"
+
+
+class MockMatrix(MockObject):
+  """ A matrix: nx by ny doubles. """
+
+  GETTERS = ("name", "length", "min", "max", "mean", "width", "height")
+
+  def __init__(self, server, kind):
+    MockObject.__init__(self, server, kind, "M")
+    self.nx = self.ny = 0
+    self.values = array.array("d")
+
+  def cmd_value(self, command):
+    x, y = map(int, _args(command))
+    return _number(self.values[x*self.ny + y])
+
+  def cmd_width(self, command):
+    return str(self.nx)
+
+  def cmd_height(self, command):
+    return str(self.ny)
+
+  def cmd_length(self, command):
+    return str(len(self.values))
+
+  cmd_min = MockVector.__dict__["cmd_min"]
+  cmd_max = MockVector.__dict__["cmd_max"]
+  cmd_mean = MockVector.__dict__["cmd_mean"]
+  cmd_store = MockVector.__dict__["cmd_store"]
+
+  def cmd_storeShared(self, command):
+    self.cmd_store(command)
+    return str(self.nx) + " " + str(self.ny)
+
+  def cmd_load(self, command):
+    path, nx, ny = _args(command)
+    if int(nx)*int(ny) == 0:
+      return "Done"
+    with open(path, "rb") as f:
+      self.values = _from_bytes(f.read(8*int(nx)*int(ny)))
+    self.nx, self.ny = int(nx), int(ny)
+    return "Done"
+
+  cmd_loadShared = cmd_load
+
+
+class MockScalar(MockObject):
+  """ A scalar, or a string. """
+
+  GETTERS = ("name", "value")
+
+  def __init__(self, server, kind, prefix):
+    MockObject.__init__(self, server, kind, prefix)
+    self.value = "0" if prefix == "X" else ""
+
+  def cmd_value(self, command):
+    return self.value
+
+  def cmd_setValue(self, command):
+    self.value = command[9:-1]
+    return "Done"
+
+
+class MockDataObject(MockObject):
+  """ A curve, equation, spectrum, plugin...: remembers its inputs, and makes up its outputs. """
+
+  def __init__(self, server, kind, prefix):
+    MockObject.__init__(self, server, kind, prefix)
+    self.inputs = {}
+    self.outputs = {}
+
+  def cmd_setInputVector(self, command):
+    key, name = command[15:-1].split(",", 1)
+    self.inputs[key] = name
+    return "Done"
+
+  cmd_setInputScalar = cmd_setInputVector
+
+  def cmd_outputVector(self, command):
+    key = command[13:-1]
+    if key not in self.outputs:
+      vector = self.server._add(MockVector(self.server, "Output Vector"))
+      vector.descriptive_name = self.short_name + ":" + key
+      vector.provider = self
+      x = self.server.find(self.inputs.get("X", ""))
+      if isinstance(x, MockVector):
+        vector.values = array.array("d", x.values if key == "XO" else [0.0]*len(x.values))
+      self.outputs[key] = vector
+    return self.outputs[key].name()
+
+  def cmd_outputScalar(self, command):
+    key = command[13:-1]
+    if key not in self.outputs:
+      scalar = self.server._add(MockScalar(self.server, "Output Scalar", "X"))
+      scalar.descriptive_name = self.short_name + ":" + key
+      scalar.provider = self
+      self.outputs[key] = scalar
+    return self.outputs[key].name()
+
+
+class MockViewItem(MockObject):
+  """ A plot, label, box...: a plot remembers the curves and images added to it. """
+
+  def __init__(self, server, kind, prefix):
+    MockObject.__init__(self, server, kind, prefix)
+    self.relations = []
+
+  def cmd_addRelation(self, command):
+    self.relations.append(command[12:-1])
+    return "Done"
+
+
+# For each new*() command: the kind of object made, and how to make it.
+_KINDS = {
+  "EditableVector": lambda s: MockVector(s, "Editable Vector"),
+  "GeneratedVector": lambda s: MockVector(s, "Generated Vector"),
+  "DataVector": lambda s: MockVector(s, "Data Vector"),
+  "EditableMatrix": lambda s: MockMatrix(s, "Editable Matrix"),
+  "DataMatrix": lambda s: MockMatrix(s, "Data Matrix"),
+  "GeneratedScalar": lambda s: MockScalar(s, "Generated Scalar", "X"),
+  "DataScalar": lambda s: MockScalar(s, "Data Scalar", "X"),
+  "VectorScalar": lambda s: MockScalar(s, "Vector Scalar", "X"),
+  "GeneratedString": lambda s: MockScalar(s, "Generated String", "T"),
+  "DataString": lambda s: MockScalar(s, "Data String", "T"),
+  "Curve": lambda s: MockDataObject(s, "Curve", "C"),
+  "Equation": lambda s: MockDataObject(s, "Equation", "E"),
+  "Histogram": lambda s: MockDataObject(s, "Histogram", "H"),
+  "Spectrum": lambda s: MockDataObject(s, "Spectrum", "S"),
+  "Plugin": lambda s: MockDataObject(s, "Plugin", "P"),
+  "Image": lambda s: MockDataObject(s, "Image", "I"),
+  "Plot": lambda s: MockViewItem(s, "Plot", "P"),
+  "Legend": lambda s: MockViewItem(s, "Legend", "L"),
+  "Arrow": lambda s: MockViewItem(s, "Arrow", "D"),
+  "Box": lambda s: MockViewItem(s, "Box", "D"),
+  "Button": lambda s: MockViewItem(s, "Button", "D"),
+  "LineEdit": lambda s: MockViewItem(s, "LineEdit", "D"),
+  "Circle": lambda s: MockViewItem(s, "Circle", "D"),
+  "Ellipse": lambda s: MockViewItem(s, "Ellipse", "D"),
+  "Label": lambda s: MockViewItem(s, "Label", "D"),
+  "Line": lambda s: MockViewItem(s, "Line", "D"),
+  "Picture": lambda s: MockViewItem(s, "Picture", "D"),
+  "SvgItem": lambda s: MockViewItem(s, "SvgItem", "D"),
+}
+
+# For each get*List() command: the kinds listed, and whether they are view items ("[a][b]") or not ("a|b").
+_LISTS = {
+  "Vector": (("Editable Vector", "Generated Vector", "Data Vector", "Output Vector"), False),
+  "EditableVector": (("Editable Vector",), False),
+  "Matrix": (("Editable Matrix", "Data Matrix"), False),
+  "EditableMatrix": (("Editable Matrix",), False),
+  "Scalar": (("Generated Scalar", "Data Scalar", "Vector Scalar", "Output Scalar"), False),
+  "String": (("Generated String", "Data String"), False),
+  "Curve": (("Curve",), False),
+  "Equation": (("Equation",), False),
+  "Histogram": (("Histogram",), False),
+  "Spectrum": (("Spectrum",), False),
+  "Plugin": (("Plugin",), False),
+  "BasicPlugin": (("Plugin",), False),
+  "CSD": ((), False),
+  "Image": (("Image",), False),
+  "Plot": (("Plot",), True),
+  "Legend": (("Legend",), True),
+  "Arrow": (("Arrow",), True),
+  "Box": (("Box",), True),
+  "Button": (("Button",), True),
+  "LineEdit": (("LineEdit",), True),
+  "Circle": (("Circle",), True),
+  "Ellipse": (("Ellipse",), True),
+  "Label": (("Label",), True),
+  "Line": (("Line",), True),
+  "Picture": (("Picture",), True),
+  "SvgItem": (("SvgItem",), True),
+}
+
+# The types getObjects() gives each kind of object, where they differ from the kind.
+_TYPES = {
+  "Editable Vector": "EditableVector", "Generated Vector": "GeneratedVector", "Data Vector": "DataVector",
+  "Output Vector": "Vector", "Editable Matrix": "EditableMatrix", "Data Matrix": "DataMatrix",
+  "Generated Scalar": "GeneratedScalar", "Data Scalar": "DataSourceScalar", "Vector Scalar": "VectorScalar",
+  "Output Scalar": "Scalar", "Generated String": "GeneratedString", "Data String": "DataSourceString",
+  "SvgItem": "SVG",
+}
+
+def _is_kind(obj, kind):
+  """ Whether obj is of kind: see isKind() in ScriptServer. """
+  type_name = _TYPES.get(obj.kind, obj.kind)
+  family = kind.lower()
+  if not kind or type_name.lower() == family:
+    return True
+  if family == "viewitem":
+    return isinstance(obj, MockViewItem)
+  if isinstance(obj, MockViewItem):
+    return False
+  if family == "relation":
+    return type_name in ("Curve", "Image")
+  if family == "dataobject":
+    return type_name in ("Equation", "Histogram", "Spectrum", "Spectrogram", "Plugin")
+  return family in ("vector", "matrix", "scalar", "string") and type_name.lower().endswith(family)
+
+# Commands which kst accepts and which change nothing the mock keeps track of.
+_NO_OPS = ("screenBack", "screenForward", "countFromEnd", "readToEnd", "setPaused", "unsetPaused",
+           "fileOpen", "fileSave", "exportGraphics", "cleanupLayout", "setDatasourceBoolConfig",
+           "setDatasourceIntConfig", "setDatasourceStringConfig", "testCommand",
+           "setTimingsEnabled", "resetTimings")
+
+# Commands which just read, besides the get...() ones, as in ScriptServer's _readFns.
+_READS = frozenset(("beginEdit", "endEdit", "properties", "findObjects", "tabCount", "currentTab", "tabText",
+                    "testCommand", "protocol", "batch", "transaction", "changeSerial", "Vector::stats", "Matrix::stats"))
+
+def _is_change(command, interface):
+  """ Whether kst counts command as a change, as ScriptServer::isChange() does. """
+  verb = command[:command.find(b"(")].decode("latin-1")
+  if verb in _READS or verb.rpartition("::")[2].startswith("get"):
+    return False
+  return interface is None or len(command) != len(verb)+2 or \
+    verb not in interface.GETTERS + tuple(interface.properties)
+
+
+class _Connection(object):
+  """ The state kst keeps for each connection. """
+  def __init__(self, sock):
+    self.sock = sock
+    self.protocol = 1
+    self.interface = None
+
+
+class MockServer(object):
+  """ Listens on the unix socket kst would use for the session server_name, and answers like kst.
+
+  Each connection is served by its own thread, but commands run one at
+  a time, as they do in kst.
+  """
+
+  def __init__(self, server_name="kstScript"):
+    self.server_name = server_name
+    self.lock = threading.Lock()
+    self.change_serial = 0
+    self.clear()
+    tmp = os.environ.get("TMPDIR", "").rstrip("/") or "/tmp"
+    self.path = server_name if os.path.isabs(server_name) else os.path.join(tmp, server_name)
+    self.listener = None
+
+  def clear(self):
+    """ Forgets every object, as clear() does. """
+    self.objects = []
+    self.counters = {}
+    self.tabs = ["View 1"]
+    self.tab = 0
+
+  def start(self):
+    """ Starts listening, and serving connections in background threads.  Returns self. """
+    if os.path.exists(self.path):
+      os.remove(self.path)
+    self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self.listener.bind(self.path)
+    self.listener.listen(16)
+    thread = threading.Thread(target=self.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return self
+
+  def serve_forever(self):
+    while True:
+      try:
+        sock = self.listener.accept()[0]
+      except socket.error:
+        return  # closed
+      thread = threading.Thread(target=self._serve, args=(_Connection(sock),))
+      thread.daemon = True
+      thread.start()
+
+  def close(self):
+    """ Stops listening.  Open connections are served until their clients go away. """
+    if self.listener is not None:
+      self.listener.close()
+      self.listener = None
+      os.remove(self.path)
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def _serve(self, connection):
+    sock = connection.sock
+    buffer = b""
+    try:
+      while True:
+        data = sock.recv(1000000)
+        if not data:
+          return
+        if connection.protocol == 1:
+          sock.sendall(self.run(data, connection))
+          continue
+        buffer += data
+        header = 8 if connection.protocol >= 3 else 4
+        while len(buffer) >= header:
+          n = struct.unpack(">I", buffer[:4])[0]
+          if len(buffer) < header + n:
+            break
+          command = buffer[header:header+n]
+          reply = self.run(command, connection)
+          sock.sendall(struct.pack(">I", len(reply)) + buffer[4:header] + reply)
+          buffer = buffer[header+n:]
+    except socket.error:
+      pass
+    finally:
+      sock.close()
+
+  def run(self, command, connection):
+    """ Runs one command (bytes) for a connection, and returns the reply (bytes). """
+    with self.lock:
+      reply = self._dispatch(command, connection)
+    if not isinstance(reply, bytes):
+      reply = reply.encode("latin-1")
+    return reply or b" "
+
+  def _next_short_name(self, prefix):
+    self.counters[prefix] = self.counters.get(prefix, 0) + 1
+    return prefix + str(self.counters[prefix])
+
+  def _add(self, obj):
+    self.objects.append(obj)
+    return obj
+
+  def find(self, name):
+    """ The object named name, by its full name or short name, or None. """
+    short = name[name.rfind("(")+1:-1] if name.endswith(")") else name
+    for obj in self.objects:
+      if obj.short_name == short or obj.name() == name:
+        return obj
+    return None
+
+  def _dispatch(self, command, connection):
+    if _is_change(command, connection.interface):
+      self.change_serial += 1
+      if connection.interface is not None:
+        connection.interface.serial = self.change_serial
+    if command.startswith(b"EditableVector::setBinaryArray(") or \
+       command.startswith(b"EditableMatrix::setBinaryArray("):
+      return self._set_binary_array(command)
+    if command.startswith(b"Vector::getBinaryValues("):
+      return self._get_binary_values(command)
+    if command.startswith(b"batch()") or command.startswith(b"transaction()"):
+      return self._batch(command, connection)
+    if not isinstance(command, str):
+      command = command.decode("latin-1")
+    verb = command[:command.find("(")] if "(" in command else command
+
+    if verb == "protocol":
+      connection.protocol = max(1, min(int(_args(command)[0]), PROTOCOL_VERSION))
+      return str(connection.protocol)
+    if verb.startswith("new") and verb[3:] in _KINDS:
+      if connection.interface is not None:
+        return "To access this function, first call endEdit()"
+      connection.interface = self._add(_KINDS[verb[3:]](self))
+      if verb == "newPlugin":
+        connection.interface.plugin_name = command[10:-1]
+      return "Ok"
+    if verb.startswith("get") and verb.endswith("List") and verb[3:-4] in _LISTS:
+      kinds, view_items = _LISTS[verb[3:-4]]
+      names = [obj.name() for obj in self.objects if obj.kind in kinds]
+      if not names:
+        return "NO_OBJECTS"
+      return "".join("["+name+"]" for name in names) if view_items else "|".join(names)
+    if verb == "getObjects":
+      if command[11:-1]:
+        obj = self.find(command[11:-1])
+        return self._record(obj) if obj is not None else "No such object"
+      return "".join(self._record(obj) for obj in self.objects)
+    if verb == "findObjects":
+      args = _args(command)
+      if len(args) < 2:
+        return "Too few arguments"
+      pattern = ",".join(args[1:]).lower()
+      return "".join(self._record(obj) for obj in self.objects
+                     if _is_kind(obj, args[0]) and fnmatch.fnmatchcase(obj.name().lower(), pattern))
+    if verb == "beginEdit":
+      if connection.interface is not None:
+        return "To access this function, first call endEdit()"
+      connection.interface = self.find(command[10:-1])
+      return "Ok" if connection.interface is not None else "Unknown error"
+    if verb == "endEdit":
+      if connection.interface is None:
+        return "No interface open."
+      obj, connection.interface = connection.interface, None
+      return obj.end_edit()
+    if verb == "eliminate":
+      if connection.interface is not None:
+        return "To access this function, first call endEdit()"
+      obj = self.find(command[10:-1])
+      if obj is not None:
+        self.objects.remove(obj)
+      return "Done"
+    if verb == "eliminateObjects":
+      if connection.interface is not None:
+        return "To access this function, first call endEdit()"
+      found = [self.find(name) for name in command[17:-1].split("|") if name]
+      for match in found:
+        if match is not None and match in self.objects:
+          self.objects.remove(match)
+          # as in DataObject::deleteDependents(), the outputs of data objects go with them
+          self.objects = [other for other in self.objects if other.provider is not match]
+      return str(len(found) - found.count(None))
+    if verb == "purge":
+      if connection.interface is not None:
+        return "To access this function, first call endEdit()"
+      return str(self._purge())
+    if verb == "clear":
+      self.clear()
+      return "Done"
+    if verb == "tabCount":
+      return str(len(self.tabs))
+    if verb == "newTab":
+      self.tabs.append("View " + str(len(self.tabs)+1))
+      self.tab = len(self.tabs) - 1
+      return "Done"
+    if verb == "setTab":
+      self.tab = int(_args(command)[0])
+      return "Done"
+    if verb == "renameTab":
+      self.tabs[self.tab] = command[10:-1]
+      return "Done"
+    if verb == "currentTab":
+      return str(self.tab)
+    if verb == "tabText":
+      return self.tabs[self.tab]
+    if verb == "closeTab":
+      del self.tabs[self.tab]
+      if not self.tabs:
+        self.tabs.append("View 1")
+      self.tab = min(self.tab, len(self.tabs) - 1)
+      return "Done"
+    if verb == "changeSerial":
+      if command[13:-1]:
+        return "".join(self._serial(name) + "\n" for name in command[13:-1].split("|"))
+      return str(self.change_serial)
+    if verb == "getTimings":
+      return ""
+    if verb in ("Vector::getBinaryArray", "Matrix::getBinaryArray"):
+      return self._get_binary_array(command)
+    if verb == "Vector::getBinarySlice":
+      return self._get_binary_slice(command)
+    if verb in ("Vector::stats", "Matrix::stats"):
+      return self._stats(command)
+    if verb in ("Scalar::value", "String::value", "Scalar::setValue", "String::setValue"):
+      args = _args(command)
+      obj = self.find(args[0])
+      if obj is None:
+        return "No such object"
+      return obj.do_command(verb[verb.find("::")+2:] + "(" + ",".join(args[1:]) + ")")
+    if verb in _NO_OPS:
+      return "Done"
+
+    if connection.interface is not None:
+      return connection.interface.do_command(command)
+    return "Unknown command!"
+
+  def _batch(self, command, connection):
+    """ batch() and transaction(): see ScriptServer::batch().  The mock has no updates to put off. """
+    replies = []
+    handles = []
+    pos = command.find(b"()") + 2
+    while pos + 4 <= len(command):
+      n = struct.unpack(">I", command[pos:pos+4])[0]
+      sub = command[pos+4:pos+4+n]
+      pos += 4 + n
+      if b"${" in sub and b"::setBinaryArray(" not in sub and b"::getBinaryValues(" not in sub:
+        for i in reversed(range(len(handles))):
+          sub = sub.replace(b"${" + str(i).encode() + b"}", handles[i])
+      reply = self._dispatch(sub, connection)
+      if not isinstance(reply, bytes):
+        reply = reply.encode("latin-1")
+      reply = reply or b" "
+      replies.append(struct.pack(">I", len(reply)) + reply)
+      handles.append(reply[17:] if reply.startswith(b"Finished editing ") else reply)
+    return b"".join(replies)
+
+  def _purge(self):
+    """ purge(): see Document::purge(). """
+    count = 0
+    while True:
+      used = set()
+      def use(obj):
+        if obj is not None and id(obj) not in used:
+          used.add(id(obj))
+          use(obj.provider)
+      for obj in self.objects:
+        if isinstance(obj, MockViewItem):
+          for name in obj.relations:
+            use(self.find(name))
+        if isinstance(obj, MockDataObject):
+          # inputs, and the vectors and matrices of curves and images
+          names = list(obj.inputs.values()) + [value for key, value in obj.properties.items()
+                                               if key.endswith(("Vector", "Error", "Matrix"))]
+          for name in names:
+            use(self.find(name))
+      unused = [obj for obj in self.objects if not isinstance(obj, MockViewItem) and id(obj) not in used]
+      if not unused:
+        return count
+      for obj in unused:
+        self.objects.remove(obj)
+      count += len(unused)
+
+  def _record(self, obj):
+    """ The line getObjects() replies with for obj: see ScriptServer::getObjects(). """
+    if isinstance(obj, (MockVector, MockMatrix)):
+      detail = str(len(obj.values))
+    elif isinstance(obj, MockScalar):
+      detail = obj.value
+    else:
+      detail = obj.plugin_name
+    fields = [_TYPES.get(obj.kind, obj.kind), obj.name(), obj.descriptive_name or obj.kind,
+              obj.provider.name() if obj.provider is not None else "", detail]
+    return "\t".join(f.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+                     for f in fields) + "\n"
+
+  def _get_binary_array(self, command):
+    obj = self.find(command[command.find("(")+1:-1])
+    if isinstance(obj, MockVector):
+      nx, ny = len(obj.values), 1
+    elif isinstance(obj, MockMatrix):
+      nx, ny = obj.nx, obj.ny
+    else:
+      return "No such vector" if command.startswith("Vector") else "No such matrix"
+    return struct.pack(">II", nx, ny) + _to_bytes(obj.values)
+
+  def _get_binary_slice(self, command):
+    """ Vector::getBinarySlice(): see ScriptServer::vectorGetBinarySlice(). """
+    args = _args(command)
+    if len(args) < 4:
+      return "Too few arguments"
+    step = int(args[2]) if args[2] else 1
+    if step == 0:
+      return "Slice step can not be zero"
+    obj = self.find(",".join(args[3:]))
+    if not isinstance(obj, MockVector):
+      return "No such vector"
+    start = int(args[0]) if args[0] else None
+    stop = int(args[1]) if args[1] else None
+    values = obj.values[start:stop:step]
+    return struct.pack(">II", len(values), 1) + _to_bytes(values)
+
+  def _get_binary_values(self, command):
+    """ Vector::getBinaryValues(): see ScriptServer::vectorGetBinaryValues(). """
+    n = int(command[24:command.find(b",")])
+    header = command[:len(command)-n].decode("latin-1")
+    obj = self.find(header[header.find(",")+1:-1])
+    if not isinstance(obj, MockVector):
+      return "No such vector"
+    indices = array.array("i")
+    if hasattr(indices, "frombytes"):
+      indices.frombytes(command[len(command)-n:])
+    else:
+      indices.fromstring(command[len(command)-n:])
+    length = len(obj.values)
+    if any(i < -length or i >= length for i in indices):
+      return "Index out of range"
+    values = array.array("d", [obj.values[i] for i in indices])
+    return struct.pack(">II", len(values), 1) + _to_bytes(values)
+
+  def _stats(self, command):
+    """ Vector::stats() and Matrix::stats(): see ScriptServer::vectorStats(). """
+    obj = self.find(command[command.find("(")+1:-1])
+    if not isinstance(obj, (MockVector, MockMatrix)):
+      return "No such vector" if command.startswith("Vector") else "No such matrix"
+    finite = [x for x in obj.values if x - x == 0]
+    n = len(finite)
+    stats = [("length", len(obj.values)), ("nans", len(obj.values) - n)]
+    if n:
+      mean = sum(finite)/n
+      sum2 = sum(x*x for x in finite)
+      positive = [x for x in finite if x > 1e-300]
+      stats += [("min", min(finite)), ("max", max(finite)), ("mean", mean),
+                ("rms", (sum2/n)**0.5),
+                ("sigma", ((sum2 - n*mean*mean)/(n - 1))**0.5 if n > 1 else max(finite) - min(finite)),
+                ("minPositive", min(positive) if positive else 1e300)]
+    else:
+      stats += [(key, float("nan")) for key in ("min", "max", "mean", "rms", "sigma", "minPositive")]
+    return "".join(key + "\t" + repr(value) + "\n" for key, value in stats)
+
+  def _serial(self, name):
+    """ The line of changeSerial(name): see ScriptServer::objectSerial(). """
+    obj = self.find(name)
+    if obj is None:
+      return "No such object"
+    if isinstance(obj, MockViewItem):
+      return str(self.change_serial)
+    return "0." + str(obj.serial)
+
+  def _set_binary_array(self, command):
+    close = command.find(b")")
+    args = command[31:close].decode("latin-1").split(",")
+    n = int(args[0])
+    data = command[len(command)-n:]
+    header = command[:len(command)-n].decode("latin-1")
+    if command.startswith(b"EditableVector"):
+      obj = self.find(header[header.find(",")+1:-1])
+      if not isinstance(obj, MockVector):
+        return "No such vector"
+    else:
+      name = header[31:-1].split(",", 3)[3]
+      obj = self.find(name)
+      if not isinstance(obj, MockMatrix):
+        return "No such matrix"
+      obj.nx, obj.ny = int(args[1]), int(args[2])
+    obj.values = _from_bytes(data)
+    obj.serial = self.change_serial
+    return "Done"
+
+
+def main(argv):
+  """ Runs a mock server, taking the same --serverName and --readyFd options as kst. """
+  server_name = "kstScript"
+  ready_fd = None
+  for arg in argv[1:]:
+    if arg.startswith("--serverName="):
+      server_name = arg[13:]
+    elif arg.startswith("--readyFd="):
+      ready_fd = int(arg[10:])
+    elif not arg.startswith("-"):
+      server_name = arg
+  server = MockServer(server_name).start()
+  if ready_fd is not None:
+    os.write(ready_fd, (server_name + "\n").encode())
+    os.close(ready_fd)
+  try:
+    while True:
+      threading.Event().wait(3600)
+  except KeyboardInterrupt:
+    server.close()
+
+if __name__ == "__main__":
+  main(sys.argv)
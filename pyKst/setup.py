@@ -1,5 +1,6 @@
 from distutils.core import setup
 setup(name='pykst',
       version='0.1',
-      py_modules=['pykst', 'pykstplot'],
+      py_modules=['pykst', 'pykstplot', 'pykstaio', 'pykstmock'],
+      scripts=['pykst-replay'],
       )
@@ -0,0 +1,736 @@
+#!/usr/bin/python2.7
+""" Tests of pykst, run against pykstmock rather than kst, so that they need no display::
+
+  python2.7 -m unittest test_pykst
+"""
+
+import itertools
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy
+
+import pykst
+import pykstmock
+
+_names = itertools.count()
+
+def _server_name():
+  return "pykstTest-" + str(os.getpid()) + "-" + str(next(_names))
+
+def _frames(commands, header=">I"):
+  """ commands, each prefixed by its length, as batch() and framed connections take them. """
+  return b"".join(struct.pack(header, len(command)) + command for command in commands)
+
+
+class MockTestCase(unittest.TestCase):
+  """ Starts a mock kst for each test, with a client which speaks protocol to it. """
+
+  protocol = pykst.PROTOCOL_VERSION
+
+  def setUp(self):
+    self.server = pykstmock.MockServer(_server_name()).start()
+    self.client = self.connect()
+
+  def tearDown(self):
+    self.client.close()
+    self.server.close()
+
+  def connect(self):
+    newest, pykst.PROTOCOL_VERSION = pykst.PROTOCOL_VERSION, self.protocol
+    try:
+      return pykst.Client(self.server.server_name)
+    finally:
+      pykst.PROTOCOL_VERSION = newest
+
+
+class MockServerTest(unittest.TestCase):
+  """ pykstmock itself. """
+
+  def test_context(self):
+    with pykstmock.MockServer(_server_name()) as server:
+      client = pykst.Client(server.server_name)
+      client.new_generated_scalar(1)
+      self.assertEqual(len(client.objects()), 1)
+      server.clear()
+      self.assertEqual(client.objects(), [])
+      client.close()
+    self.assertFalse(os.path.exists(server.path))
+
+  def test_program(self):
+    # as start_kst() and KstServerPool run kst
+    mock = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pykstmock.py")
+    name, process = pykst.start_kst(_server_name(), command=(sys.executable, mock))
+    try:
+      client = pykst.Client(name)
+      self.assertEqual(client.protocol, pykstmock.PROTOCOL_VERSION)
+      self.assertEqual(client.tab_count(), "1")
+      client.close()
+    finally:
+      process.terminate()
+      process.wait()
+
+
+class FramingTest(MockTestCase):
+  """ The wire protocol, spoken over a bare socket. """
+
+  def raw_socket(self, protocol):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(pykst.server_path(self.server.server_name))
+    sock.settimeout(10)
+    sock.sendall(b"protocol(" + str(protocol).encode() + b")")
+    self.assertEqual(sock.recv(100), str(protocol).encode())
+    return sock
+
+  def read(self, sock, n):
+    data = b""
+    while len(data) < n:
+      chunk = sock.recv(n - len(data))
+      self.assertTrue(chunk, "the mock closed the connection")
+      data += chunk
+    return data
+
+  def test_protocol_2(self):
+    sock = self.raw_socket(2)
+    # two commands in one write, and one command split across two
+    sock.sendall(_frames([b"tabCount()", b"newTab()"]))
+    frame = _frames([b"tabCount()"])
+    sock.sendall(frame[:5])
+    time.sleep(0.05)
+    sock.sendall(frame[5:])
+    replies = []
+    for i in range(3):
+      n = struct.unpack(">I", self.read(sock, 4))[0]
+      replies.append(self.read(sock, n))
+    self.assertEqual(replies, [b"1", b"Done", b"2"])
+    sock.close()
+
+  def test_protocol_3(self):
+    sock = self.raw_socket(3)
+    sock.sendall(struct.pack(">II", 10, 7) + b"tabCount()" + struct.pack(">II", 16, 8) + b"changeSerial(  )")
+    replies = {}
+    for i in range(2):
+      n, request = struct.unpack(">II", self.read(sock, 8))
+      replies[request] = self.read(sock, n)
+    self.assertEqual(sorted(replies), [7, 8])
+    self.assertEqual(replies[7], b"1")
+    sock.close()
+
+  def test_protocol_negotiation(self):
+    self.assertEqual(self.client.protocol, pykst.PROTOCOL_VERSION)
+    sock = self.raw_socket(1)
+    sock.sendall(b"protocol(99)")
+    self.assertEqual(sock.recv(100), str(pykstmock.PROTOCOL_VERSION).encode())
+    sock.close()
+
+
+class ProtocolTest(MockTestCase):
+  """ The same script, spoken in each version of the protocol. """
+
+  protocol = 1
+
+  def test_script(self):
+    self.assertEqual(self.client.protocol, self.protocol)
+    v = self.client.new_generated_vector(0, 9, 10)
+    self.assertEqual(list(v.get_numpy_array()), list(numpy.linspace(0, 9, 10)))
+    s = self.client.new_generated_scalar(4, name="four")
+    self.assertEqual(s.value(), "4")
+    self.assertEqual(s.name(), "four (X1)")
+    with self.client.batch():
+      e = self.client.new_equation(v, "x^2")
+      c = self.client.new_curve(e.x(), e.y())
+    self.assertTrue(c.handle.startswith("Curve"))
+
+class Protocol2Test(ProtocolTest):
+  protocol = 2
+
+class Protocol3Test(ProtocolTest):
+  protocol = 3
+
+class Protocol4Test(ProtocolTest):
+  protocol = 4
+
+
+class BatchTest(MockTestCase):
+
+  def test_tokens(self):
+    # ${n} stands for the reply to the nth command, less any "Finished editing "
+    commands = [b"newGeneratedScalar()", b"setValue(5)", b"endEdit()",
+                b"beginEdit(${2})", b"value()", b"endEdit()", b"eliminate(${2})"]
+    reply = self.client.send(b"batch()" + _frames(commands))
+    replies = []
+    while reply:
+      n = struct.unpack(">I", reply[:4])[0]
+      replies.append(reply[4:4+n])
+      reply = reply[4+n:]
+    self.assertEqual(len(replies), len(commands))
+    self.assertTrue(replies[2].startswith(b"Finished editing "))
+    self.assertEqual(replies[4], b"5")
+
+  def test_placeholders(self):
+    with self.client.batch():
+      s = self.client.new_generated_scalar(3)
+      handle = s.handle
+      self.assertIsInstance(handle, pykst.BatchReply)
+      self.assertFalse(handle.done())
+    self.assertTrue(handle.done())
+    self.assertEqual(s.value(), "3")
+
+  def test_exception_sends_nothing(self):
+    count = len(self.client.objects())
+    with self.assertRaises(KeyError):
+      with self.client.batch():
+        self.client.new_generated_scalar(3)
+        raise KeyError()
+    self.assertEqual(len(self.client.objects()), count)
+
+  def test_transaction(self):
+    with self.client.batch(hold_updates=True):
+      vectors = self.client.new_data_vectors("data.dirfile", ["A", "B"], names=["a", "b"])
+    self.assertEqual([v.name() for v in vectors], ["a (V1)", "b (V2)"])
+
+  def test_transaction_needs_protocol_4(self):
+    self.client.protocol = 3
+    with self.assertRaises(RuntimeError):
+      with self.client.batch(hold_updates=True):
+        pass
+    # the bulk creators just do without
+    self.assertEqual(len(self.client.new_curves(self.client.new_generated_vector(0, 1, 2),
+                                                [self.client.new_generated_vector(0, 1, 2)])), 1)
+
+
+class CacheTest(MockTestCase):
+
+  def setUp(self):
+    MockTestCase.setUp(self)
+    self.other = self.connect()
+    self.scalar = self.client.new_generated_scalar(1)
+    self.vector = self.client.new_generated_vector(0, 1, 5)
+    # count what kst is sent, batched or not
+    self.received = []
+    dispatch = self.server._dispatch
+    def counting(command, connection):
+      self.received.append(command[:command.find(b"(")].decode("latin-1"))
+      return dispatch(command, connection)
+    self.server._dispatch = counting
+
+  def tearDown(self):
+    self.other.close()
+    MockTestCase.tearDown(self)
+
+  def sent(self, verb):
+    return self.received.count(verb)
+
+  def test_reads_are_cached(self):
+    self.assertTrue(self.client.enable_cache(max_age=100))
+    self.assertEqual(self.scalar.value(), "1")
+    self.assertEqual(self.scalar.value(), "1")
+    self.scalar.name()
+    self.assertEqual(self.sent("properties"), 1)
+    self.assertEqual(self.sent("value"), 0)
+
+  def test_own_changes(self):
+    self.client.enable_cache(max_age=100)
+    self.scalar.value()
+    self.scalar.set_value(2)
+    self.assertEqual(self.scalar.value(), "2")
+
+  def test_other_changes(self):
+    self.client.enable_cache(max_age=0)
+    self.scalar.value()
+    self.other.generated_scalar(self.scalar.handle).set_value(3)
+    self.assertEqual(self.scalar.value(), "3")
+
+  def test_other_changes_wait_for_max_age(self):
+    self.client.enable_cache(max_age=100)
+    self.scalar.value()
+    self.other.generated_scalar(self.scalar.handle).set_value(3)
+    self.assertEqual(self.scalar.value(), "1")
+    self.client.invalidate_cache()
+    self.assertEqual(self.scalar.value(), "3")
+
+  def test_own_changes_keep_other_objects(self):
+    self.client.enable_cache(max_age=100)
+    self.scalar.value()
+    self.vector.length()
+    self.vector.change(0, 1, 8)
+    self.assertEqual(self.vector.length(), "8")
+    del self.received[:]
+    self.assertEqual(self.scalar.value(), "1")
+    self.assertEqual(self.sent("value"), 0)
+    self.assertEqual(self.sent("properties"), 0)
+
+  def test_other_changes_drop_only_their_object(self):
+    self.client.enable_cache(max_age=0)
+    self.scalar.value()
+    self.vector.length()
+    self.other.generated_scalar(self.scalar.handle).set_value(3)
+    del self.received[:]
+    self.assertEqual(self.scalar.value(), "3")
+    self.assertEqual(self.vector.length(), "5")
+    self.assertEqual(self.sent("length"), 0)
+    self.assertEqual(self.sent("value"), 1)
+
+  def test_one_check_for_every_object(self):
+    self.client.enable_cache(max_age=0)
+    scalars = [self.client.new_generated_scalar(i) for i in range(10)]
+    for scalar in scalars + [self.scalar]:
+      scalar.value()
+    del self.received[:]
+    self.assertEqual(self.scalar.value(), "1")
+    # one changeSerial(handle|handle|...) for all eleven, and one changeSerial()
+    self.assertEqual(self.sent("changeSerial"), 2)
+    self.assertEqual(self.sent("value") + self.sent("properties"), 0)
+
+  def test_deleted_objects(self):
+    self.client.enable_cache(max_age=0)
+    self.scalar.value()
+    self.other.send("clear()")
+    self.assertEqual(self.other.new_generated_scalar(7).handle, self.scalar.handle)
+    self.assertEqual(self.scalar.value(), "7")
+
+  def test_listed_objects(self):
+    self.client.enable_cache(max_age=0)
+    scalar = self.client.objects(pykst.GeneratedScalar)[0]
+    del self.received[:]
+    self.assertEqual(scalar.value(), "1")
+    self.assertEqual(self.sent("value"), 0)
+    self.other.generated_scalar(self.scalar.handle).set_value(3)
+    self.client.objects()
+    self.other.generated_scalar(self.scalar.handle).set_value(4)
+    self.assertEqual(scalar.value(), "4")
+
+  def test_only_getters_are_cached(self):
+    self.client.enable_cache(max_age=100)
+    for i in range(2):
+      self.client.send_si(self.scalar.handle, "showEditDialog()")
+    self.assertEqual(self.sent("showEditDialog"), 2)
+
+  def test_reads_are_not_changes(self):
+    serial = self.server.change_serial
+    self.scalar.value()
+    self.scalar.name()
+    self.client.objects()
+    self.assertEqual(self.server.change_serial, serial)
+    self.scalar.set_value(4)
+    self.assertGreater(self.server.change_serial, serial)
+
+
+class VectorTest(MockTestCase):
+
+  def setUp(self):
+    MockTestCase.setUp(self)
+    self.data = numpy.arange(10.0)
+    self.vector = self.client.new_editable_vector(self.data)
+
+  def test_slices(self):
+    for index in (slice(2, 8, 2), slice(None, None, -3), slice(-4, None), slice(5, 2)):
+      self.assertEqual(list(self.vector[index]), list(self.data[index]))
+    self.assertEqual(self.vector[-1], 9)
+    self.assertEqual(list(self.vector.values([1, 3, -1])), [1, 3, 9])
+    self.assertEqual(list(self.vector.tail(3)), [7, 8, 9])
+    with self.assertRaises(IndexError):
+      self.vector.values([10])
+
+  def test_shared_memory(self):
+    shared = self.client.new_shared_array(4)
+    shared[:] = 7
+    self.vector.load(shared)
+    self.assertEqual(list(self.vector.get_numpy_array(shared=True)), [7]*4)
+    # kst's vectors can not be empty, so loading nothing leaves them be
+    self.vector.load(self.client.new_shared_array(0))
+    self.assertEqual(len(self.vector.get_numpy_array(shared=True)), 4)
+
+
+class StatisticsTest(MockTestCase):
+
+  def check(self, stats, data):
+    finite = data[numpy.isfinite(data)]
+    self.assertEqual(stats["length"], data.size)
+    self.assertEqual(stats["nans"], data.size - finite.size)
+    self.assertEqual(stats["min"], finite.min())
+    self.assertEqual(stats["max"], finite.max())
+    self.assertAlmostEqual(stats["mean"], finite.mean())
+    self.assertAlmostEqual(stats["rms"], numpy.sqrt((finite**2).mean()))
+    self.assertAlmostEqual(stats["sigma"], finite.std(ddof=1))
+    self.assertEqual(stats["min_positive"], finite[finite > 0].min())
+
+  def test_vector(self):
+    data = numpy.array([1.5, -2.0, 4.0, numpy.nan, numpy.inf, 3.0])
+    self.check(self.client.new_editable_vector(data).stats(), data)
+
+  def test_matrix(self):
+    data = numpy.array([[1.0, 2.0, -3.0], [0.5, numpy.nan, 8.0]])
+    self.check(self.client.new_editable_matrix(data).stats(), data)
+
+  def test_errors(self):
+    scalar = self.client.new_generated_scalar(1)
+    with self.assertRaises(ValueError):
+      self.client.get_statistics("Vector::stats(" + scalar.handle + ")")
+    vector = self.client.new_generated_vector(0, 1, 3)
+    with self.assertRaises(RuntimeError):
+      with self.client.batch():
+        vector.stats()
+
+  def test_stats_are_reads(self):
+    vector = self.client.new_generated_vector(0, 1, 3)
+    serial = self.server.change_serial
+    vector.stats()
+    self.assertEqual(self.server.change_serial, serial)
+
+
+class ObjectsTest(MockTestCase):
+
+  def setUp(self):
+    MockTestCase.setUp(self)
+    vector = self.client.new_generated_vector(0, 1, 5)
+    self.client.new_editable_vector(numpy.arange(3.0))
+    equation = self.client.new_equation(vector, "x^2")
+    plot = self.client.new_plot()
+    plot.add(self.client.new_curve(equation.x(), equation.y()))
+    self.client.new_generated_scalar(2)
+    self.client.new_editable_matrix(numpy.zeros((2, 2)))
+    self.client.new_generated_string("hi")
+    self.client.enable_stats()
+
+  def test_objects(self):
+    objects = self.client.objects()
+    self.assertEqual(sorted((obj.handle, type(obj).__name__) for obj in objects),
+                     [("Curve (C1)", "Curve"), ("E1:O (V4)", "VectorBase"), ("E1:XO (V3)", "VectorBase"),
+                      ("Editable Matrix (M1)", "EditableMatrix"), ("Editable Vector (V2)", "EditableVector"),
+                      ("Equation (E1)", "Equation"), ("Generated Scalar (X1)", "GeneratedScalar"),
+                      ("Generated String (T1)", "GeneratedString"), ("Generated Vector (V1)", "GeneratedVector"),
+                      ("Plot (P1)", "Plot")])
+    self.assertEqual(list(self.client.stats()), ["getObjects"])
+    self.assertEqual(sorted(obj.handle for obj in self.client.objects(pykst.VectorBase)),
+                     ["E1:O (V4)", "E1:XO (V3)", "Editable Vector (V2)", "Generated Vector (V1)"])
+    self.assertEqual([a is b for a, b in zip(objects, self.client.objects())], [True]*len(objects))
+
+  def test_object(self):
+    vector = self.client.objects()[0]
+    self.assertIs(self.client.object("Generated Vector (V1)"), vector)
+    self.assertEqual(self.client.stats()["getObjects"]["count"], 1)
+    self.assertIs(self.client.object("V1"), vector)
+    self.assertEqual(self.client.stats()["getObjects"]["count"], 2)
+    self.assertIsInstance(self.client.object("E1"), pykst.Equation)
+    with self.assertRaises(ValueError):
+      self.client.object("V99")
+
+  def test_lookup(self):
+    vector = self.client.lookup("V1")
+    self.assertIsInstance(vector, pykst.GeneratedVector)
+    self.assertIs(self.client.lookup("Generated Vector (V1)"), vector)
+    self.assertIsInstance(self.client.lookup("P1"), pykst.Plot)
+    self.assertIsNone(self.client.lookup("V99"))
+    # lookup() always asks kst, and object() then knows the name too
+    self.assertEqual(self.client.stats()["getObjects"]["count"], 4)
+    self.assertIs(self.client.object("V1"), vector)
+    self.assertEqual(self.client.stats()["getObjects"]["count"], 4)
+
+  def test_find(self):
+    self.assertEqual(sorted(obj.handle for obj in self.client.find("*vector*")),
+                     ["Editable Vector (V2)", "Generated Vector (V1)"])
+    self.assertEqual([obj.handle for obj in self.client.find("generated VECTOR (v1)")],
+                     ["Generated Vector (V1)"])
+    self.assertEqual(sorted(obj.handle for obj in self.client.find("E1:*", kind="vector")),
+                     ["E1:O (V4)", "E1:XO (V3)"])
+    self.assertEqual([obj.handle for obj in self.client.find("*", kind=pykst.Plot)], ["Plot (P1)"])
+    self.assertEqual(self.client.find("*", kind="relation")[0].handle, "Curve (C1)")
+    self.assertEqual(self.client.find("Curve (C1)", kind="vector"), [])
+    self.assertEqual(self.client.find("nothing*"), [])
+    # only matches are sent, and the same object comes back each time
+    self.assertIs(self.client.find("Plot*")[0], self.client.objects(pykst.Plot)[0])
+    self.assertEqual(self.client.stats()["findObjects"]["count"], 8)
+
+  def test_cached_details(self):
+    self.client.enable_cache(max_age=100)
+    vector = self.client.objects(pykst.GeneratedVector)[0]
+    self.assertEqual(vector.name(), "Generated Vector (V1)")
+    self.assertEqual(vector.length(), "5")
+    self.assertEqual(self.client.objects(pykst.GeneratedScalar)[0].value(), "2")
+    for verb in ("name", "length", "value"):
+      self.assertNotIn(verb, self.client.stats())
+
+  def test_empty_session(self):
+    self.client.clear()
+    self.assertEqual(self.client.objects(), [])
+
+
+class DeleteTest(MockTestCase):
+
+  def handles(self):
+    return sorted(obj.handle for obj in self.client.objects())
+
+  def test_delete(self):
+    vectors = [self.client.new_generated_vector(0, 1, 5) for i in range(3)]
+    equation = self.client.new_equation(vectors[0], "x^2")
+    equation.y()
+    self.assertEqual(self.client.delete([vectors[1], "V3"]), 2)
+    self.assertEqual(self.handles(), ["E1:O (V4)", "Equation (E1)", "Generated Vector (V1)"])
+    # outputs go with their data object
+    self.assertEqual(self.client.delete(equation), 1)
+    self.assertEqual(self.handles(), ["Generated Vector (V1)"])
+    self.assertEqual(self.client.delete(["V99"]), 0)
+
+  def test_delete_nothing(self):
+    self.client.enable_stats()
+    self.assertEqual(self.client.delete([]), 0)
+    self.assertEqual(self.client.stats(), {})
+
+  def test_delete_in_batch(self):
+    scalar = self.client.new_generated_scalar(1)
+    with self.client.batch():
+      deleted = self.client.delete(scalar)
+    self.assertEqual(deleted.result(), "1")
+    self.assertEqual(self.client.objects(), [])
+
+  def test_delete_forgets_wrappers(self):
+    vector = self.client.new_generated_vector(0, 1, 5)
+    self.assertEqual(self.client.objects()[0].handle, vector.handle)
+    self.client.delete(vector)
+    with self.assertRaises(ValueError):
+      self.client.object(vector.handle)
+
+  def test_prune_unused(self):
+    x = self.client.new_generated_vector(0, 1, 5)
+    y = self.client.new_generated_vector(1, 2, 5)
+    plot = self.client.new_plot()
+    plot.add(self.client.new_curve(x, y))
+    unused = self.client.new_generated_vector(0, 1, 5)
+    self.client.new_equation(unused, "x^2").y()
+    self.client.new_generated_scalar(1)
+    self.assertGreaterEqual(self.client.prune_unused(), 3)
+    self.assertEqual(self.handles(), ["Curve (C1)", "Generated Vector (V1)", "Generated Vector (V2)",
+                                      "Plot (P1)"])
+    self.assertEqual(self.client.prune_unused(), 0)
+
+
+class SpecTest(MockTestCase):
+
+  spec = {
+    "datasources": {"d": {"filename": "data.dirfile"}},
+    "vectors": {"t": {"source": "d", "field": "INDEX"}},
+    "data_objects": {"e": {"type": "equation", "x_vector": "t", "equation": "x^2"}},
+    "curves": {"c": {"x_vector": "e.x", "y_vector": "e.y", "color": "red"}},
+    "tabs": [{"name": "T", "plots": [{"curves": ["c"], "name": "p", "legend": True}]}],
+  }
+
+  def test_apply(self):
+    objects = self.client.apply_spec(self.spec)
+    self.assertEqual(sorted(objects), ["c", "e", "p", "t"])
+    self.assertIsInstance(objects["c"], pykst.Curve)
+    self.assertEqual(objects["t"].name(), "t (V1)")
+
+  def test_tab_names_are_not_failures(self):
+    self.client.set_tab_text("Error log")
+    self.client.apply_spec(dict(self.spec, tabs=[{"plots": [{"curves": ["c"]}]}]))
+    self.assertEqual(self.client.tab_text(), "Error log")
+
+  def test_failure_removes_what_was_made(self):
+    self.client.set_tab_text("Mine")
+    self.client.new_tab()
+    self.client.set_tab(0)
+    dispatch = self.server._dispatch
+    def failing(command, connection):
+      if command.startswith(b"setColor("):
+        return "Invalid"
+      return dispatch(command, connection)
+    self.server._dispatch = failing
+    spec = dict(self.spec, tabs=self.spec["tabs"] + [{"name": "U", "plots": [{"curves": ["c"]}]}])
+    with self.assertRaises(RuntimeError):
+      self.client.apply_spec(spec)
+    self.assertEqual(self.client.objects(), [])
+    self.assertEqual(self.client.tab_count(), "2")
+    self.assertEqual(self.client.current_tab(), "0")
+    self.assertEqual(self.client.tab_text(), "Mine")
+
+  def test_bad_spec_sends_nothing(self):
+    spec = dict(self.spec, curves={"c": {"x_vector": "e.x", "y_vector": "e.y", "colour": "red"}})
+    with self.assertRaises(ValueError):
+      self.client.apply_spec(spec)
+    self.assertEqual(self.client.objects(), [])
+
+
+class AsyncTest(MockTestCase):
+
+  def test_timeout(self):
+    from concurrent.futures import TimeoutError
+    dispatch = self.server._dispatch
+    def slow(command, connection):
+      if command.startswith(b"exportGraphics("):
+        time.sleep(0.5)
+      return dispatch(command, connection)
+    self.server._dispatch = slow
+    future = self.client.send_async("exportGraphics(x.png,png,10,10,2)")
+    with self.assertRaises(TimeoutError):
+      future.result(timeout=0.05)
+    self.assertEqual(future.result(timeout=10), "Done")
+
+
+class ClientPoolTest(MockTestCase):
+
+  def setUp(self):
+    MockTestCase.setUp(self)
+    # count the connections the mock is asked for
+    self.connections = []
+    serve = self.server._serve
+    def counting(connection):
+      self.connections.append(connection)
+      serve(connection)
+    self.server._serve = counting
+
+  def run_threads(self, target, n):
+    errors = []
+    def run(i):
+      try:
+        target(i)
+      except Exception as e:
+        errors.append(e)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    if errors:
+      raise errors[0]
+
+  def test_threads(self):
+    pool = pykst.ClientPool(self.server.server_name, size=3)
+    # made in this thread, used from the others, each through its own connection
+    scalars = [pool.new_generated_scalar(i) for i in range(8)]
+    pool.release()
+    def work(i):
+      for j in range(20):
+        # a second, editing, command between beginEdit() and endEdit() of
+        # another thread's would be answered for the wrong object
+        with scalars[i].editing():
+          self.assertEqual(scalars[i].value(), str(i))
+          self.assertEqual(scalars[i].name(), "Generated Scalar (X" + str(i+1) + ")")
+        with pool.batch():
+          vector = pool.new_generated_vector(0, 1, i+2)
+        self.assertEqual(vector.length(), str(i+2))
+        pool.release()
+    self.run_threads(work, 8)
+    self.assertLessEqual(len(self.connections), 3)
+    self.assertLessEqual(pool._count, 3)
+    pool.close()
+
+  def test_bound(self):
+    pool = pykst.ClientPool(self.server.server_name, size=1, timeout=0.2)
+    pool.tab_count()    # this thread holds the only connection
+    with self.assertRaises(RuntimeError):
+      self.run_threads(lambda i: pool.tab_count(), 1)
+    pool.release()
+    self.run_threads(lambda i: pool.tab_count(), 4)
+    self.assertEqual(len(self.connections), 1)
+    pool.close()
+
+  def test_release_inside_batch(self):
+    pool = pykst.ClientPool(self.server.server_name, size=2)
+    with pool.batch():
+      pool.new_generated_scalar(1)
+      with self.assertRaises(RuntimeError):
+        pool.release()
+    pool.release()
+    pool.close()
+
+
+class RecordingTest(MockTestCase):
+
+  def setUp(self):
+    MockTestCase.setUp(self)
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, "session.rec.gz")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+    MockTestCase.tearDown(self)
+
+  def record(self):
+    with self.client.recording(self.path):
+      scalar = self.client.new_generated_scalar(5, name="five")
+      self.client.tab_count()
+      time.sleep(0.3)
+      self.client.send_async("exportGraphics(x.png,png,10,10,2)").result()
+      scalar.value()
+    return scalar
+
+  def test_format(self):
+    self.record()
+    with open(self.path, "rb") as f:
+      self.assertEqual(f.read(2), b"\x1f\x8b")   # gzip
+    entries = list(pykst.read_recording(self.path))
+    verbs = [command[:command.find("(")] for offset, seconds, is_async, received, command in entries]
+    self.assertEqual(verbs[0], "newGeneratedScalar")
+    self.assertEqual(verbs[-3:], ["beginEdit", "value", "endEdit"])
+    offsets = [entry[0] for entry in entries]
+    self.assertEqual(offsets, sorted(offsets))
+    export = verbs.index("exportGraphics")
+    self.assertEqual(verbs[export-1], "tabCount")
+    self.assertGreaterEqual(offsets[export] - offsets[export-1], 0.3)
+    for offset, seconds, is_async, received, command in entries:
+      self.assertEqual(is_async, command.startswith("exportGraphics("))
+      if is_async:
+        self.assertEqual(seconds, 0)
+      else:
+        self.assertGreater(seconds, 0)
+        self.assertGreater(received, 0)
+
+  def test_replay(self):
+    self.record()
+    self.server.clear()
+    result = pykst.replay(self.client, self.path, speed=0)
+    self.assertEqual(result["commands"], len(list(pykst.read_recording(self.path))))
+    self.assertLess(result["seconds"], 0.3)
+    self.assertGreater(result["recorded_latency"], 0)
+    self.assertGreater(result["replayed_latency"], 0)
+    self.assertEqual(self.client.generated_scalar("five (X1)").value(), "5")
+
+  def test_pacing(self):
+    self.record()
+    started = time.time()
+    result = pykst.replay(self.client, self.path, speed=2)
+    self.assertGreaterEqual(time.time() - started, 0.15)
+    self.assertGreaterEqual(result["seconds"], 0.15)
+
+  def test_replay_tool(self):
+    self.record()
+    self.server.clear()
+    tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pykst-replay")
+    output = subprocess.check_output([sys.executable, tool, self.path, "--speed", "0",
+                                      "--server-name", self.server.server_name])
+    commands = len(list(pykst.read_recording(self.path)))
+    self.assertTrue(output.startswith(str(commands).encode() + b" commands in "))
+    self.assertEqual(self.client.tab_count(), "1")
+    self.assertEqual(self.client.lookup("X1").name(), "five (X1)")
+
+
+class ServerPoolTest(unittest.TestCase):
+
+  def test_close_stops_starting_sessions(self):
+    started = []
+    class Pool(pykst.KstServerPool):
+      def _started(self, name, process):
+        started.append(process)
+        pykst.KstServerPool._started(self, name, process)
+    mock = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pykstmock.py")
+    pool = Pool(2, command=(sys.executable, mock), prefix=_server_name())
+    client = pool.checkout()
+    self.assertEqual(client.tab_count(), "1")
+    pool.release(client)
+    pool.close()    # while the session replacing the one checked out is still starting
+    self.assertEqual(len(started), 3)
+    for process in started:
+      self.assertIsNotNone(process.poll())
+
+
+if __name__ == "__main__":
+  unittest.main()
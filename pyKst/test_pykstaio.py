@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+""" Tests of pykstaio, run against pykstmock rather than kst, so that they need no display::
+
+  python3 -m unittest test_pykstaio
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+import time
+import unittest
+
+import pykstaio
+import pykstmock
+
+_names = itertools.count()
+
+def _server_name():
+  return "pykstaioTest-" + str(os.getpid()) + "-" + str(next(_names))
+
+
+class AsyncMockTestCase(unittest.TestCase):
+  """ Starts a mock kst for each test, and an event loop to talk to it in. """
+
+  protocol = pykstaio.PROTOCOL_VERSION
+
+  def setUp(self):
+    self.server = pykstmock.MockServer(_server_name()).start()
+    self.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(self.loop)
+    self.client = self.wait(self.connect())
+
+  def tearDown(self):
+    self.wait(self.client.close())
+    self.loop.close()
+    asyncio.set_event_loop(None)
+    self.server.close()
+
+  def wait(self, coroutine):
+    return self.loop.run_until_complete(coroutine)
+
+  async def connect(self):
+    newest, pykstaio.PROTOCOL_VERSION = pykstaio.PROTOCOL_VERSION, self.protocol
+    try:
+      return await pykstaio.connect(self.server.server_name, start=False)
+    finally:
+      pykstaio.PROTOCOL_VERSION = newest
+
+
+class ClientTest(AsyncMockTestCase):
+  """ The same script, spoken in each version of the protocol pykstaio knows. """
+
+  protocol = 1
+
+  def test_send(self):
+    self.assertEqual(self.client.protocol, self.protocol)
+    self.assertEqual(self.wait(self.client.send("tabCount()")), "1")
+    scalar = self.wait(self.client.new_generated_scalar(3, name="three"))
+    self.assertEqual(scalar.handle, "three (X1)")
+    self.assertEqual(self.wait(self.client.send_si(scalar.handle, "value()")), "3")
+    self.assertEqual(self.wait(scalar.name()), "three (X1)")
+
+  def test_send_batch(self):
+    replies = self.wait(self.client.send_batch(
+      ["newGeneratedScalar()", "setValue(5)", "endEdit()", "beginEdit(${2})", "value()", "endEdit()"]))
+    self.assertEqual(len(replies), 6)
+    self.assertEqual(replies[2], "Finished editing Generated Scalar (X1)")
+    self.assertEqual(replies[4], "5")
+
+  def test_placeholders(self):
+    # ${n} is the reply to the n'th command, less any "Finished editing "
+    replies = self.wait(self.client.send_batch(
+      ["newGeneratedVector()", "change(0,1,5)", "endEdit()",
+       "newEquation()", "setInputVector(X,${2})", "setEquation(x^2)", "endEdit()",
+       "beginEdit(${6})", "outputVector(O)", "endEdit()"]))
+    self.assertEqual(replies[8], "E1:O (V2)")
+    # the equation's output is as long as the vector ${2} stood for
+    self.assertEqual(self.wait(self.client.send_si(replies[8], "length()")), "5")
+
+  def test_arrays(self):
+    import numpy
+    values = numpy.linspace(0, 1, 11)
+    vector = self.wait(self.client.new_editable_vector(values))
+    self.assertEqual(self.wait(vector.length()), 11)
+    self.assertEqual(list(self.wait(vector.get_numpy_array())), list(values))
+
+class Protocol2ClientTest(ClientTest):
+  protocol = 2
+
+
+class CancelTest(AsyncMockTestCase):
+
+  def setUp(self):
+    AsyncMockTestCase.setUp(self)
+    dispatch = self.server._dispatch
+    def slow(command, connection):
+      if command.startswith(b"exportGraphics("):
+        time.sleep(0.3)
+      return dispatch(command, connection)
+    self.server._dispatch = slow
+
+  def test_cancelled_send(self):
+    with self.assertRaises(asyncio.TimeoutError):
+      self.wait(asyncio.wait_for(self.client.send("exportGraphics(x.png,png,10,10,2)"), 0.05))
+    # the reply to exportGraphics() is still on its way, so the connection is gone
+    with self.assertRaises(IOError):
+      self.wait(self.client.send("tabCount()"))
+    self.wait(self.client.connect(start=False))
+    self.assertEqual(self.wait(self.client.send("tabCount()")), "1")
+
+  def test_cancelled_batch(self):
+    with self.assertRaises(asyncio.TimeoutError):
+      self.wait(asyncio.wait_for(self.client.send_batch(
+        ["exportGraphics(x.png,png,10,10,2)", "newTab()"]), 0.05))
+    with self.assertRaises(IOError):
+      self.wait(self.client.send_si("V1", "length()"))
+
+  def test_kst_goes_away(self):
+    self.server._dispatch = lambda command, connection: connection.sock.close()
+    with self.assertRaises((asyncio.IncompleteReadError, ConnectionError)):
+      self.wait(self.client.send("tabCount()"))
+    with self.assertRaises(IOError):
+      self.wait(self.client.send("tabCount()"))
+
+
+class StartTest(unittest.TestCase):
+
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(self.loop)
+
+  def tearDown(self):
+    self.loop.close()
+    asyncio.set_event_loop(None)
+
+  def wait(self, coroutine):
+    return self.loop.run_until_complete(coroutine)
+
+  def test_start(self):
+    mock = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pykstmock.py")
+    client = self.wait(pykstaio.connect(_server_name(), command=(sys.executable, mock)))
+    try:
+      self.assertEqual(self.wait(client.send("tabCount()")), "1")
+    finally:
+      self.wait(client.close())
+      client.process.terminate()
+      self.wait(client.process.wait())
+
+  def test_kst_exits(self):
+    started = time.time()
+    with self.assertRaises(IOError):
+      self.wait(pykstaio.connect(_server_name(), timeout=10, command=(sys.executable, "-c", "pass")))
+    self.assertLess(time.time() - started, 5)
+
+  def test_timeout(self):
+    started = time.time()
+    with self.assertRaises(IOError):
+      self.wait(pykstaio.connect(_server_name(), timeout=0.5,
+                                 command=(sys.executable, "-c", "import time; time.sleep(30)")))
+    self.assertLess(time.time() - started, 5)
+
+  def test_no_kst(self):
+    with self.assertRaises(OSError):
+      self.wait(pykstaio.connect(_server_name(), command=("/nonexistent/kst2",)))
+
+
+if __name__ == "__main__":
+  unittest.main()
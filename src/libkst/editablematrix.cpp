@@ -87,6 +87,39 @@ void EditableMatrix::loadFromTmpFile(QFile &fp, int nx, int ny ) {
   internalUpdate(); // not sure if we need this here.
 }
 
+/**  used for scripting IPC.
+     replaces the matrix with nx*ny raw doubles, in row-major order. */
+void EditableMatrix::loadFromBuffer(const char *data, int nx, int ny) {
+  resize(nx, ny, false);
+
+  memcpy(_z, data, nx*ny*sizeof(double));
+
+  internalUpdate();
+}
+
+/**  used for scripting IPC.
+     replaces the matrix with nx*ny raw doubles from a memory mapped file
+     (normally in /dev/shm), in row-major order. */
+bool EditableMatrix::loadFromSharedMemory(QFile &fp, int nx, int ny) {
+  qint64 n_bytes = qint64(nx)*ny*sizeof(double);
+
+  if (nx < 0 || ny < 0 || fp.size() < n_bytes) {
+    return false;
+  }
+  if (n_bytes == 0) {
+    return true; // an empty array: matrices can not be resized to nothing, so there is nothing to do
+  }
+
+  uchar *segment = fp.map(0, n_bytes);
+  if (!segment) {
+    return false;
+  }
+  loadFromBuffer((const char *)segment, nx, ny);
+  fp.unmap(segment);
+
+  return true;
+}
+
 
 ScriptInterface* EditableMatrix::createScriptInterface() {
   return new EditableMatrixSI(this);
@@ -33,6 +33,10 @@ class KSTCORE_EXPORT EditableMatrix : public Matrix {
 
     void loadFromTmpFile(QFile &fp, int nx, int ny);
 
+    void loadFromBuffer(const char *data, int nx, int ny);
+
+    bool loadFromSharedMemory(QFile &fp, int nx, int ny);
+
   protected:
     EditableMatrix(ObjectStore *store);
 
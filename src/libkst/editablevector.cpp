@@ -103,6 +103,40 @@ void EditableVector::loadFromTmpFile(QFile &fp) {
   internalUpdate(); // not sure if we need this here.
 }
 
+/**  used for scripting IPC.
+     replaces the vector with n_bytes of raw doubles.  Vectors can not be
+     empty, so with no doubles the vector is left as it is. */
+void EditableVector::loadFromBuffer(const char *data, int n_bytes) {
+  if (n_bytes < int(sizeof(double))) {
+    return;
+  }
+  resize(n_bytes/sizeof(double), false);
+
+  memcpy(_v_raw, data, length()*sizeof(double));
+
+  internalUpdate();
+}
+
+/**  used for scripting IPC.
+     replaces the vector with the raw doubles in a memory mapped file
+     (normally in /dev/shm). */
+bool EditableVector::loadFromSharedMemory(QFile &fp) {
+  qint64 n_bytes = fp.size();
+
+  if (n_bytes == 0) {
+    return true; // an empty array: see loadFromBuffer()
+  }
+
+  uchar *segment = fp.map(0, n_bytes);
+  if (!segment) {
+    return false;
+  }
+  loadFromBuffer((const char *)segment, n_bytes);
+  fp.unmap(segment);
+
+  return true;
+}
+
 
 QString EditableVector::_automaticDescriptiveName() const {
 
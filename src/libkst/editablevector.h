@@ -46,6 +46,10 @@ class KSTCORE_EXPORT EditableVector : public Vector {
 
     void loadFromTmpFile(QFile &fp);
 
+    void loadFromBuffer(const char *data, int n_bytes);
+
+    bool loadFromSharedMemory(QFile &fp);
+
     ScriptInterface* createScriptInterface();
 
   protected:
@@ -58,6 +58,7 @@ SOURCES += builtindatasources.cpp \
     shortnameindex.cpp \
     string_kst.cpp \
     stringfactory.cpp \
+    timings.cpp \
     updatemanager.cpp \
     vector.cpp \
     vectorfactory.cpp \
@@ -119,6 +120,7 @@ HEADERS += builtindatasources.h \
     stringfactory.h \
     sysinfo.h \
     timezones.h \
+    timings.h \
     updatemanager.h \
     vector.h \
     vectorfactory.h \
@@ -21,6 +21,7 @@
 #include "matrix.h"
 
 #include <math.h>
+#include <string.h>
 #include <QDebug>
 #include <QXmlStreamWriter>
 #include <QList>
@@ -689,6 +690,28 @@ bool Matrix::saveToTmpFile(QFile &fp) {
   return (n_write == n_written);
 }
 
+/**  used for scripting IPC.
+     fp is normally in /dev/shm, and open for reading and writing. */
+bool Matrix::saveToSharedMemory(QFile &fp) {
+  qint64 n_write = _nX*_nY*sizeof(double);
+
+  if (!fp.resize(n_write)) {
+    return false;
+  }
+  if (n_write == 0) {
+    return true; // nothing to copy, and an empty file can not be mapped
+  }
+
+  uchar *segment = fp.map(0, n_write);
+  if (!segment) {
+    return false;
+  }
+  memcpy(segment, _z, n_write);
+  fp.unmap(segment);
+
+  return true;
+}
+
 
 }
 // vim: ts=2 sw=2 et
@@ -85,6 +85,9 @@ class KSTCORE_EXPORT Matrix : public Primitive
     // return least positive z value
     double minValuePositive() const;
 
+    // number of z values which are NaN
+    int numNaN() const { return _NS - _NRealS; }
+
     // number of new samples in the matrix since last resetNumNew()
     int numNew() const;
 
@@ -142,6 +145,9 @@ class KSTCORE_EXPORT Matrix : public Primitive
 
     double Z(int i) const {return _z[i];}
 
+    /** the raw matrix values, flat-packed in row-major order */
+    double const *zValues() const {return _z;}
+
     // output primitives: statistics scalars, etc.
     VectorMap vectors() const {return _vectors;}
     ScalarMap scalars() const {return _scalars;}
@@ -156,6 +162,9 @@ class KSTCORE_EXPORT Matrix : public Primitive
     /** dump the matrix values to a raw binary file */
     bool saveToTmpFile(QFile &fp);
 
+    /** copy the matrix values into a memory mapped file, resizing it to fit */
+    bool saveToSharedMemory(QFile &fp);
+
   protected:
     int _NS;
     int _NRealS; // number of samples with real values
@@ -87,6 +87,22 @@ QString MatrixCommonSI::store(QString & command) {
   }
 }
 
+QString MatrixCommonSI::storeShared(QString & command) {
+  QString arg = getArg(command);
+  QFile segment(arg);
+
+  if (segment.open(QIODevice::ReadWrite) && _matrix->saveToSharedMemory(segment)) {
+    return QString("%1 %2").arg(_matrix->xNumSteps()).arg(_matrix->yNumSteps());
+  } else {
+    return "Error writing shared memory";
+  }
+}
+
+QStringList MatrixCommonSI::getters() {
+  return ScriptInterface::getters() << "length" << "min" << "max" << "mean" << "width" << "height"
+                                    << "dX" << "dY" << "minX" << "minY";
+}
+
 
 /******************************************************/
 /* Data Matrix                                        */
@@ -114,6 +130,7 @@ DataMatrixSI::DataMatrixSI(DataMatrixPtr it) {
     _fnMap.insert("minX",&DataMatrixSI::minX);
     _fnMap.insert("minY",&DataMatrixSI::minY);
     _fnMap.insert("store",&DataMatrixSI::store);
+    _fnMap.insert("storeShared",&DataMatrixSI::storeShared);
 }
 
 QString DataMatrixSI::doCommand(QString command_in) {
@@ -142,6 +159,10 @@ bool DataMatrixSI::isValid() {
   return _datamatrix.isPtrValid();
 }
 
+QStringList DataMatrixSI::getters() {
+  return MatrixCommonSI::getters() << "filename" << "field" << "startX" << "startY";
+}
+
 ScriptInterface* DataMatrixSI::newMatrix(ObjectStore *store) {
   DataMatrixPtr matrix;
   matrix = store->createObject<DataMatrix>();
@@ -212,6 +233,7 @@ EditableMatrixSI::EditableMatrixSI(EditableMatrixPtr it) {
     _matrix = it;
 
     _fnMap.insert("load", &EditableMatrixSI::load);
+    _fnMap.insert("loadShared", &EditableMatrixSI::loadShared);
 
     // Matrix Common Commands
     _fnMap.insert("value",&EditableMatrixSI::value);
@@ -226,6 +248,7 @@ EditableMatrixSI::EditableMatrixSI(EditableMatrixPtr it) {
     _fnMap.insert("minX",&EditableMatrixSI::minX);
     _fnMap.insert("minY",&EditableMatrixSI::minY);
     _fnMap.insert("store",&EditableMatrixSI::store);
+    _fnMap.insert("storeShared",&EditableMatrixSI::storeShared);
 }
 
 QString EditableMatrixSI::doCommand(QString command_in) {
@@ -277,4 +300,19 @@ QString EditableMatrixSI::load(QString& command) {
   return "done";
 }
 
+QString EditableMatrixSI::loadShared(QString& command) {
+  QStringList vars = getArgs(command);
+  if (vars.size() < 3) {
+    return "Too few arguments";
+  }
+
+  QFile segment(vars[0]);
+  if (segment.open(QIODevice::ReadOnly) &&
+      _editablematrix->loadFromSharedMemory(segment, vars[1].toInt(), vars[2].toInt())) {
+    return "done";
+  } else {
+    return "Error reading shared memory";
+  }
+}
+
 }
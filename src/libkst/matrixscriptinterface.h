@@ -39,6 +39,8 @@ class KSTCORE_EXPORT MatrixCommonSI : public ScriptInterface
     QString minX(QString&);
     QString minY(QString&);
     QString store(QString &command);
+    QString storeShared(QString &command);
+    QStringList getters();
 
   protected:
     MatrixPtr _matrix;
@@ -59,6 +61,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newMatrix(ObjectStore *store);
 
@@ -89,6 +92,7 @@ public:
     static ScriptInterface* newMatrix(ObjectStore *store);
 
     QString load(QString &);
+    QString loadShared(QString &);
 
 private:
     QMap<QString,EditableMatrixInterfaceMemberFn> _fnMap;
@@ -71,6 +71,16 @@ bool ObjectStore::removeObject(Object *o) {
   } else {
     o->deleteDependents();
     _list.removeAll(o);
+    if (_shortNameIndex.value(o->shortName()) == o) {
+      _shortNameIndex.remove(o->shortName());
+      // should two objects ever share a short name, the one left takes over
+      foreach (const ObjectPtr& other, _list) {
+        if (other->shortName() == o->shortName()) {
+          _shortNameIndex.insert(other->shortName(), other);
+          break;
+        }
+      }
+    }
   }
 
   o->_store = 0;
@@ -92,12 +102,12 @@ ObjectPtr ObjectStore::retrieveObject(const QString& name, bool enforceUnique) c
   shortName = rx.cap(2);
 
   // 1) search for short names
-  int size = _list.size();
-  for (int i = 0; i < size; ++i) {
-    if (_list.at(i)->shortName()==shortName)
-      return _list.at(i);
+  Object *o = _shortNameIndex.value(shortName);
+  if (o) {
+    return ObjectPtr(o);
   }
   // 3) search for descriptive names: must be unique
+  int size = _list.size();
   for (int i = 0; i < size; ++i) {
     if (_list.at(i)->descriptiveName() == name) {
       if (enforceUnique && (match != -1)) {
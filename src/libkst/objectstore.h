@@ -19,6 +19,7 @@
 #define OBJECTSTORE_H
 
 #include <QDebug>
+#include <QHash>
 
 #include "kst_export.h"
 #include "object.h"
@@ -105,6 +106,10 @@ class KSTCORE_EXPORT ObjectStore
     DataSourceList _dataSourceList;
     QList<ObjectPtr> _list;
 
+    // the objects in _list by short name, so that retrieveObject() need not search _list.
+    // Short names are set when objects are made and never change.
+    QHash<QString, Object*> _shortNameIndex;
+
 };
 
 
@@ -150,6 +155,9 @@ bool ObjectStore::addObject(T *o) {
     _dataSourceList.append(ds);
   } else {
     _list.append(o);
+    if (!_shortNameIndex.contains(o->shortName())) {
+      _shortNameIndex.insert(o->shortName(), o);
+    }
   }
   return true;
 }
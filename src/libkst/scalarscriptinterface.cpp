@@ -51,6 +51,10 @@ bool ScalarGenSI::isValid() {
   return scalar.isPtrValid();
 }
 
+QStringList ScalarGenSI::getters() {
+  return ScriptInterface::getters() << "value";
+}
+
 ScriptInterface* ScalarGenSI::newScalar(ObjectStore *store) {
   ScalarPtr scalar;
   scalar = store->createObject<Scalar>();
@@ -102,6 +106,10 @@ bool ScalarDataSI::isValid() {
   return scalar.isPtrValid();
 }
 
+QStringList ScalarDataSI::getters() {
+  return ScriptInterface::getters() << "value" << "file" << "field";
+}
+
 ScriptInterface* ScalarDataSI::newScalar(ObjectStore *store) {
   DataScalarPtr scalar;
   scalar = store->createObject<DataScalar>();
@@ -154,6 +162,10 @@ bool ScalarVectorSI::isValid() {
   return scalar.isPtrValid();
 }
 
+QStringList ScalarVectorSI::getters() {
+  return ScriptInterface::getters() << "value" << "file" << "field" << "frame";
+}
+
 ScriptInterface* ScalarVectorSI::newScalar(ObjectStore *store) {
   VScalarPtr scalar;
   scalar = store->createObject<VScalar>();
@@ -30,6 +30,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newScalar(ObjectStore *store);
 
@@ -45,6 +46,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newScalar(ObjectStore *store);
 
@@ -60,6 +62,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newScalar(ObjectStore *store);
 
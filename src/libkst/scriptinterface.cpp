@@ -38,6 +38,23 @@ namespace Kst {
     return QString();
   }
 
+  /** The commands, taking no arguments, which read the properties of the object: see properties(). */
+  QStringList ScriptInterface::getters() {
+    return QStringList() << "name";
+  }
+
+  /** Runs every getter, and returns their replies as lines of getter, tab, reply.  Backslashes, tabs and
+    * newlines in the replies are escaped as \\, \t and \n. */
+  QString ScriptInterface::properties() {
+    QString ret;
+    foreach(const QString& getter, getters()) {
+      QString v=doCommand(getter+"()");
+      v.replace('\\',"\\\\").replace('\t',"\\t").replace('\n',"\\n");
+      ret+=getter+'\t'+v+'\n';
+    }
+    return ret;
+  }
+
   QString ScriptInterface::doObjectCommand(QString command, ObjectPtr ob) {
 
     QString v=doNamedObjectCommand(command, ob);
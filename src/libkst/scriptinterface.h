@@ -20,6 +20,7 @@
 #include <QByteArray>
 #include <QString>
 #include <QList>
+#include <QStringList>
 #include <QObject>
 
 #include "kst_export.h"
@@ -44,6 +45,9 @@ public:
     static QString doNamedObjectCommand(QString command, NamedObject *n);
     static QString doObjectCommand(QString command, ObjectPtr ob);
 
+    virtual QStringList getters();
+    QString properties();
+
     static QStringList getArgs(const QString &command);
     static QString getArg(const QString &command);
 
@@ -47,6 +47,10 @@ bool StringGenSI::isValid() {
   return str.isPtrValid();
 }
 
+QStringList StringGenSI::getters() {
+  return ScriptInterface::getters() << "value";
+}
+
 ScriptInterface* StringGenSI::newString(ObjectStore *store) {
   StringPtr string;
   string = store->createObject<String>();
@@ -93,6 +97,10 @@ bool StringDataSI::isValid() {
     return str.isPtrValid();
 }
 
+QStringList StringDataSI::getters() {
+    return ScriptInterface::getters() << "value";
+}
+
 ScriptInterface* StringDataSI::newString(ObjectStore *store) {
   DataStringPtr string;
   string = store->createObject<DataString>();
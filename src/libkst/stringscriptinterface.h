@@ -29,6 +29,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newString(ObjectStore *store);
 
@@ -43,6 +44,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newString(ObjectStore *store);
 
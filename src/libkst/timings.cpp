@@ -0,0 +1,71 @@
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+#include "timings.h"
+
+#include <QMap>
+#include <QMutex>
+#include <QPair>
+
+namespace Kst {
+
+namespace {
+
+struct Timing {
+  Timing() : count(0), total(0), longest(0) {}
+  qint64 count;
+  qint64 total;   // nanoseconds
+  qint64 longest;
+};
+
+// data sources may update in other threads
+QMutex _mutex;
+QMap<QPair<QByteArray, QString>, Timing> _timings;
+
+}
+
+bool Timings::_enabled = false;
+
+
+void Timings::setEnabled(bool enabled) {
+  _enabled = enabled;
+}
+
+
+void Timings::add(const char* category, const QString& name, qint64 nsecs) {
+  QMutexLocker locker(&_mutex);
+  Timing& timing = _timings[qMakePair(QByteArray(category), name)];
+  timing.count++;
+  timing.total += nsecs;
+  timing.longest = qMax(timing.longest, nsecs);
+}
+
+
+QByteArray Timings::report() {
+  QMutexLocker locker(&_mutex);
+  QByteArray ret;
+  QMap<QPair<QByteArray, QString>, Timing>::ConstIterator it;
+  for (it = _timings.constBegin(); it != _timings.constEnd(); ++it) {
+    ret += it.key().first + '\t' + it.key().second.toUtf8() + '\t' +
+           QByteArray::number(it.value().count) + '\t' +
+           QByteArray::number(it.value().total*1e-9, 'g', 9) + '\t' +
+           QByteArray::number(it.value().longest*1e-9, 'g', 9) + '\n';
+  }
+  return ret;
+}
+
+
+void Timings::clear() {
+  QMutexLocker locker(&_mutex);
+  _timings.clear();
+}
+
+}
+
+// vim: ts=2 sw=2 et
@@ -0,0 +1,64 @@
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+#ifndef KST_TIMINGS_H
+#define KST_TIMINGS_H
+
+#include "kst_export.h"
+
+#include <QByteArray>
+#include <QElapsedTimer>
+#include <QString>
+
+namespace Kst {
+
+/** Running totals of how long kst spends on each kind of work, for finding out why
+ * a session falls behind.  Unlike MeasureTime, which needs a special build, these
+ * can be switched on at run time (by scripts, with setTimingsEnabled()).
+ *
+ * Each timing belongs to a category ("exec", "update", "datasource", "object",
+ * "plot") and has a name within it (a script command, an object name...).  To time
+ * something:
+ *
+ *   QElapsedTimer t;
+ *   Timings::start(t);
+ *   ...
+ *   Timings::add(t, "object", p->Name());
+ *
+ * which costs next to nothing while timings are switched off. */
+class KSTCORE_EXPORT Timings
+{
+  public:
+    static bool enabled() { return _enabled; }
+    static void setEnabled(bool enabled);
+
+    /** Starts t if timings are enabled. */
+    static void start(QElapsedTimer& t) { if (_enabled) t.start(); else t.invalidate(); }
+
+    /** Adds the time since start(t) to category/name, if t was started. */
+    static void add(const QElapsedTimer& t, const char* category, const QString& name) {
+      if (t.isValid()) {
+        add(category, name, t.nsecsElapsed());
+      }
+    }
+    static void add(const char* category, const QString& name, qint64 nsecs);
+
+    /** One line per timing: category, name, count, total and longest time in seconds, tab separated. */
+    static QByteArray report();
+    static void clear();
+
+  private:
+    static bool _enabled;
+};
+
+}
+
+#endif
+
+// vim: ts=2 sw=2 et
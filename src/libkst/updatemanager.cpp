@@ -16,6 +16,7 @@
 #include "datasource.h"
 #include "objectstore.h"
 #include "measuretime.h"
+#include "timings.h"
 #include <QCoreApplication>
 #include <QTimer>
 #include <QDebug>
@@ -47,6 +48,8 @@ UpdateManager::UpdateManager() {
   _store = 0;
   _delayedUpdateScheduled = false;
   _updateInProgress = false;
+  _forcedUpdateHolds = 0;
+  _forcedUpdatePending = false;
   _time.start();
 }
 
@@ -59,7 +62,21 @@ void UpdateManager::delayedUpdates() {
   doUpdates();
 }
 
+void UpdateManager::releaseForcedUpdates() {
+  if (_forcedUpdateHolds > 0) {
+    _forcedUpdateHolds--;
+  }
+  if (_forcedUpdateHolds == 0 && _forcedUpdatePending) {
+    _forcedUpdatePending = false;
+    doUpdates(true);
+  }
+}
+
 void UpdateManager::doUpdates(bool forceImmediate) {
+  if (forceImmediate && _forcedUpdateHolds > 0) {
+    _forcedUpdatePending = true;
+    return;
+  }
   if (_delayedUpdateScheduled && !forceImmediate) {
     return;
   }
@@ -88,6 +105,9 @@ void UpdateManager::doUpdates(bool forceImmediate) {
   _updateInProgress = true;
   _time.restart();
 
+  QElapsedTimer cycleTime;
+  Timings::start(cycleTime);
+
   _serial++;
 
   int n_updated=0, n_deferred=0, n_unchanged = 0;
@@ -95,9 +115,12 @@ void UpdateManager::doUpdates(bool forceImmediate) {
 
   // update the datasources
   foreach (DataSourcePtr ds, _store->dataSourceList()) {
+    QElapsedTimer t;
+    Timings::start(t);
     ds->writeLock();
     retval = ds->objectUpdate(_serial);
     ds->unlock();
+    Timings::add(t, "datasource", ds->Name());
     if (retval == Object::Updated) n_updated++;
     else if (retval == Object::Deferred) n_deferred++;
     else if (retval == Object::NoChange) n_unchanged++;
@@ -113,9 +136,14 @@ void UpdateManager::doUpdates(bool forceImmediate) {
     n_updated = n_unchanged = n_deferred = 0;
     // update data objects
     foreach (ObjectPtr p, _store->objectList()) {
+      QElapsedTimer t;
+      Timings::start(t);
       p->writeLock();
       retval = p->objectUpdate(_serial);
       p->unlock();
+      if (retval == Object::Updated) {
+        Timings::add(t, "object", p->Name());
+      }
 
       if (retval == Object::Updated) n_updated++;
       else if (retval == Object::Deferred) n_deferred++;
@@ -132,6 +160,8 @@ void UpdateManager::doUpdates(bool forceImmediate) {
     }
   }
 
+  Timings::add(cycleTime, "update", "doUpdates");
+
   emit objectsUpdated(_serial);
 }
 }
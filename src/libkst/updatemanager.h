@@ -35,6 +35,11 @@ class KSTCORE_EXPORT UpdateManager : public QObject
 
     void setStore(ObjectStore *store) {_store = store;}
 
+    // Between these, forced updates are put off, and done once at the end, so that
+    // making many objects at once does not mean an update cycle for each.
+    void holdForcedUpdates() { _forcedUpdateHolds++; }
+    void releaseForcedUpdates();
+
 
   public Q_SLOTS:
     void doUpdates(bool forceImmediate = false);
@@ -56,6 +61,8 @@ class KSTCORE_EXPORT UpdateManager : public QObject
     bool _paused;
     bool _delayedUpdateScheduled;
     bool _updateInProgress;
+    int _forcedUpdateHolds;
+    bool _forcedUpdatePending;
     qint64 _serial;
     ObjectStore *_store;
 };
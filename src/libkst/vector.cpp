@@ -21,6 +21,7 @@
 #include <assert.h>
 #include <math.h>
 #include <stdlib.h>
+#include <string.h>
 
 #include <QDebug>
 #include <QApplication>
@@ -468,6 +469,28 @@ bool Vector::saveToTmpFile(QFile &fp) {
   return (n_write == n_written);
 }
 
+/**  used for scripting IPC.
+     fp is normally in /dev/shm, and open for reading and writing. */
+bool Vector::saveToSharedMemory(QFile &fp) {
+  qint64 n_write = length()*sizeof(double);
+
+  if (!fp.resize(n_write)) {
+    return false;
+  }
+  if (n_write == 0) {
+    return true; // nothing to copy, and an empty file can not be mapped
+  }
+
+  uchar *segment = fp.map(0, n_write);
+  if (!segment) {
+    return false;
+  }
+  memcpy(segment, _v_raw, n_write);
+  fp.unmap(segment);
+
+  return true;
+}
+
 
 void Vector::internalUpdate() {
   int i, i0;
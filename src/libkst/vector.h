@@ -114,6 +114,9 @@ class KSTCORE_EXPORT Vector : public Primitive
     /** Return Least Positive value in Vector */
     inline double minPos() const { return _minPos; }
 
+    /** Return the number of samples which are not finite (NaN or inf) */
+    inline int numNaN() const { return _size - _nsum; }
+
     /** Number of new samples in the vector since last newSync */
     inline int numNew() const { return NumNew; }
 
@@ -130,6 +133,9 @@ class KSTCORE_EXPORT Vector : public Primitive
     /** dump the vector values to a raw binary file */
     bool saveToTmpFile(QFile &fp);
 
+    /** copy the vector values into a memory mapped file, resizing it to fit */
+    bool saveToSharedMemory(QFile &fp);
+
     virtual void setNewAndShift(int inNew, int inShift);
 
     /** Clear out the vector by setting everything to 0.0 */
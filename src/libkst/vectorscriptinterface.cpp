@@ -62,6 +62,21 @@ QString VectorCommonSI::store(QString & command) {
   }
 }
 
+QString VectorCommonSI::storeShared(QString & command) {
+  QString arg = getArg(command);
+  QFile segment(arg);
+
+  if (segment.open(QIODevice::ReadWrite) && _vector->saveToSharedMemory(segment)) {
+    return QString::number(_vector->length());
+  } else {
+    return "Error writing shared memory";
+  }
+}
+
+QStringList VectorCommonSI::getters() {
+  return ScriptInterface::getters() << "length" << "min" << "max" << "mean";
+}
+
 
 /******************************************************/
 /* Plain (base) Vectors                               */
@@ -79,6 +94,7 @@ VectorSI::VectorSI(VectorPtr it) {
   _fnMap.insert("max",&VectorSI::max);
   _fnMap.insert("mean",&VectorSI::mean);
   _fnMap.insert("store",&VectorSI::store);
+  _fnMap.insert("storeShared",&VectorSI::storeShared);
 }
 
 QString VectorSI::doCommand(QString command_in) {
@@ -145,6 +161,7 @@ DataVectorSI::DataVectorSI(DataVectorPtr it) {
   _fnMap.insert("max",&DataVectorSI::max);
   _fnMap.insert("mean",&DataVectorSI::mean);
   _fnMap.insert("store",&DataVectorSI::store);
+  _fnMap.insert("storeShared",&DataVectorSI::storeShared);
 
 }
 
@@ -174,6 +191,10 @@ bool DataVectorSI::isValid() {
   return _datavector.isPtrValid();
 }
 
+QStringList DataVectorSI::getters() {
+  return VectorCommonSI::getters() << "filename" << "field" << "start" << "NFrames" << "skip" << "boxcarFirst";
+}
+
 ScriptInterface* DataVectorSI::newVector(ObjectStore *store) {
   DataVectorPtr vector;
   vector = store->createObject<DataVector>();
@@ -259,6 +280,7 @@ GeneratedVectorSI::GeneratedVectorSI(GeneratedVectorPtr it) {
     _fnMap.insert("max",&GeneratedVectorSI::max);
     _fnMap.insert("mean",&GeneratedVectorSI::mean);
     _fnMap.insert("store",&GeneratedVectorSI::store);
+    _fnMap.insert("storeShared",&GeneratedVectorSI::storeShared);
 }
 
 QString GeneratedVectorSI::doCommand(QString command_in) {
@@ -334,7 +356,9 @@ EditableVectorSI::EditableVectorSI(EditableVectorPtr it) {
 
 
   _fnMap.insert("load",&EditableVectorSI::load);
+  _fnMap.insert("loadShared",&EditableVectorSI::loadShared);
   _fnMap.insert("store",&EditableVectorSI::store);
+  _fnMap.insert("storeShared",&EditableVectorSI::storeShared);
   _fnMap.insert("setValue",&EditableVectorSI::setValue);
   _fnMap.insert("resize",&EditableVectorSI::resize);
   _fnMap.insert("zero",&EditableVectorSI::zero);
@@ -397,6 +421,17 @@ QString EditableVectorSI::load(QString & command) {
   return "Done";
 }
 
+QString EditableVectorSI::loadShared(QString & command) {
+  QString arg = getArg(command);
+  QFile segment(arg);
+
+  if (segment.open(QIODevice::ReadOnly) && _editablevector->loadFromSharedMemory(segment)) {
+    return "Done";
+  } else {
+    return "Error reading shared memory";
+  }
+}
+
 QString EditableVectorSI::setValue(QString & command) {
   QStringList vars = getArgs(command);
 
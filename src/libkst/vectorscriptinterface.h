@@ -34,6 +34,8 @@ class KSTCORE_EXPORT VectorCommonSI : public ScriptInterface
     QString max(QString&);
     QString mean(QString&);
     QString store(QString &command);
+    QString storeShared(QString &command);
+    QStringList getters();
 
   protected:
     VectorPtr _vector;
@@ -74,6 +76,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newVector(ObjectStore *store);
 
@@ -129,6 +132,7 @@ public:
     static ScriptInterface* newVector(ObjectStore *);
 
     QString load(QString &command);
+    QString loadShared(QString &command);
     QString setValue(QString &command);
     QString resize(QString &command);
     QString zero(QString &);
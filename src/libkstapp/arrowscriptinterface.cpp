@@ -73,6 +73,10 @@ bool ArrowSI::isValid() {
   return _dim->item;
 }
 
+QStringList ArrowSI::getters() {
+    return ScriptInterface::getters() << "fixAspectRatioIsChecked";
+}
+
 ScriptInterface* ArrowSI::newArrow() {
   ArrowItem* bi=new ArrowItem(kstApp->mainWindow()->tabWidget()->currentView());
   kstApp->mainWindow()->tabWidget()->currentView()->scene()->addItem(bi);
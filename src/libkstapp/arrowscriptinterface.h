@@ -33,6 +33,7 @@ class ArrowSI : public ScriptInterface
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate() {if (_dim->item) _dim->item->update();return ("Finished editing "+_dim->item->Name()).toLatin1();}
+    QStringList getters();
 
     static ScriptInterface* newArrow();
 
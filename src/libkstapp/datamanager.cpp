@@ -417,95 +417,12 @@ void DataManager::removeFromPlot(QAction* action) {
   }
 }
 
-// search through all the objects to see what is a dependency of anything shown.
-// FIXME: this is very fragile - objects use objects in all sorts of ways,
-// all which have to be listed here.
 void DataManager::setUsedFlags() {
-  _doc->objectStore()->clearUsedFlags();
-
-  // for each relation used in an unhidden plot mark 'used' - O(N)
-  QList<PlotItem*> plotlist = ViewItem::getItems<PlotItem>();
-  foreach (PlotItem *plot, plotlist) {
-    if (plot->isVisible()) {
-      foreach (PlotRenderItem *renderer, plot->renderItems()) {
-        foreach (RelationPtr relation, renderer->relationList()) {
-          relation->setUsed(true);
-        }
-      }
-      if (plot->xAxis()->axisPlotMarkers().isCurveSource()) {
-        plot->xAxis()->axisPlotMarkers().curve()->setUsed(true);
-      }
-      if (plot->yAxis()->axisPlotMarkers().isCurveSource()) {
-        plot->yAxis()->axisPlotMarkers().curve()->setUsed(true);
-      }
-      if (plot->xAxis()->axisPlotMarkers().isVectorSource()) {
-        plot->xAxis()->axisPlotMarkers().vector()->setUsed(true);
-      }
-      if (plot->yAxis()->axisPlotMarkers().isVectorSource()) {
-        plot->yAxis()->axisPlotMarkers().vector()->setUsed(true);
-      }
-    }
-  }
-
-  QList<LabelItem*> labels = ViewItem::getItems<LabelItem>();
-  foreach (LabelItem * label, labels) {
-    if (label->_labelRc) {
-      foreach (Primitive* primitive, label->_labelRc->_refObjects) {
-        primitive->setUsed(true);
-      }
-    }
-  }
-
-  // for each primitive used by a relation mark 'used' - O(N)
-  ObjectList<Relation> relationList = _doc->objectStore()->getObjects<Relation>();
-  foreach (RelationPtr object, relationList) {
-    object->readLock();
-    //set used all input and output primitives
-    foreach (VectorPtr v, object->inputVectors()) {
-      v->setUsed(true);
-    }
-    foreach (VectorPtr v, object->outputVectors()) {
-      v->setUsed(true);
-    }
-    foreach (ScalarPtr s, object->inputScalars()) {
-      s->setUsed(true);
-    }
-    foreach (ScalarPtr s, object->outputScalars()) {
-      s->setUsed(true);
-    }
-    foreach (StringPtr s, object->inputStrings()) {
-      s->setUsed(true);
-    }
-    foreach (StringPtr s, object->outputStrings()) {
-      s->setUsed(true);
-    }
-    foreach (MatrixPtr m, object->inputMatrices()) {
-      m->setUsed(true);
-    }
-    foreach (MatrixPtr m, object->outputMatrices()) {
-      m->setUsed(true);
-    }
-    object->unlock();
-  }
-
-
-  ObjectList<DataObject> dataObjectList = _doc->objectStore()->getObjects<DataObject>();
-  foreach (DataObjectPtr object, dataObjectList) {
-    object->readLock();
-    //set used all input and output primitives
-    foreach (PrimitivePtr p, object->inputPrimitives()) {
-      p->setUsed(true);
-    }
-    object->unlock();
-  }
+  _doc->setUsedFlags();
 }
 
 void DataManager::purge() {
-  do {
-    setUsedFlags();
-  } while (_doc->objectStore()->deleteUnsetUsedFlags());
-  _doc->objectStore()->cleanUpDataSourceList();
-  UpdateServer::self()->requestUpdateSignal();
+  _doc->purge();
   _session->reset();
 }
 
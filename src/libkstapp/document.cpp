@@ -21,6 +21,10 @@
 #include <primitivefactory.h>
 #include <relationfactory.h>
 #include <viewitem.h>
+#include "plotitem.h"
+#include "plotaxis.h"
+#include "labelitem.h"
+#include "relation.h"
 #include <commandlineparser.h>
 #include "objectstore.h"
 #include "updatemanager.h"
@@ -59,6 +63,102 @@ QString Document::fileName() const {
   return _fileName;
 }
 
+// search through all the objects to see what is a dependency of anything shown.
+// FIXME: this is very fragile - objects use objects in all sorts of ways,
+// all which have to be listed here.
+void Document::setUsedFlags() {
+  objectStore()->clearUsedFlags();
+
+  // for each relation used in an unhidden plot mark 'used' - O(N)
+  QList<PlotItem*> plotlist = ViewItem::getItems<PlotItem>();
+  foreach (PlotItem *plot, plotlist) {
+    if (plot->isVisible()) {
+      foreach (PlotRenderItem *renderer, plot->renderItems()) {
+        foreach (RelationPtr relation, renderer->relationList()) {
+          relation->setUsed(true);
+        }
+      }
+      if (plot->xAxis()->axisPlotMarkers().isCurveSource()) {
+        plot->xAxis()->axisPlotMarkers().curve()->setUsed(true);
+      }
+      if (plot->yAxis()->axisPlotMarkers().isCurveSource()) {
+        plot->yAxis()->axisPlotMarkers().curve()->setUsed(true);
+      }
+      if (plot->xAxis()->axisPlotMarkers().isVectorSource()) {
+        plot->xAxis()->axisPlotMarkers().vector()->setUsed(true);
+      }
+      if (plot->yAxis()->axisPlotMarkers().isVectorSource()) {
+        plot->yAxis()->axisPlotMarkers().vector()->setUsed(true);
+      }
+    }
+  }
+
+  QList<LabelItem*> labels = ViewItem::getItems<LabelItem>();
+  foreach (LabelItem * label, labels) {
+    if (label->_labelRc) {
+      foreach (Primitive* primitive, label->_labelRc->_refObjects) {
+        primitive->setUsed(true);
+      }
+    }
+  }
+
+  // for each primitive used by a relation mark 'used' - O(N)
+  ObjectList<Relation> relationList = objectStore()->getObjects<Relation>();
+  foreach (RelationPtr object, relationList) {
+    object->readLock();
+    //set used all input and output primitives
+    foreach (VectorPtr v, object->inputVectors()) {
+      v->setUsed(true);
+    }
+    foreach (VectorPtr v, object->outputVectors()) {
+      v->setUsed(true);
+    }
+    foreach (ScalarPtr s, object->inputScalars()) {
+      s->setUsed(true);
+    }
+    foreach (ScalarPtr s, object->outputScalars()) {
+      s->setUsed(true);
+    }
+    foreach (StringPtr s, object->inputStrings()) {
+      s->setUsed(true);
+    }
+    foreach (StringPtr s, object->outputStrings()) {
+      s->setUsed(true);
+    }
+    foreach (MatrixPtr m, object->inputMatrices()) {
+      m->setUsed(true);
+    }
+    foreach (MatrixPtr m, object->outputMatrices()) {
+      m->setUsed(true);
+    }
+    object->unlock();
+  }
+
+
+  ObjectList<DataObject> dataObjectList = objectStore()->getObjects<DataObject>();
+  foreach (DataObjectPtr object, dataObjectList) {
+    object->readLock();
+    //set used all input and output primitives
+    foreach (PrimitivePtr p, object->inputPrimitives()) {
+      p->setUsed(true);
+    }
+    object->unlock();
+  }
+}
+
+/** Deletes every object which nothing shown depends on (see setUsedFlags()), and any data sources left
+  * unused, and returns how many objects were deleted. */
+int Document::purge() {
+  int count = objectStore()->objectList().size();
+  do {
+    setUsedFlags();
+  } while (objectStore()->deleteUnsetUsedFlags());
+  count -= objectStore()->objectList().size();
+  objectStore()->cleanUpDataSourceList();
+  UpdateServer::self()->requestUpdateSignal();
+  return count;
+}
+
 /** return a list of data objects where all dependencies appear earlier in the list */
 ObjectList<DataObject> Document::sortedDataObjectList() {
   ObjectList<DataObject> sorted;
@@ -42,6 +42,9 @@ class Document : public CoreDocument {
 
     ObjectList<DataObject> sortedDataObjectList();
 
+    void setUsedFlags();
+    int purge();
+
 
     bool isChanged() const;
     void setChanged(bool changed);
@@ -83,6 +83,11 @@ bool LabelSI::isValid() {
     return dim->item;
 }
 
+QStringList LabelSI::getters() {
+    return ScriptInterface::getters() << "fixAspectRatioIsChecked" << "getLayoutHorizontalMargin" << "getLayoutVerticalMargin"
+                                      << "getLayoutHorizontalSpacing" << "getLayoutVerticalSpacing";
+}
+
 ScriptInterface* LabelSI::newLabel() {
     LabelItem* bi=new LabelItem(kstApp->mainWindow()->tabWidget()->currentView(),"");
     kstApp->mainWindow()->tabWidget()->currentView()->scene()->addItem(bi);
@@ -79,6 +79,11 @@ bool LegendSI::isValid() {
     return dim->item;
 }
 
+QStringList LegendSI::getters() {
+    return ScriptInterface::getters() << "fixAspectRatioIsChecked" << "getLayoutHorizontalMargin" << "getLayoutVerticalMargin"
+                                      << "getLayoutHorizontalSpacing" << "getLayoutVerticalSpacing";
+}
+
 ScriptInterface* LegendSI::newLegend(QString plotname) {
     PlotItem *plot = ViewItem::retrieveItem<PlotItem>(plotname);
     LegendItem* li = plot->legend();
@@ -17,6 +17,7 @@
 #include "application.h"
 #include "objectstore.h"
 #include "updatemanager.h"
+#include "timings.h"
 #include "sharedaxisboxitem.h"
 #include "image.h"
 #include "debug.h"
@@ -268,6 +269,9 @@ void PlotRenderItem::paint(QPainter *painter) {
   time.start();
 #endif
 
+  QElapsedTimer renderTime;
+  Timings::start(renderTime);
+
   painter->save();
 
   if (plotItem()->xAxis()->axisReversed()) {
@@ -301,6 +305,8 @@ void PlotRenderItem::paint(QPainter *painter) {
   int elapsed = time.elapsed();
   qDebug()<<"curve drawing took" << elapsed << "to render.";
 #endif
+
+  Timings::add(renderTime, "plot", plotItem()->Name());
 }
 
 
@@ -99,6 +99,11 @@ bool PlotSI::isValid() {
     return _dim->item;
 }
 
+QStringList PlotSI::getters() {
+    return ScriptInterface::getters() << "fixAspectRatioIsChecked" << "getLayoutHorizontalMargin" << "getLayoutVerticalMargin"
+                                      << "getLayoutHorizontalSpacing" << "getLayoutVerticalSpacing";
+}
+
 /***************************/
 /* commands                */
 /***************************/
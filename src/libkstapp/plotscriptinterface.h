@@ -37,6 +37,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate() {if (_item) _item->update();return ("Finished editing "+_item->Name()).toLatin1();}
+    QStringList getters();
 
     static ScriptInterface* newPlot();
 
@@ -58,21 +58,39 @@
 #include "basicplugin.h"
 #include "dialog.h"
 #include "editablematrix.h"
+#include "datavector.h"
+#include "generatedvector.h"
+#include "datamatrix.h"
+#include "generatedmatrix.h"
+#include "datascalar.h"
+#include "vscalar.h"
+#include "datastring.h"
 
 #include "datasourcepluginmanager.h"
+#include "timings.h"
+#include "math_kst.h"
 
 #include <updatemanager.h>
 
 #include <QLocalSocket>
 #include <iostream>
 #include <QFile>
+#include <QPointer>
 #include <QStringBuilder>
+#include <QTimer>
+#include <QtEndian>
+
+#ifndef Q_OS_WIN
+#include <unistd.h>
+#endif
 
 namespace Kst {
 
-ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)), _store(obj),_interface(0) {
+ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)), _store(obj),_interface(0),
+    _changeSerial(0), _execDepth(0) {
 
     QString initial="kstScript";
+    int readyFd=-1;
 
 
     // The command line hasn't been parsed yet, so
@@ -82,6 +100,8 @@ ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)),
         if(args.at(i).startsWith("--serverName=")) {
             initial=args.at(i);
             initial.remove("--serverName=");
+        } else if(args.at(i).startsWith("--readyFd=")) {
+            readyFd=args.at(i).mid(10).toInt();
         }
     }
 
@@ -98,7 +118,20 @@ ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)),
         socket.disconnectFromServer();
         connectTo=initial+QString::number(connectTo.remove(initial).toInt()+1);
     }
+
+#ifndef Q_OS_WIN
+    // --readyFd=n: whoever started us is waiting on file descriptor n to hear that we are
+    // listening, and under which name (which has a number appended if the one asked for was taken).
+    if(readyFd>=0) {
+        QByteArray name=_server->serverName().toLocal8Bit()+'\n';
+        if(::write(readyFd,name.constData(),name.size())!=name.size()) {
+            qWarning() << "Could not announce the script server on file descriptor" << readyFd;
+        }
+        ::close(readyFd);
+    }
+#endif
     connect(_server,SIGNAL(newConnection()),this,SLOT(procConnection()));
+    connect(UpdateManager::self(),SIGNAL(objectsUpdated(qint64)),this,SLOT(objectsUpdated()));
 
     _fnMap.insert("getVectorList()",&ScriptServer::getVectorList);
     _fnMap.insert("newDataVector()",&ScriptServer::newDataVector);
@@ -185,10 +218,16 @@ ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)),
     _fnMap.insert("newSvgItem()",&ScriptServer::newSvgItem);
 #endif
 
+    _fnMap.insert("getObjects()",&ScriptServer::getObjects);
+    _fnMap.insert("findObjects()",&ScriptServer::findObjects);
+
     _fnMap.insert("beginEdit()",&ScriptServer::beginEdit);
     _fnMap.insert("endEdit()",&ScriptServer::endEdit);
+    _fnMap.insert("properties()",&ScriptServer::properties);
 
     _fnMap.insert("eliminate()",&ScriptServer::eliminate);
+    _fnMap.insert("eliminateObjects()",&ScriptServer::eliminateObjects);
+    _fnMap.insert("purge()",&ScriptServer::purge);
 
     _fnMap.insert("done()",&ScriptServer::done);
     _fnMap.insert("clear()",&ScriptServer::clear);
@@ -197,6 +236,9 @@ ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)),
     _fnMap.insert("newTab()",&ScriptServer::newTab);
     _fnMap.insert("setTab()",&ScriptServer::setTab);
     _fnMap.insert("renameTab()",&ScriptServer::renameTab);
+    _fnMap.insert("currentTab()",&ScriptServer::currentTab);
+    _fnMap.insert("tabText()",&ScriptServer::tabText);
+    _fnMap.insert("closeTab()",&ScriptServer::closeTab);
     _fnMap.insert("screenBack()",&ScriptServer::screenBack);
     _fnMap.insert("screenForward()",&ScriptServer::screenForward);
     _fnMap.insert("countFromEnd()",&ScriptServer::countFromEnd);
@@ -216,13 +258,44 @@ ScriptServer::ScriptServer(ObjectStore *obj) : _server(new QLocalServer(this)),
 
     _fnMap.insert("testCommand()", &ScriptServer::testCommand);
 
-#if 0
+    _fnMap.insert("protocol()", &ScriptServer::protocol);
+    _fnMap.insert("batch()", &ScriptServer::batch);
+    _fnMap.insert("transaction()", &ScriptServer::transaction);
+
+    _fnMap.insert("changeSerial()", &ScriptServer::changeSerial);
 
+    _fnMap.insert("setTimingsEnabled()", &ScriptServer::setTimingsEnabled);
+    _fnMap.insert("getTimings()", &ScriptServer::getTimings);
+    _fnMap.insert("resetTimings()", &ScriptServer::resetTimings);
+
+    _slowFns.insert("exportGraphics()");
+    _slowFns.insert("fileSave()");
+
+    _fnMap.insert("Vector::getBinaryArray()",&ScriptServer::vectorGetBinaryArray);
+    _fnMap.insert("Matrix::getBinaryArray()",&ScriptServer::matrixGetBinaryArray);
+    _fnMap.insert("Vector::getBinarySlice()",&ScriptServer::vectorGetBinarySlice);
+    _fnMap.insert("Vector::getBinaryValues()",&ScriptServer::vectorGetBinaryValues);
     _fnMap.insert("EditableVector::setBinaryArray()",&ScriptServer::editableVectorSetBinaryArray);
     _fnMap.insert("EditableMatrix::setBinaryArray()",&ScriptServer::editableMatrixSetBinaryArray);
+
+    _fnMap.insert("Vector::stats()",&ScriptServer::vectorStats);
+    _fnMap.insert("Matrix::stats()",&ScriptServer::matrixStats);
+
+    // Commands which just read.  Everything else counts as a change: see isChange().  batch() and
+    // transaction() count the commands in them instead.
+    foreach(const QByteArray& fn, _fnMap.keys()) {
+        if(fn.mid(fn.lastIndexOf(':')+1).startsWith("get")) {
+            _readFns.insert(fn);
+        }
+    }
+    _readFns << "beginEdit()" << "endEdit()" << "properties()" << "findObjects()" << "tabCount()"
+             << "currentTab()" << "tabText()"
+             << "testCommand()" << "protocol()" << "batch()" << "transaction()" << "changeSerial()"
+             << "Vector::stats()" << "Matrix::stats()";
+
+#if 0
+
     _fnMap.insert("EditableVector::set()",&ScriptServer::editableVectorSet);
-    _fnMap.insert("Vector::getBinaryArray()",&ScriptServer::vectorGetBinaryArray);
-    _fnMap.insert("Matrix::getBinaryArray()",&ScriptServer::matrixGetBinaryArray);
     _fnMap.insert("String::value()",&ScriptServer::stringValue);
     _fnMap.insert("String::setValue()",&ScriptServer::stringSetValue);
     _fnMap.insert("Scalar::value()",&ScriptServer::scalarValue);
@@ -237,14 +310,32 @@ ScriptServer::~ScriptServer()
     delete _interface;
 }
 
+/** Writes a reply, prefixed by its length if the connection has negotiated framing, and by the
+  * id of the request being answered with protocol 3. */
+static void writeResponse(const QByteArray& response, QLocalSocket* s)
+{
+    int version=s->property("kstScriptProtocol").toInt();
+    if(version>=3) {
+        uchar header[8];
+        qToBigEndian<quint32>(response.size(),header);
+        qToBigEndian<quint32>(s->property("kstScriptRequest").toUInt(),header+4);
+        s->write((const char*)header,8);
+    } else if(version>=2) {
+        uchar header[4];
+        qToBigEndian<quint32>(response.size(),header);
+        s->write((const char*)header,4);
+    }
+    s->write(response);
+}
+
 /** Conv. function which takes a response, and executes if 'if' statement is unexistant or true. */
 QByteArray handleResponse(const QByteArray& response, QLocalSocket* s)
 {
     if(s) {
         if(response.isEmpty()) {
-            s->write(" ");
+            writeResponse(" ",s);
         } else {
-            s->write(response);
+            writeResponse(response,s);
         }
         s->waitForBytesWritten();
     }
@@ -298,6 +389,74 @@ void ScriptServer::procConnection() {
     while(_server->hasPendingConnections()) {
         QLocalSocket* s=_server->nextPendingConnection();
         connect(s,SIGNAL(readyRead()),this,SLOT(readSomething()));
+        connect(s,SIGNAL(disconnected()),this,SLOT(dropConnection()));
+    }
+}
+
+/** Forgets any half received frame and open interface of a socket whose client has gone away. */
+void ScriptServer::dropConnection() {
+    QLocalSocket* s=qobject_cast<QLocalSocket*>(sender());
+    _frameBuffers.remove(s);
+    _editNames.remove(_interfaces.take(s));
+}
+
+/** Processes a socket speaking protocol 2 or 3: executes every complete frame, and keeps the rest for later. */
+void ScriptServer::readFrames(QLocalSocket* s)
+{
+    QPointer<QLocalSocket> guard(s);
+    QByteArray buffer=_frameBuffers.take(s)+s->readAll();
+    int headerSize=(s->property("kstScriptProtocol").toInt()>=3)?8:4;
+    int pos=0;
+    while(buffer.size()-pos>=headerSize) {
+        quint32 n=qFromBigEndian<quint32>((const uchar*)buffer.constData()+pos);
+        if(quint32(buffer.size()-pos-headerSize)<n) {
+            break;  // the rest of the frame is still on its way
+        }
+        QByteArray command=buffer.mid(pos+headerSize,n);
+        if(headerSize==8) {
+            execRequest(command,s,qFromBigEndian<quint32>((const uchar*)buffer.constData()+pos+4));
+        } else {
+            exec(command,s);
+        }
+        pos+=headerSize+n;
+        if(!guard) {
+            return; // done() closed the connection
+        }
+    }
+    if(pos<buffer.size()) {
+        _frameBuffers.insert(s,buffer.mid(pos));
+    }
+}
+
+/** Runs a protocol 3 request, or puts it off if it is slow, so that the cheap commands which have
+  * already arrived are answered first. */
+void ScriptServer::execRequest(QByteArray& command,QLocalSocket* s,quint32 request)
+{
+    if(_slowFns.contains(command.left(command.indexOf('('))+"()")) {
+        DeferredCommand deferred;
+        deferred.socket=s;
+        deferred.command=command;
+        deferred.request=request;
+        _deferred.append(deferred);
+        QTimer::singleShot(0,this,SLOT(runDeferred()));
+        return;
+    }
+    s->setProperty("kstScriptRequest",request);
+    exec(command,s);
+}
+
+/** Runs the oldest slow command put off by execRequest().  One runs per pass of the event loop, so
+  * that commands arriving meanwhile don't wait for all of them.  Each still runs in the GUI thread, so
+  * the window and every connection wait while it does. */
+void ScriptServer::runDeferred()
+{
+    if(_deferred.isEmpty()) {
+        return;
+    }
+    DeferredCommand deferred=_deferred.takeFirst();
+    if(deferred.socket) {
+        deferred.socket->setProperty("kstScriptRequest",deferred.request);
+        exec(deferred.command,deferred.socket);
     }
 }
 
@@ -306,6 +465,10 @@ void ScriptServer::readSomething()
 {
     QLocalSocket* s=qobject_cast<QLocalSocket*>(sender());
     Q_ASSERT(s);
+    if(s->property("kstScriptProtocol").toInt()>=2) {
+        readFrames(s);
+        return;
+    }
     QByteArray command=s->read(1000000);
     if(command.startsWith("attachTo(")) {
         QString search=command.remove(0,9).remove(command.lastIndexOf(")"),9999);
@@ -342,8 +505,91 @@ inline QByteArray join(const QByteArrayList&n,const char&r) {
     return ret;
 }
 
-/** The heart of the script server. This function is what performs all the actions. s may be null. */
+/** Whether a command might change something.  Only the commands known to just read count as not:
+  * those in _readFns, and the getters of the open interface (called without arguments).  Anything
+  * else, including commands added later, counts as a change.  See changeSerial(). */
+bool ScriptServer::isChange(const QByteArray& command) const {
+    int open=command.indexOf('(');
+    QByteArray verb=command.left(open<0?command.size():open);
+    if(_fnMap.contains(verb+"()")) {
+        return !_readFns.contains(verb+"()");
+    }
+    return !_interface || !command.endsWith("()") || verb.size()+2!=command.size()
+            || !_interface->getters().contains(QString::fromLatin1(verb));
+}
+
+/** Notes that the object being edited, if any, is changed by the command about to run: see
+  * objectSerial(). */
+void ScriptServer::noteChange() {
+    if(_interface) {
+        QString name=_editNames.value(_interface);
+        if(!name.isEmpty()) {
+            _editSerials.insert(name,_changeSerial);
+        }
+    }
+}
+
+/** Runs a command for the connection s, with that connection's open interface.
+  *
+  * Every connection has its own interface, so that clients editing different objects at the same
+  * time don't trip over each other.  While a command runs, _interface is the interface of its
+  * connection.  The previous value is put back afterwards, in case this command arrived while
+  * another connection's was still running (e.g., inside the event loop of a dialog).
+  *
+  * s may be null, in which case the command runs with the current interface (this is how batch()
+  * runs its commands). */
 QByteArray ScriptServer::exec(QByteArray command, QLocalSocket *s)
+{
+    QElapsedTimer t;
+    Timings::start(t);
+    QString verb;
+    if(Timings::enabled()) {
+        verb=QString::fromLatin1(command.left(command.indexOf('(')));
+    }
+    if(!s) {
+        if(isChange(command)) {
+            _changeSerial++;
+            noteChange();
+        }
+        _execDepth++;
+        QByteArray response=dispatch(command,s);
+        _execDepth--;
+        Timings::add(t,"exec",verb);
+        return response;
+    }
+
+    QPointer<QLocalSocket> guard(s);
+    ScriptInterface* outer=_interface;
+    _interface=_interfaces.value(s);
+    if(isChange(command)) {
+        _changeSerial++;
+        noteChange();
+    }
+    _execDepth++;
+    QByteArray response=dispatch(command,s);
+    _execDepth--;
+    if(guard) {
+        if(_interface) {
+            _interfaces.insert(s,_interface);
+        } else {
+            _interfaces.remove(s);
+        }
+    }
+    _interface=outer;
+    Timings::add(t,"exec",verb);
+    return response;
+}
+
+/** Update cycles which are not caused by a script command (new data, edits in the GUI...) count as changes.
+  * Those caused by scripts are counted by exec(). */
+void ScriptServer::objectsUpdated() {
+    if(!_execDepth) {
+        _changeSerial++;
+    }
+}
+
+/** The heart of the script server. This function is what performs all the actions. s may be null. */
+QByteArray ScriptServer::dispatch(QByteArray& command, QLocalSocket *s)
 {
   if(command.isEmpty()) {
         return handleResponse("",s);
@@ -802,6 +1048,193 @@ QByteArray ScriptServer::newSvgItem(QByteArray&command, QLocalSocket* s,ObjectSt
 }
 #endif
 
+/** The name pykst gives the class of o, or its typeString() if pykst has no class for it. */
+static QString objectType(const ObjectPtr& o) {
+    if(kst_cast<DataVector>(o)) return "DataVector";
+    if(kst_cast<GeneratedVector>(o)) return "GeneratedVector";
+    if(kst_cast<EditableVector>(o)) return "EditableVector";
+    if(kst_cast<Vector>(o)) return "Vector";
+    if(kst_cast<DataMatrix>(o)) return "DataMatrix";
+    if(kst_cast<EditableMatrix>(o)) return "EditableMatrix";
+    if(kst_cast<GeneratedMatrix>(o)) return "GeneratedMatrix";
+    if(kst_cast<Matrix>(o)) return "Matrix";
+    if(kst_cast<DataScalar>(o)) return "DataSourceScalar";
+    if(kst_cast<VScalar>(o)) return "VectorScalar";
+    if(ScalarPtr x=kst_cast<Scalar>(o)) return x->editable()?"GeneratedScalar":"Scalar";
+    if(kst_cast<DataString>(o)) return "DataSourceString";
+    if(StringPtr x=kst_cast<String>(o)) return x->editable()?"GeneratedString":"String";
+    if(kst_cast<Curve>(o)) return "Curve";
+    if(kst_cast<Image>(o)) return "Image";
+    if(kst_cast<Equation>(o)) return "Equation";
+    if(kst_cast<Histogram>(o)) return "Histogram";
+    if(kst_cast<PSD>(o)) return "Spectrum";
+    if(kst_cast<CSD>(o)) return "Spectrogram";
+    if(kst_cast<BasicPlugin>(o)) return "Plugin";
+    return o->typeString();
+}
+
+/** The name pykst gives the class of a view item. */
+static QString viewItemType(ViewItem* v) {
+    if(qobject_cast<PlotItem*>(v)) return "Plot";
+    if(qobject_cast<LegendItem*>(v)) return "Legend";
+    if(qobject_cast<LabelItem*>(v)) return "Label";
+    if(qobject_cast<ArrowItem*>(v)) return "Arrow";
+    if(qobject_cast<LineItem*>(v)) return "Line";
+    if(qobject_cast<BoxItem*>(v)) return "Box";
+    if(qobject_cast<CircleItem*>(v)) return "Circle";
+    if(qobject_cast<EllipseItem*>(v)) return "Ellipse";
+    if(qobject_cast<PictureItem*>(v)) return "Picture";
+#ifndef KST_NO_SVG
+    if(qobject_cast<SvgItem*>(v)) return "SVG";
+#endif
+    if(qobject_cast<ButtonItem*>(v)) return "Button";
+    if(qobject_cast<LineEditItem*>(v)) return "LineEdit";
+    return "ViewItem";
+}
+
+/** Whether an object of type (as objectType() or viewItemType() name it) is of kind, which is a type, or
+  * one of the families vector, matrix, scalar, string, relation, dataobject and viewitem, in any case.
+  * An empty kind matches everything. */
+static bool isKind(const QString& type, bool isViewItem, const QString& kind) {
+    if(kind.isEmpty()||type.compare(kind,Qt::CaseInsensitive)==0) {
+        return true;
+    }
+    QString family=kind.toLower();
+    if(family=="viewitem") {
+        return isViewItem;
+    }
+    if(isViewItem) {
+        return false;
+    }
+    if(family=="relation") {
+        return type=="Curve"||type=="Image";
+    }
+    if(family=="dataobject") {
+        return type=="Equation"||type=="Histogram"||type=="Spectrum"||type=="Spectrogram"||type=="Plugin";
+    }
+    if(family=="vector"||family=="matrix"||family=="scalar"||family=="string") {
+        return type.endsWith(family,Qt::CaseInsensitive);
+    }
+    return false;
+}
+
+/** Joins fields with tabs into a line, escaping backslashes, tabs and newlines as properties() does. */
+static QByteArray objectLine(QStringList fields) {
+    for(int i=0;i<fields.size();i++) {
+        fields[i].replace('\\',"\\\\").replace('\t',"\\t").replace('\n',"\\n");
+    }
+    return fields.join("\t").toLatin1()+'\n';
+}
+
+/** The line getObjects() replies with for o. */
+static QByteArray objectRecord(const ObjectPtr& o) {
+    o->readLock();
+    QString provider;
+    QString detail;
+    if(PrimitivePtr p=kst_cast<Primitive>(o)) {
+        if(p->provider()) {
+            provider=p->provider()->Name();
+        }
+    }
+    if(VectorPtr v=kst_cast<Vector>(o)) {
+        detail=QString::number(v->length());
+    } else if(MatrixPtr m=kst_cast<Matrix>(o)) {
+        detail=QString::number(m->sampleCount());
+    } else if(ScalarPtr x=kst_cast<Scalar>(o)) {
+        detail=QString::number(x->value());
+    } else if(StringPtr x=kst_cast<String>(o)) {
+        detail=x->value();
+    } else if(BasicPluginPtr p=kst_cast<BasicPlugin>(o)) {
+        detail=p->pluginName();
+    }
+    QByteArray a=objectLine(QStringList() << objectType(o) << o->Name() << o->descriptiveName() << provider << detail);
+    o->unlock();
+    return a;
+}
+
+/** The line getObjects() replies with for v. */
+static QByteArray viewItemRecord(ViewItem* v) {
+    return objectLine(QStringList() << viewItemType(v) << v->Name() << v->descriptiveName() << QString() << QString());
+}
+
+/** getObjects(): every data object, primitive and view item in the session, one per line: its type (as
+  * pykst names its classes), its name (which scripts use as its handle), its descriptive name, the name of
+  * the data object which makes it (for the outputs of data objects) and one key parameter: the length of
+  * a vector or matrix, the value of a scalar or string, or the kind of a plugin.  This lets a script
+  * attach to a session with one command rather than one for every object.  getObjects(name) replies with
+  * the line for just that object (looked for as beginEdit() would), or "No such object". */
+QByteArray ScriptServer::getObjects(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    QString name=ScriptInterface::getArg(command);
+    if(!name.isEmpty()) {
+        // the object store finds short names in its index; view items can only be searched for
+        ObjectPtr o=_store->retrieveObject(name);
+        if(o&&!kst_cast<DataSource>(o)) {
+            return handleResponse(objectRecord(o),s);
+        }
+        ViewItem* v=ViewItem::retrieveItem<ViewItem>(name);
+        if(v) {
+            return handleResponse(viewItemRecord(v),s);
+        }
+        return handleResponse("No such object",s);
+    }
+
+    QByteArray a;
+    ObjectList<Object> objects=_store->getObjects<Object>();
+    foreach(const ObjectPtr& o, objects) {
+        if(!kst_cast<DataSource>(o)) {
+            a+=objectRecord(o);
+        }
+    }
+    foreach(ViewItem* v, ViewItem::getItems<ViewItem>()) {
+        a+=viewItemRecord(v);
+    }
+    return handleResponse(a,s);
+}
+
+/** findObjects(kind,pattern): the lines getObjects() would reply with for the objects of kind (see isKind())
+  * whose names match pattern, a wildcard pattern such as "*TEMP*" in which case does not matter.  Only the
+  * matches are sent, so finding a few channels among many thousands is cheap.
+  *
+  * A pattern without wildcards which names an object by its full name, short name and all, is looked up
+  * in the object store's index of short names.  Other patterns are matched against every object. */
+QByteArray ScriptServer::findObjects(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    QStringList args=ScriptInterface::getArgs(command);
+    if(args.size()<2) {
+        return handleResponse("Too few arguments",s);
+    }
+    QString kind=args[0];
+    QString text=QStringList(args.mid(1)).join(",");
+    QRegExp pattern(text,Qt::CaseInsensitive,QRegExp::Wildcard);
+
+    if(!text.contains(QRegExp("[*?\\[]"))) {
+        // only the object with that short name can match, as no view item shares it
+        ObjectPtr o=_store->retrieveObject(text);
+        if(o&&pattern.exactMatch(o->Name())) {
+            if(kst_cast<DataSource>(o)||!isKind(objectType(o),false,kind)) {
+                return handleResponse("",s);
+            }
+            return handleResponse(objectRecord(o),s);
+        }
+    }
+
+    QByteArray a;
+    ObjectList<Object> objects=_store->getObjects<Object>();
+    foreach(const ObjectPtr& o, objects) {
+        if(kst_cast<DataSource>(o)||!isKind(objectType(o),false,kind)||!pattern.exactMatch(o->Name())) {
+            continue;
+        }
+        a+=objectRecord(o);
+    }
+    foreach(ViewItem* v, ViewItem::getItems<ViewItem>()) {
+        if(isKind(viewItemType(v),true,kind)&&pattern.exactMatch(v->Name())) {
+            a+=viewItemRecord(v);
+        }
+    }
+    return handleResponse(a,s);
+}
+
 
 QByteArray ScriptServer::beginEdit(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
 
@@ -821,6 +1254,7 @@ QByteArray ScriptServer::beginEdit(QByteArray&command, QLocalSocket* s,ObjectSto
       if (o) {
         _interface = o->scriptInterface();
         if (_interface) {
+          _editNames.insert(_interface,o->shortName());
           return handleResponse("Ok",s);
         } else {
           return handleResponse("Not supported",s);
@@ -863,6 +1297,43 @@ QByteArray ScriptServer::eliminate(QByteArray&command, QLocalSocket* s,ObjectSto
     }
 }
 
+/** eliminateObjects(name|name|...): eliminate() for many objects at once, with a single update afterwards.
+  * Replies with the number of objects found and deleted. */
+QByteArray ScriptServer::eliminateObjects(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    if(_interface) {
+        return handleResponse("To access this function, first call endEdit()",s);
+    }
+    int count=0;
+    foreach(const QString& name, ScriptInterface::getArg(command).split('|',QString::SkipEmptyParts)) {
+        ObjectPtr o=_store->retrieveObject(name);
+        if(o) {
+            if (RelationPtr relation = kst_cast<Relation>(o)) {
+                Data::self()->removeCurveFromPlots(relation);
+            }
+            _store->removeObject(o);
+            count++;
+        } else if(ViewItem* v=ViewItem::retrieveItem<ViewItem>(name)) {
+            v->hide();
+            count++;
+        }
+    }
+    if(count) {
+        UpdateServer::self()->requestUpdateSignal();
+    }
+    return handleResponse(QByteArray::number(count),s);
+}
+
+/** purge(): deletes every vector, scalar, data object... which no plot shows and nothing shown depends on,
+  * as the data manager's Purge button does, and replies with the number of objects deleted. */
+QByteArray ScriptServer::purge(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    if(_interface) {
+        return handleResponse("To access this function, first call endEdit()",s);
+    }
+    return handleResponse(QByteArray::number(kstApp->mainWindow()->document()->purge()),s);
+}
+
 QByteArray ScriptServer::endEdit(QByteArray&, QLocalSocket* s,ObjectStore*) {
 
     if(!_interface) {
@@ -870,23 +1341,41 @@ QByteArray ScriptServer::endEdit(QByteArray&, QLocalSocket* s,ObjectStore*) {
     }
 
     if(!_interface->isValid()) {
+        _editNames.remove(_interface);
         _interface=0;
         return handleResponse("The interface isn't valid.",s);
     }
 
     QByteArray x=_interface->endEditUpdate();
+    _editNames.remove(_interface);
     _interface=0;
     return handleResponse(x,s);
 }
 
+/** properties(): every property of the object being edited, in one go: see ScriptInterface::properties(). */
+QByteArray ScriptServer::properties(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    if(!_interface) {
+        return handleResponse("No interface open.",s);
+    }
+
+    if(!_interface->isValid()) {
+        return handleResponse("The interface isn't valid.",s);
+    }
+
+    return handleResponse(_interface->properties().toLatin1(),s);
+}
+
 QByteArray ScriptServer::done(QByteArray&, QLocalSocket* s,ObjectStore*) {
 
     if(!s) {
         return "Invalid... no socket...";
     }
-    s->write("Bye.");
+    writeResponse("Bye.",s);
     s->flush();
     s->close();
+    _frameBuffers.remove(s);
+    _interfaces.remove(s);
     delete s;
     return "Bye.";
 }
@@ -925,6 +1414,24 @@ QByteArray ScriptServer::renameTab(QByteArray&command, QLocalSocket* s,ObjectSto
     return handleResponse("Done",s);
 }
 
+QByteArray ScriptServer::currentTab(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    return handleResponse(QByteArray::number(kstApp->mainWindow()->tabWidget()->currentIndex()),s);
+}
+
+QByteArray ScriptServer::tabText(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    TabWidget* tabs = kstApp->mainWindow()->tabWidget();
+    return handleResponse(tabs->tabText(tabs->currentIndex()).toLatin1(),s);
+}
+
+QByteArray ScriptServer::closeTab(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    // as the tab's "Close tab" menu entry does: an empty tab replaces the last one
+    kstApp->mainWindow()->tabWidget()->closeCurrentView();
+    return handleResponse("Done",s);
+}
+
 QByteArray ScriptServer::screenBack(QByteArray&, QLocalSocket* s,ObjectStore*) {
 
     kstApp->mainWindow()->_backAct->trigger();
@@ -1007,6 +1514,388 @@ QByteArray ScriptServer::testCommand(QByteArray&command, QLocalSocket* s,ObjectS
 }
 
 
+/** Switches the connection to another version of the wire protocol (see KST_SCRIPT_PROTOCOL).
+  * The reply, which is the version actually chosen, still uses the old one. */
+QByteArray ScriptServer::protocol(QByteArray&command, QLocalSocket* s,ObjectStore*) {
+
+    int version=qBound(1,ScriptInterface::getArg(command).toInt(),KST_SCRIPT_PROTOCOL);
+    QByteArray response=handleResponse(QByteArray::number(version),s);
+    if(s) {
+        s->setProperty("kstScriptProtocol",version);
+    }
+    return response;
+}
+
+
+/** changeSerial(): a number which goes up whenever a script changes something, and after every update
+  * cycle which was not caused by a script, so that clients can cache what they read until it does.
+  *
+  * changeSerial(name|name|...): a line for each object, which changes whenever that object might have:
+  * see objectSerial().  Clients caching what they read of many objects can check them all at once, and
+  * read again only those which changed. */
+QByteArray ScriptServer::changeSerial(QByteArray&command, QLocalSocket* s,ObjectStore*) {
+
+    QString names=ScriptInterface::getArg(command);
+    if(names.isEmpty()) {
+        return handleResponse(QByteArray::number(_changeSerial),s);
+    }
+    QByteArray reply;
+    foreach(const QString& name, names.split('|')) {
+        reply+=objectSerial(name)+'\n';
+    }
+    return handleResponse(reply,s);
+}
+
+/** The serial of the object name for changeSerial(name): the update serial of its last change (new
+  * data, edits in the GUI, changes to its inputs) and the change serial of the last script command sent
+  * to its interface.  View items keep no serials, so they get the change serial of the whole session. */
+QByteArray ScriptServer::objectSerial(const QString& name) {
+
+    ObjectPtr o=_store->retrieveObject(name);
+    if(o) {
+        return QByteArray::number(o->serialOfLastChange())+'.'+
+               QByteArray::number(_editSerials.value(o->shortName()));
+    }
+    if(ViewItem::retrieveItem<ViewItem>(name)) {
+        return QByteArray::number(_changeSerial);
+    }
+    return "No such object";
+}
+
+/** setTimingsEnabled(true|false): starts or stops collecting Timings. */
+QByteArray ScriptServer::setTimingsEnabled(QByteArray&command, QLocalSocket* s,ObjectStore*) {
+
+    Timings::setEnabled(ScriptInterface::getArg(command).toLower()=="true");
+    return handleResponse("Done",s);
+}
+
+/** getTimings(): see Timings::report(). */
+QByteArray ScriptServer::getTimings(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    return handleResponse(Timings::report(),s);
+}
+
+QByteArray ScriptServer::resetTimings(QByteArray&, QLocalSocket* s,ObjectStore*) {
+
+    Timings::clear();
+    return handleResponse("Done",s);
+}
+
+
+/** Appends a to ret, prefixed by its length as a 4 byte big endian integer. */
+static void appendFrame(QByteArray& ret, const QByteArray& a) {
+    uchar header[4];
+    qToBigEndian<quint32>(a.size(),header);
+    ret.append((const char*)header,4);
+    ret.append(a);
+}
+
+/** EditableVector::setBinaryArray(n,...), EditableMatrix::setBinaryArray(n,...) and
+  * Vector::getBinaryValues(n,...) carry n bytes of raw data after their closing bracket.  Returns n,
+  * or 0 for every other command. */
+static int binaryPayloadSize(const QByteArray& command) {
+    if(!command.startsWith("EditableVector::setBinaryArray(")&&!command.startsWith("EditableMatrix::setBinaryArray(")&&
+       !command.startsWith("Vector::getBinaryValues(")) {
+        return 0;
+    }
+    int i0=command.indexOf('(')+1;
+    int i1=command.indexOf(',',i0);
+    int n=command.mid(i0,i1-i0).toInt();
+    return (n>0&&n<command.size())?n:0;
+}
+
+/** Replaces each ${n} in command with handles[n]. */
+static QByteArray resolveBatchTokens(const QByteArray& command, const QByteArrayList& handles) {
+    int payload=binaryPayloadSize(command);
+    if(payload) {
+        // never look for tokens in raw data
+        return resolveBatchTokens(command.left(command.size()-payload),handles)+command.right(payload);
+    }
+
+    QByteArray ret;
+    int pos=0;
+    int i;
+    while((i=command.indexOf("${",pos))!=-1) {
+        int j=command.indexOf('}',i);
+        bool ok=false;
+        int n=(j==-1)?-1:command.mid(i+2,j-i-2).toInt(&ok);
+        ret+=command.mid(pos,i-pos);
+        if(ok&&n>=0&&n<handles.size()) {
+            ret+=handles[n];
+            pos=j+1;
+        } else {
+            ret+="${";
+            pos=i+2;
+        }
+    }
+    ret+=command.mid(pos);
+    return ret;
+}
+
+/** batch() is followed by any number of commands, each prefixed by its length as a 4 byte big
+  * endian integer.  They are executed in order, and the reply holds each of their replies,
+  * prefixed the same way.
+  *
+  * ${n} within a command stands for the reply to the nth (starting at 0) command of the batch,
+  * without any "Finished editing " in front of it.  This lets a batch refer to the objects it
+  * creates. */
+QByteArray ScriptServer::batch(QByteArray&command, QLocalSocket* s,ObjectStore*) {
+
+    QByteArrayList handles;
+    QByteArray response;
+    int pos=command.indexOf("()")+2;
+    while(pos+4<=command.size()) {
+        quint32 n=qFromBigEndian<quint32>((const uchar*)command.constData()+pos);
+        QByteArray reply=exec(resolveBatchTokens(command.mid(pos+4,n),handles),0);
+        pos+=4+n;
+        appendFrame(response,reply);
+        handles.append(reply.startsWith("Finished editing ")?reply.mid(17):reply);
+    }
+    return handleResponse(response,s);
+}
+
+/** transaction() is batch(), except that the update cycle which finishing the edit of each object forces
+  * (see UpdateManager::doUpdates()) is put off until the end, and done once.  Making hundreds of vectors
+  * and curves in one transaction costs one update rather than hundreds, each over every object so far.
+  * Values read within the transaction may not reflect that update yet. */
+QByteArray ScriptServer::transaction(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    UpdateManager::self()->holdForcedUpdates();
+    QByteArray response=batch(command,0,_store);
+    UpdateManager::self()->releaseForcedUpdates();
+    return handleResponse(response,s);
+}
+
+
+/** The reply to Vector::getBinaryArray() and Matrix::getBinaryArray(): nx and ny as 4 byte big endian
+  * integers, followed by nx*ny doubles in the native byte order of the machine. */
+static QByteArray binaryArrayHeader(int nx, int ny) {
+    QByteArray ret;
+    ret.reserve(8+nx*ny*sizeof(double));
+    uchar header[8];
+    qToBigEndian<quint32>(nx,header);
+    qToBigEndian<quint32>(ny,header+4);
+    ret.append((const char*)header,8);
+    return ret;
+}
+
+/** Vector::getBinaryArray(name): see binaryArrayHeader().  ny is 1. */
+QByteArray ScriptServer::vectorGetBinaryArray(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    VectorPtr v=kst_cast<Vector>(_store->retrieveObject(ScriptInterface::getArg(command)));
+    if(!v) {
+        return handleResponse("No such vector",s);
+    }
+    v->readLock();
+    QByteArray a=binaryArrayHeader(v->length(),1);
+    a.append((const char*)v->raw_V_ptr(),v->length()*sizeof(double));
+    v->unlock();
+    return handleResponse(a,s);
+}
+
+/** Matrix::getBinaryArray(name): see binaryArrayHeader(). */
+QByteArray ScriptServer::matrixGetBinaryArray(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    MatrixPtr m=kst_cast<Matrix>(_store->retrieveObject(ScriptInterface::getArg(command)));
+    if(!m) {
+        return handleResponse("No such matrix",s);
+    }
+    m->readLock();
+    QByteArray a=binaryArrayHeader(m->xNumSteps(),m->yNumSteps());
+    a.append((const char*)m->zValues(),m->xNumSteps()*m->yNumSteps()*sizeof(double));
+    m->unlock();
+    return handleResponse(a,s);
+}
+
+/** The number of elements in Python's sequence[start:stop:step], for a sequence of length n.  start and
+  * stop may be empty, or negative to count back from the end, and are clamped to the sequence, as by
+  * Python's slice.indices().  start is set to the index of the first element. */
+static int sliceIndices(const QString& startArg, const QString& stopArg, int step, int n, int& start) {
+    int lower=(step>0)?0:-1;
+    int upper=(step>0)?n:n-1;
+    int stop;
+
+    if(startArg.isEmpty()) {
+        start=(step>0)?lower:upper;
+    } else {
+        start=startArg.toInt();
+        if(start<0) {
+            start=qMax(start+n,lower);
+        } else {
+            start=qMin(start,upper);
+        }
+    }
+    if(stopArg.isEmpty()) {
+        stop=(step>0)?upper:lower;
+    } else {
+        stop=stopArg.toInt();
+        if(stop<0) {
+            stop=qMax(stop+n,lower);
+        } else {
+            stop=qMin(stop,upper);
+        }
+    }
+
+    if(step>0) {
+        return (stop>start)?(stop-start+step-1)/step:0;
+    }
+    return (start>stop)?(start-stop-step-1)/(-step):0;
+}
+
+/** Vector::getBinarySlice(start,stop,step,name): the elements Python's vector[start:stop:step] would
+  * give (see sliceIndices()), in the form of getBinaryArray(), so that reading the end of a long vector
+  * does not mean sending all of it.  step may be empty, for 1. */
+QByteArray ScriptServer::vectorGetBinarySlice(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    QStringList args=ScriptInterface::getArgs(command);
+    if(args.size()<4) {
+        return handleResponse("Too few arguments",s);
+    }
+    int step=args[2].isEmpty()?1:args[2].toInt();
+    if(step==0) {
+        return handleResponse("Slice step can not be zero",s);
+    }
+    VectorPtr v=kst_cast<Vector>(_store->retrieveObject(QStringList(args.mid(3)).join(",")));
+    if(!v) {
+        return handleResponse("No such vector",s);
+    }
+    v->readLock();
+    int start;
+    int count=sliceIndices(args[0],args[1],step,v->length(),start);
+    const double* values=v->raw_V_ptr()+start;
+    QByteArray a=binaryArrayHeader(count,1);
+    if(step==1) {
+        a.append((const char*)values,count*sizeof(double));
+    } else {
+        a.resize(8+count*sizeof(double));
+        double* out=(double*)(a.data()+8);
+        for(int i=0;i<count;i++) {
+            out[i]=values[qint64(i)*step];
+        }
+    }
+    v->unlock();
+    return handleResponse(a,s);
+}
+
+/** Vector::getBinaryValues(n,name) followed by n bytes of indices, as 4 byte integers in native byte
+  * order, which count back from the end if negative: those elements of the vector, in the form of
+  * getBinaryArray(). */
+QByteArray ScriptServer::vectorGetBinaryValues(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    int n=binaryPayloadSize(command);
+    QStringList args=ScriptInterface::getArgs(command.left(command.size()-n));
+    VectorPtr v=kst_cast<Vector>(_store->retrieveObject(QStringList(args.mid(1)).join(",")));
+    if(!v) {
+        return handleResponse("No such vector",s);
+    }
+    int count=n/sizeof(qint32);
+    const qint32* indices=(const qint32*)(command.constData()+command.size()-n);
+    v->readLock();
+    int length=v->length();
+    const double* values=v->raw_V_ptr();
+    QByteArray a=binaryArrayHeader(count,1);
+    a.resize(8+count*sizeof(double));
+    double* out=(double*)(a.data()+8);
+    for(int i=0;i<count;i++) {
+        qint32 j=indices[i]<0?indices[i]+length:indices[i];
+        if(j<0||j>=length) {
+            v->unlock();
+            return handleResponse("Index out of range",s);
+        }
+        out[i]=values[j];
+    }
+    v->unlock();
+    return handleResponse(a,s);
+}
+
+/** EditableVector::setBinaryArray(n,name) followed by n bytes of doubles in native byte order. */
+QByteArray ScriptServer::editableVectorSetBinaryArray(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    int n=binaryPayloadSize(command);
+    QStringList args=ScriptInterface::getArgs(command.left(command.size()-n));
+    EditableVectorPtr v=kst_cast<EditableVector>(_store->retrieveObject(QStringList(args.mid(1)).join(",")));
+    if(!v) {
+        return handleResponse("No such editable vector",s);
+    }
+    v->writeLock();
+    v->loadFromBuffer(command.constData()+command.size()-n,n);
+    v->registerChange();
+    v->unlock();
+    UpdateManager::self()->doUpdates(true);
+    UpdateServer::self()->requestUpdateSignal();
+    return handleResponse("Done",s);
+}
+
+/** EditableMatrix::setBinaryArray(n,nx,ny,name) followed by n=nx*ny*8 bytes of doubles in native
+  * byte order, in row-major order. */
+QByteArray ScriptServer::editableMatrixSetBinaryArray(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    int n=binaryPayloadSize(command);
+    QStringList args=ScriptInterface::getArgs(command.left(command.size()-n));
+    if(args.size()<4) {
+        return handleResponse("Too few arguments",s);
+    }
+    int nx=args[1].toInt();
+    int ny=args[2].toInt();
+    if(nx<0||ny<0||qint64(nx)*ny*sizeof(double)!=quint64(n)) {
+        return handleResponse("Size does not match the data",s);
+    }
+    EditableMatrixPtr m=kst_cast<EditableMatrix>(_store->retrieveObject(QStringList(args.mid(3)).join(",")));
+    if(!m) {
+        return handleResponse("No such editable matrix",s);
+    }
+    m->writeLock();
+    m->loadFromBuffer(command.constData()+command.size()-n,nx,ny);
+    m->registerChange();
+    m->unlock();
+    UpdateManager::self()->doUpdates(true);
+    UpdateServer::self()->requestUpdateSignal();
+    return handleResponse("Done",s);
+}
+
+/** The reply to Vector::stats() and Matrix::stats(): a line of name, tab and value for each statistic, as
+  * for properties(), with the values in full precision.  Statistics which are not kept are NaN. */
+static QByteArray statsReply(int length, const ScalarMap& scalars, int nans) {
+    const char* const names[] = { "min", "max", "mean", "rms", "sigma", "minpos", 0 };
+    const char* const keys[] = { "min", "max", "mean", "rms", "sigma", "minPositive", 0 };
+    QByteArray ret;
+    ret+="length\t"+QByteArray::number(length)+'\n';
+    ret+="nans\t"+QByteArray::number(nans)+'\n';
+    for(int i=0;names[i];i++) {
+        ScalarPtr x=scalars.value(names[i]);
+        ret+=QByteArray(keys[i])+'\t'+QByteArray::number(x?x->value():NOPOINT,'g',17)+'\n';
+    }
+    return ret;
+}
+
+/** Vector::stats(name): the length, min, max, mean, rms, sigma, number of NaNs and least positive value of a
+  * vector, in one round trip, from the statistics kst keeps anyway.  See statsReply(). */
+QByteArray ScriptServer::vectorStats(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    VectorPtr v=kst_cast<Vector>(_store->retrieveObject(ScriptInterface::getArg(command)));
+    if(!v) {
+        return handleResponse("No such vector",s);
+    }
+    v->readLock();
+    QByteArray a=statsReply(v->length(),v->scalars(),v->numNaN());
+    v->unlock();
+    return handleResponse(a,s);
+}
+
+/** Matrix::stats(name): as Vector::stats(), for the z values of a matrix. */
+QByteArray ScriptServer::matrixStats(QByteArray&command, QLocalSocket* s,ObjectStore*_store) {
+
+    MatrixPtr m=kst_cast<Matrix>(_store->retrieveObject(ScriptInterface::getArg(command)));
+    if(!m) {
+        return handleResponse("No such matrix",s);
+    }
+    m->readLock();
+    QByteArray a=statsReply(m->sampleCount(),m->scalars(),m->numNaN());
+    m->unlock();
+    return handleResponse(a,s);
+}
+
+
 QByteArray ScriptServer::cleanupLayout(QByteArray&command, QLocalSocket* s,ObjectStore*) {
 
     QString param = command.replace("cleanupLayout(","").replace(")","");
@@ -21,6 +21,9 @@
 #include "scriptinterface.h"
 #include <QLocalServer>
 #include <QMap>
+#include <QHash>
+#include <QPointer>
+#include <QSet>
 
 namespace Kst {
 
@@ -30,15 +33,57 @@ class ScriptServer;
 
 typedef QByteArray (ScriptServer::*ScriptMemberFn)(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
 
+/** Version of the wire protocol spoken by the script server.
+  *
+  * 1: bare text.  A command is whatever one read() returns, and so is the reply.
+  * 2: framed.  Commands and replies are a 4 byte big endian length followed by
+  *    that many bytes of payload.
+  * 3: framed, with request ids.  The length is followed by a 4 byte big endian id
+  *    chosen by the client, and then the payload.  Each reply carries the id of its
+  *    command.  Slow commands (see _slowFns) are put off until the commands which
+  *    have already arrived have been answered, so replies may come out of order.
+  *    They still run in the GUI thread, and block it while they do.
+  * 4: as 3.  Servers which speak it understand transaction(), currentTab(),
+  *    tabText() and closeTab().
+  *
+  * Every connection starts out speaking version 1.  A client switches to a newer
+  * version by sending "protocol(n)"; the server answers (still in version 1) with
+  * the version it will use from then on.  Older servers answer "Unknown command!",
+  * in which case the client should keep using bare text.
+  */
+#define KST_SCRIPT_PROTOCOL 4
+
 class ScriptServer : public QObject
 {
     Q_OBJECT
     QLocalServer* _server;
     ObjectStore* _store;
-    ScriptInterface* _interface;
+    ScriptInterface* _interface;    // of the connection whose command is running
+    QHash<QLocalSocket*,ScriptInterface*> _interfaces;  // open interface of each connection
+    qint64 _changeSerial;   // see changeSerial()
+    QHash<ScriptInterface*,QString> _editNames;   // short name of the object of each open interface
+    QHash<QString,qint64> _editSerials;  // _changeSerial at the last script change to each object
+    int _execDepth;         // commands running (more than one inside batch())
     bool _curMacComEcho;
     QList<ViewItem*> vi;    // cache
     QMap<QByteArray,ScriptMemberFn> _fnMap;
+    QHash<QLocalSocket*,QByteArray> _frameBuffers;  // partially received frames
+    QSet<QByteArray> _slowFns;  // commands which protocol 3 runs after the others
+    QSet<QByteArray> _readFns;  // commands which change nothing: see isChange()
+
+    struct DeferredCommand {
+        QPointer<QLocalSocket> socket;
+        QByteArray command;
+        quint32 request;
+    };
+    QList<DeferredCommand> _deferred;   // slow commands waiting to run
+
+    void readFrames(QLocalSocket* s);
+    void execRequest(QByteArray& command,QLocalSocket* s,quint32 request);
+    QByteArray dispatch(QByteArray& command,QLocalSocket* s);
+    bool isChange(const QByteArray& command) const;
+    void noteChange();
+    QByteArray objectSerial(const QString& name);
 public:
     explicit ScriptServer(ObjectStore*obj);
     ~ScriptServer();
@@ -47,8 +92,13 @@ public:
 public slots:
     void procConnection();
     void readSomething();
+    void dropConnection();
     QByteArray exec(QByteArray command,QLocalSocket* s);
 
+private slots:
+    void runDeferred();
+    void objectsUpdated();
+
 protected:
     QByteArray noSuchFn(QByteArray& , QLocalSocket*,ObjectStore*) {return ""; }
 
@@ -141,9 +191,14 @@ protected:
     QByteArray newSvgItem(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
 #endif
 
+    // Every object and view item in the session, in one go
+    QByteArray getObjects(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray findObjects(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
     // Access to interfaces
     QByteArray beginEdit(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
     QByteArray endEdit(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray properties(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
 
     // Quit:
     QByteArray done(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
@@ -153,12 +208,17 @@ protected:
 
     // Destruction is much easier than construction.
     QByteArray eliminate(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray eliminateObjects(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray purge(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
 
     // General
     QByteArray tabCount(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
     QByteArray newTab(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
     QByteArray setTab(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
     QByteArray renameTab(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray currentTab(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray tabText(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray closeTab(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
 
     QByteArray screenBack(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
     QByteArray screenForward(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
@@ -179,6 +239,33 @@ protected:
 
     QByteArray testCommand(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
 
+    // Wire protocol negotiation
+    QByteArray protocol(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
+    // For caching clients: a number which goes up whenever anything might have changed
+    QByteArray changeSerial(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
+    // Run time profiling
+    QByteArray setTimingsEnabled(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray getTimings(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray resetTimings(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
+    // Many commands in one round trip
+    QByteArray batch(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray transaction(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
+    // Raw vector and matrix data
+    QByteArray vectorGetBinaryArray(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray matrixGetBinaryArray(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray vectorGetBinarySlice(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray vectorGetBinaryValues(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray editableVectorSetBinaryArray(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray editableMatrixSetBinaryArray(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
+    // Summary statistics of vectors and matrices
+    QByteArray vectorStats(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+    QByteArray matrixStats(QByteArray& command, QLocalSocket* s,ObjectStore*_store);
+
 };
 
 
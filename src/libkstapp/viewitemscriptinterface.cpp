@@ -250,6 +250,11 @@ bool ViewItemSI::isValid() {
     return dim->item;
 }
 
+QStringList ViewItemSI::getters() {
+    return ScriptInterface::getters() << "fixAspectRatioIsChecked" << "getLayoutHorizontalMargin" << "getLayoutVerticalMargin"
+                                      << "getLayoutHorizontalSpacing" << "getLayoutVerticalSpacing";
+}
+
 ScriptInterface* ViewItemSI::newBox() {
     BoxItem* bi=new BoxItem(kstApp->mainWindow()->tabWidget()->currentView());
     kstApp->mainWindow()->tabWidget()->currentView()->scene()->addItem(bi);
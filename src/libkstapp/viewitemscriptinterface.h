@@ -63,6 +63,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate() {if (dim->item) dim->item->update();return ("Finished editing "+dim->item->Name()).toLatin1();}
+    QStringList getters();
 
     static ScriptInterface* newBox();
     static ScriptInterface* newButton();
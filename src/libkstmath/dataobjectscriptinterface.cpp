@@ -176,6 +176,10 @@ bool EquationSI::isValid() {
   return _equation;
 }
 
+QStringList EquationSI::getters() {
+  return ScriptInterface::getters() << "equation";
+}
+
 QByteArray EquationSI::endEditUpdate() {
   if (_equation) {
     _equation->registerChange();
@@ -274,6 +278,12 @@ bool SpectrumSI::isValid() {
   return _psd;
 }
 
+QStringList SpectrumSI::getters() {
+  return ScriptInterface::getters() << "sampleRate" << "interleavedAverage" << "fftLength" << "apodize"
+                                    << "removeMean" << "vectorUnits" << "rateUnits" << "apodizeFunctionIndex"
+                                    << "gaussianSigma" << "outputTypeIndex";
+}
+
 QByteArray SpectrumSI::endEditUpdate() {
   if (_psd) {
     _psd->registerChange();
@@ -465,6 +475,10 @@ bool HistogramSI::isValid() {
   return _histogram;
 }
 
+QStringList HistogramSI::getters() {
+  return ScriptInterface::getters() << "xMin" << "xMax" << "nBins" << "normalizationType" << "autoBin";
+}
+
 QByteArray HistogramSI::endEditUpdate() {
   if (_histogram) {
     _histogram->registerChange();
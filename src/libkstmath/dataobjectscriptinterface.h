@@ -83,6 +83,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newEquation(ObjectStore *store);
 
@@ -110,6 +111,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newSpectrum(ObjectStore *store);
 
@@ -146,6 +148,7 @@ public:
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newHistogram(ObjectStore *store);
 
@@ -58,6 +58,10 @@ QString RelationSI::showEditDialog(QString&) {
   return "done";
 }
 
+QStringList RelationSI::getters() {
+  return ScriptInterface::getters() << "minX" << "maxX" << "minY" << "maxY";
+}
+
 /******************************************************/
 /* Curves                                             */
 /******************************************************/
@@ -141,6 +145,14 @@ bool CurveSI::isValid() {
   return curve.isPtrValid();
 }
 
+QStringList CurveSI::getters() {
+  return RelationSI::getters() << "color" << "headColor" << "barFillColor" << "hasPoints" << "hasLines"
+                               << "hasBars" << "hasHead" << "lineWidth" << "pointSize" << "pointType"
+                               << "headType" << "lineStyle" << "pointDensity" << "xVector" << "yVector"
+                               << "xErrorVector" << "yErrorVector" << "xMinusErrorVector"
+                               << "yMinusErrorVector";
+}
+
 ScriptInterface* CurveSI::newCurve(ObjectStore *store) {
   CurvePtr curve;
   curve = store->createObject<Curve>();
@@ -499,6 +511,10 @@ bool ImageSI::isValid() {
   return image.isPtrValid();
 }
 
+QStringList ImageSI::getters() {
+  return RelationSI::getters() << "minZ" << "maxZ";
+}
+
 ScriptInterface* ImageSI::newImage(ObjectStore *store) {
   ImagePtr image;
   image = store->createObject<Image>();
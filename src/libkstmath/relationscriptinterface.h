@@ -37,6 +37,7 @@ class KSTMATH_EXPORT RelationSI : public ScriptInterface
     QString maxY(QString&);
     QString minY(QString&);
     QString showEditDialog(QString&);
+    QStringList getters();
 
   protected:
     RelationPtr relation;
@@ -52,6 +53,7 @@ class KSTMATH_EXPORT CurveSI : public RelationSI
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newCurve(ObjectStore *store);
 
@@ -120,6 +122,7 @@ class KSTMATH_EXPORT ImageSI : public RelationSI
     QString doCommand(QString);
     bool isValid();
     QByteArray endEditUpdate();
+    QStringList getters();
 
     static ScriptInterface* newImage(ObjectStore *store);
 